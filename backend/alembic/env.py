@@ -16,6 +16,7 @@ from models.base import Base
 from models.user import User
 from models.codes import VerificationCode
 from models.moldovafinreport import MoldovaFinReport
+from models.moldova_indicator import MoldovaIndicator
 from models.review import Review
 from models.company import Company
 from models.company_claim import CompanyClaim
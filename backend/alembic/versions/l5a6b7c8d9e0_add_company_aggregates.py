@@ -0,0 +1,61 @@
+"""add review aggregates to companies
+
+Revision ID: l5a6b7c8d9e0
+Revises: k4a5b6c7d8e9
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'l5a6b7c8d9e0'
+down_revision: Union[str, None] = 'k4a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Агрегаты по отзывам компании (заполняются скриптом update_companies_stats.py)
+    op.add_column('companies', sa.Column('comments_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('companies', sa.Column('avg_rating', sa.Float(), nullable=True))
+    op.add_column('companies', sa.Column('jurisdiction', sa.String(), nullable=True))
+    op.add_column('companies', sa.Column('report_years', ARRAY(sa.Integer()), nullable=True))
+
+    # Заполняем агрегаты существующих компаний одним проходом по reviews —
+    # те же правила, что в CompanyStatsService (ATI без рейтинга считается как 5)
+    op.execute("""
+        UPDATE companies c
+        SET comments_count = s.comments_count,
+            avg_rating = s.avg_rating,
+            jurisdiction = s.jurisdiction,
+            report_years = s.report_years
+        FROM (
+            SELECT
+                subject,
+                count(*) FILTER (WHERE comment IS NOT NULL AND comment <> '') AS comments_count,
+                avg(CASE
+                    WHEN rating IS NOT NULL THEN rating
+                    WHEN upper(source) = 'ATI' THEN 5
+                END) AS avg_rating,
+                min(jurisdiction) FILTER (
+                    WHERE jurisdiction IS NOT NULL AND jurisdiction <> '' AND jurisdiction <> '—'
+                ) AS jurisdiction,
+                array_agg(DISTINCT report_year ORDER BY report_year DESC)
+                    FILTER (WHERE report_year IS NOT NULL) AS report_years
+            FROM reviews
+            GROUP BY subject
+        ) s
+        WHERE c.name = s.subject
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('companies', 'report_years')
+    op.drop_column('companies', 'jurisdiction')
+    op.drop_column('companies', 'avg_rating')
+    op.drop_column('companies', 'comments_count')
@@ -0,0 +1,39 @@
+"""add partial index for keyset pagination of company reviews
+
+Revision ID: m6a7b8c9d0e1
+Revises: l5a6b7c8d9e0
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'm6a7b8c9d0e1'
+down_revision: Union[str, None] = 'l5a6b7c8d9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY — без блокировки записи в большую таблицу reviews
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_reviews_subject_date_id_commented',
+            'reviews',
+            ['subject', sa.text('review_date DESC'), 'id'],
+            postgresql_where=sa.text("comment IS NOT NULL AND comment <> ''"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_reviews_subject_date_id_commented',
+            table_name='reviews',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,32 @@
+"""add company_list_anchors table
+
+Revision ID: n7a8b9c0d1e2
+Revises: m6a7b8c9d0e1
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'n7a8b9c0d1e2'
+down_revision: Union[str, None] = 'm6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Якоря страниц списка компаний (заполняются generate_sitemaps.py)
+    op.create_table(
+        'company_list_anchors',
+        sa.Column('page', sa.Integer(), nullable=False),
+        sa.Column('first_name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('page')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('company_list_anchors')
@@ -0,0 +1,55 @@
+"""add pg_trgm and prefix indexes for company name search
+
+Revision ID: o8a9b0c1d2e3
+Revises: n7a8b9c0d1e2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'o8a9b0c1d2e3'
+down_revision: Union[str, None] = 'n7a8b9c0d1e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY — поиск и импорт продолжают работать во время построения
+    with op.get_context().autocommit_block():
+        # Подстрока (ILIKE '%q%') и похожесть (name % q) для запросов от 3 символов
+        op.create_index(
+            'ix_companies_name_trgm',
+            'companies',
+            ['name'],
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+        # Поиск по началу названия для коротких запросов (lower(name) LIKE 'q%')
+        op.create_index(
+            'ix_companies_name_lower_prefix',
+            'companies',
+            [sa.text('lower(name) text_pattern_ops')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_companies_name_lower_prefix',
+            table_name='companies',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_companies_name_trgm',
+            table_name='companies',
+            postgresql_concurrently=True,
+        )
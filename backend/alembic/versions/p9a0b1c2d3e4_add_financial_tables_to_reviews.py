@@ -0,0 +1,28 @@
+"""add precomputed financial tables to reviews
+
+Revision ID: p9a0b1c2d3e4
+Revises: o8a9b0c1d2e3
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'p9a0b1c2d3e4'
+down_revision: Union[str, None] = 'o8a9b0c1d2e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Заполняется скриптом update_financial_tables.py и при сохранении отчета
+    op.add_column('reviews', sa.Column('financial_tables', JSONB, nullable=True, comment='Переведенные финансовые таблицы'))
+
+
+def downgrade() -> None:
+    op.drop_column('reviews', 'financial_tables')
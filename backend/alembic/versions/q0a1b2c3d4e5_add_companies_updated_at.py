@@ -0,0 +1,41 @@
+"""add change marker to companies
+
+Revision ID: q0a1b2c3d4e5
+Revises: p9a0b1c2d3e4
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'q0a1b2c3d4e5'
+down_revision: Union[str, None] = 'p9a0b1c2d3e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Время последнего изменения компании: отзывы (пересчет статистики) или правка данных
+    op.add_column('companies', sa.Column(
+        'updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()
+    ))
+
+    # Начальное значение — время последнего отзыва компании
+    op.execute("""
+        UPDATE companies c
+        SET updated_at = r.last_created_at
+        FROM (
+            SELECT subject, max(created_at) AS last_created_at
+            FROM reviews
+            GROUP BY subject
+        ) r
+        WHERE r.subject = c.name AND r.last_created_at IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('companies', 'updated_at')
@@ -0,0 +1,28 @@
+"""add changed_at to company_list_anchors
+
+Revision ID: r1a2b3c4d5e6
+Revises: q0a1b2c3d4e5
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'r1a2b3c4d5e6'
+down_revision: Union[str, None] = 'q0a1b2c3d4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Время последнего изменения страницы списка (<lastmod> в sitemap),
+    # заполняется при пересборке якорей (generate_sitemaps.py)
+    op.add_column('company_list_anchors', sa.Column('changed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('company_list_anchors', 'changed_at')
@@ -0,0 +1,45 @@
+"""add moldova_indicators
+
+Revision ID: s2a3b4c5d6e7
+Revises: r1a2b3c4d5e6
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 's2a3b4c5d6e7'
+down_revision: Union[str, None] = 'r1a2b3c4d5e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Показатели отчетов moldovafinreport в типизированном виде
+    # (заполняются скриптом import_moldova_reports.py)
+    op.create_table(
+        'moldova_indicators',
+        sa.Column('report_id', sa.Integer(), nullable=False),
+        sa.Column('line_no', sa.Integer(), nullable=False),
+        sa.Column('fiscal_code', sa.String(), nullable=False),
+        sa.Column('report_year', sa.Integer(), nullable=False),
+        sa.Column('group_no', sa.SmallInteger(), nullable=False),
+        sa.Column('code', sa.String(), nullable=True),
+        sa.Column('prev', sa.Numeric(), nullable=True),
+        sa.Column('current', sa.Numeric(), nullable=True),
+        sa.PrimaryKeyConstraint('report_id', 'line_no'),
+    )
+    op.create_index(
+        'ix_moldova_indicators_fiscal_code_code_year',
+        'moldova_indicators',
+        ['fiscal_code', 'code', 'report_year'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_moldova_indicators_fiscal_code_code_year', table_name='moldova_indicators')
+    op.drop_table('moldova_indicators')
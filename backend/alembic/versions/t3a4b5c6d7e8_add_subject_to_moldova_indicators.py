@@ -0,0 +1,48 @@
+"""add subject to moldova_indicators
+
+Revision ID: t3a4b5c6d7e8
+Revises: s2a3b4c5d6e7
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 't3a4b5c6d7e8'
+down_revision: Union[str, None] = 's2a3b4c5d6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Компания показателя (companies.name) — заполняется import_moldova_reports.py
+    op.add_column('moldova_indicators', sa.Column('subject', sa.String(), nullable=True))
+
+    # Уже загруженные показатели связываем по фискальному коду из reviews
+    op.execute("""
+        UPDATE moldova_indicators m
+        SET subject = s.subject
+        FROM (
+            SELECT r.fiscal_code, min(r.subject) AS subject
+            FROM reviews r
+            WHERE r.fiscal_code IS NOT NULL
+              AND EXISTS (SELECT 1 FROM companies c WHERE c.name = r.subject)
+            GROUP BY r.fiscal_code
+        ) s
+        WHERE m.fiscal_code = s.fiscal_code
+    """)
+
+    op.create_index(
+        'ix_moldova_indicators_subject_code_year',
+        'moldova_indicators',
+        ['subject', 'code', 'report_year'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_moldova_indicators_subject_code_year', table_name='moldova_indicators')
+    op.drop_column('moldova_indicators', 'subject')
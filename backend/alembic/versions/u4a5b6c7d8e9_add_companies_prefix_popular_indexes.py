@@ -0,0 +1,63 @@
+"""add popularity-ordered prefix indexes for short company search
+
+Revision ID: u4a5b6c7d8e9
+Revises: t3a4b5c6d7e8
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'u4a5b6c7d8e9'
+down_revision: Union[str, None] = 't3a4b5c6d7e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY — поиск и импорт продолжают работать во время построения
+    with op.get_context().autocommit_block():
+        # Запросы из 1–2 символов: совпадения сразу по убыванию числа отзывов,
+        # без сортировки всех компаний на эти буквы
+        op.create_index(
+            'ix_companies_prefix1_popular',
+            'companies',
+            [sa.text('left(lower(name), 1)'), sa.text('reviews_count DESC'), 'name'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_companies_prefix2_popular',
+            'companies',
+            [sa.text('left(lower(name), 2)'), sa.text('reviews_count DESC'), 'name'],
+            postgresql_concurrently=True,
+        )
+        # Прежний индекс коротких запросов (lower(name) LIKE 'q%') больше не используется
+        op.drop_index(
+            'ix_companies_name_lower_prefix',
+            table_name='companies',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_companies_name_lower_prefix',
+            'companies',
+            [sa.text('lower(name) text_pattern_ops')],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_companies_prefix2_popular',
+            table_name='companies',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_companies_prefix1_popular',
+            table_name='companies',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,48 @@
+"""add review_page_anchors table
+
+Revision ID: v5a6b7c8d9e0
+Revises: u4a5b6c7d8e9
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'v5a6b7c8d9e0'
+down_revision: Union[str, None] = 'u4a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Якоря страниц отзывов компании (пересчитываются в CompanyStatsService)
+    op.create_table(
+        'review_page_anchors',
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('review_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('review_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('subject', 'position')
+    )
+
+    # Каждый 100-й отзыв с комментарием (REVIEW_ANCHOR_EVERY) в порядке страницы компании
+    op.execute("""
+        INSERT INTO review_page_anchors (subject, position, review_date, review_id)
+        SELECT subject, position, review_date, id
+        FROM (
+            SELECT
+                subject, review_date, id,
+                row_number() OVER (PARTITION BY subject ORDER BY review_date DESC, id) - 1 AS position
+            FROM reviews
+            WHERE comment IS NOT NULL AND comment <> ''
+        ) numbered
+        WHERE position > 0 AND position % 100 = 0
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('review_page_anchors')
@@ -0,0 +1,40 @@
+"""add byte-ordered lower(name) index for prefix candidates of company search
+
+Revision ID: w6a7b8c9d0e1
+Revises: v5a6b7c8d9e0
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'w6a7b8c9d0e1'
+down_revision: Union[str, None] = 'v5a6b7c8d9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY — поиск и импорт продолжают работать во время построения
+    with op.get_context().autocommit_block():
+        # Совпадения с началом названия (lower(name) COLLATE "C" LIKE 'q%') сразу в
+        # порядке индекса — точное совпадение первым
+        op.create_index(
+            'ix_companies_name_lower_c',
+            'companies',
+            [sa.text('(lower(name) COLLATE "C")')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_companies_name_lower_c',
+            table_name='companies',
+            postgresql_concurrently=True,
+        )
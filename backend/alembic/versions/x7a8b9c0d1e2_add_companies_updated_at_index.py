@@ -0,0 +1,39 @@
+"""add companies.updated_at index for company search index polling
+
+Revision ID: x7a8b9c0d1e2
+Revises: w6a7b8c9d0e1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'x7a8b9c0d1e2'
+down_revision: Union[str, None] = 'w6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY — поиск и импорт продолжают работать во время построения
+    with op.get_context().autocommit_block():
+        # Опрос изменений индексом поиска: updated_at > отметка
+        op.create_index(
+            'ix_companies_updated_at',
+            'companies',
+            ['updated_at'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_companies_updated_at',
+            table_name='companies',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,168 @@
+"""
+Бенчмарк поиска компаний по названию (/api/reviews/search, /{lang}/reviews/search).
+
+Создает отдельную схему с синтетической таблицей companies на несколько миллионов
+строк и сравнивает задержки:
+  - до:    ILIKE '%q%' без индексов (прежний запрос)
+  - после: GIN pg_trgm + btree (первые 1–2 символа, reviews_count DESC, name),
+           ранжирование из ReviewsService
+
+Рабочая таблица companies не затрагивается. Нужно расширение pg_trgm.
+
+Запуск: python bench_company_search.py [--rows 3000000] [--runs 200] [--keep]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import select, text
+
+from database import engine
+from models.company import Company
+from services.reviews_service import ReviewsService
+
+SCHEMA = "bench_company_search"
+
+WORDS = [
+    "Trans", "Logistic", "Cargo", "Auto", "Express", "Global", "Euro", "Moldova",
+    "Nord", "Sud", "Invest", "Group", "Service", "Trade", "Agro", "Construct",
+    "Market", "Capital", "Prime", "Delta", "Alfa", "Vector", "Terra", "Union",
+]
+SUFFIXES = ["SRL", "SA", "LLC", "GmbH", "Ltd", "ТОВ", "ООО"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_queries(runs: int) -> list[str]:
+    """Смесь запросов: слово целиком, фрагмент, слово с опечаткой, короткий префикс"""
+    rnd = random.Random(42)
+    queries = []
+    for i in range(runs):
+        word = rnd.choice(WORDS)
+        kind = i % 4
+        if kind == 0:
+            queries.append(f"{word} {rnd.choice(WORDS)}")
+        elif kind == 1:
+            start = rnd.randrange(0, max(1, len(word) - 3))
+            queries.append(word[start:start + 4].lower())
+        elif kind == 2:
+            queries.append(word[:-1] + "x" + " " + rnd.choice(SUFFIXES))
+        else:
+            queries.append(word[:2].lower())
+    return queries
+
+
+async def prepare(rows: int) -> None:
+    words = ", ".join(f"'{w}'" for w in WORDS)
+    suffixes = ", ".join(f"'{s}'" for s in SUFFIXES)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text(f"""
+            CREATE TABLE {SCHEMA}.companies (
+                name varchar PRIMARY KEY,
+                reviews_count integer NOT NULL DEFAULT 0,
+                min_review_id integer
+            )
+        """))
+        started = time.perf_counter()
+        await conn.execute(text(f"""
+            INSERT INTO {SCHEMA}.companies (name, reviews_count, min_review_id)
+            SELECT
+                (ARRAY[{words}])[1 + (g * 7) % {len(WORDS)}] || ' ' ||
+                (ARRAY[{words}])[1 + (g / 13) % {len(WORDS)}] || ' ' ||
+                (ARRAY[{suffixes}])[1 + g % {len(SUFFIXES)}] || ' ' || g,
+                (random() ^ 4 * 1000)::int,
+                g
+            FROM generate_series(1, :rows) g
+        """), {"rows": rows})
+        await conn.execute(text(f"ANALYZE {SCHEMA}.companies"))
+    print(f"📦 Сгенерировано {rows:,} компаний за {time.perf_counter() - started:.1f} с")
+
+
+async def create_indexes() -> None:
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(
+            f"CREATE INDEX ix_bench_name_trgm ON {SCHEMA}.companies USING gin (name gin_trgm_ops)"
+        ))
+        for length in (1, 2):
+            await conn.execute(text(
+                f"CREATE INDEX ix_bench_prefix{length}_popular ON {SCHEMA}.companies "
+                f"(left(lower(name), {length}), reviews_count DESC, name)"
+            ))
+        await conn.execute(text(f"ANALYZE {SCHEMA}.companies"))
+    print(f"🗂  Индексы построены за {time.perf_counter() - started:.1f} с")
+
+
+def legacy_query(query: str, limit: int):
+    return (
+        select(Company.name, Company.min_review_id, Company.reviews_count)
+        .where(Company.name.ilike(f"%{query}%"))
+        .limit(limit)
+    )
+
+
+async def measure(label: str, build_query, queries: list[str], limit: int) -> None:
+    timings = {"short": [], "long": []}
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(schema_translate_map={None: SCHEMA})
+        # Прогрев кэша и подготовленных выражений
+        for query in queries[:10]:
+            await conn.execute(build_query(query, limit))
+
+        for query in queries:
+            started = time.perf_counter()
+            await conn.execute(build_query(query, limit))
+            elapsed = (time.perf_counter() - started) * 1000
+            timings["short" if len(query) < 3 else "long"].append(elapsed)
+
+    print(f"\n⏱  {label}")
+    for kind, values in timings.items():
+        if values:
+            print(
+                f"   {kind:<5} n={len(values):<4} "
+                f"p50={statistics.median(values):8.2f} мс  "
+                f"p99={percentile(values, 99):8.2f} мс  "
+                f"max={max(values):8.2f} мс"
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска компаний")
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="не удалять схему после замера")
+    args = parser.parse_args()
+
+    queries = make_queries(args.runs)
+    service = ReviewsService(None)
+
+    def new_query(query: str, limit: int):
+        return service._search_query(
+            query, limit, Company.name, Company.min_review_id, Company.reviews_count
+        )
+
+    try:
+        await prepare(args.rows)
+        await measure("До: ILIKE '%q%' без индекса", legacy_query, queries, args.limit)
+
+        await create_indexes()
+        await measure("После: pg_trgm + префикс", new_query, queries, args.limit)
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
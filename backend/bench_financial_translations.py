@@ -0,0 +1,125 @@
+"""
+Микробенчмарк перевода показателей финансового отчета (get_translated_indicator).
+
+Берет набор полей реального отчета из reviews.detailed_data и сравнивает
+прежний линейный поиск по FINANCIAL_INDICATORS_BY_NAME с индексом:
+  - индекс без кэша (первый рендер отчета)
+  - индекс с кэшем (повторные рендеры)
+Перед замером проверяется, что результаты совпадают для всех полей и языков.
+
+Запуск: python bench_financial_translations.py [--review-id ID | --file detailed_data.json] [--rounds 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, engine
+from models.review import Review
+from helpers.financial_translations import (
+    FINANCIAL_INDICATORS,
+    FINANCIAL_INDICATORS_BY_NAME,
+    get_translated_indicator,
+    _translate_indicator,
+)
+
+LANGS = ("ru", "en", "uk", "ro")
+
+
+def legacy_get_translated_indicator(code: str, original_name: str, lang: str) -> str:
+    """Прежняя реализация — линейный проход по всем названиям"""
+    lang = lang.lower() if lang else "ru"
+    if lang not in ["ru", "en", "uk", "ro"]:
+        lang = "ru"
+    if lang == "ro":
+        return original_name
+    if code in FINANCIAL_INDICATORS:
+        indicator_trans = FINANCIAL_INDICATORS[code]
+        if lang in indicator_trans:
+            return indicator_trans[lang]
+    clean_name = original_name.split("(rd.")[0].strip() if "(rd." in original_name else original_name
+    if original_name in FINANCIAL_INDICATORS_BY_NAME:
+        trans = FINANCIAL_INDICATORS_BY_NAME[original_name]
+        if lang in trans:
+            return trans[lang]
+    if clean_name != original_name and clean_name in FINANCIAL_INDICATORS_BY_NAME:
+        trans = FINANCIAL_INDICATORS_BY_NAME[clean_name]
+        if lang in trans:
+            return trans[lang]
+    for name_key, trans in FINANCIAL_INDICATORS_BY_NAME.items():
+        if original_name.startswith(name_key) or name_key.startswith(clean_name):
+            if lang in trans:
+                return trans[lang]
+    return original_name
+
+
+async def load_detailed_data(review_id: int | None) -> dict:
+    query = select(Review.id, Review.detailed_data).where(Review.detailed_data.isnot(None))
+    if review_id is not None:
+        query = query.where(Review.id == review_id)
+    async with AsyncSessionLocal() as session:
+        row = (await session.execute(query.order_by(Review.id).limit(1))).first()
+    await engine.dispose()
+    if row is None:
+        raise SystemExit("❌ В reviews нет отчетов с detailed_data")
+    print(f"📄 Отчет review_id={row.id}")
+    return row.detailed_data
+
+
+def measure(label: str, func, fields: list[tuple[str, str]], rounds: int, clear_cache: bool = False) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        if clear_cache:
+            _translate_indicator.cache_clear()
+        for lang in LANGS:
+            for code, name in fields:
+                func(code, name, lang)
+    elapsed = time.perf_counter() - started
+    per_report = elapsed / rounds * 1e6
+    print(f"   {label:<22} {per_report:10.1f} мкс на отчет (4 языка)")
+    return per_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк перевода показателей")
+    parser.add_argument("--review-id", type=int, default=None)
+    parser.add_argument("--file", help="JSON с detailed_data отчета")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            detailed_data = json.load(f)
+    else:
+        detailed_data = asyncio.run(load_detailed_data(args.review_id))
+
+    fields = [
+        (field.get("code", ""), field.get("name", ""))
+        for group in detailed_data.get("groups", [])
+        for field in group.get("fields", [])
+    ]
+    unmatched = sum(
+        1 for code, name in fields
+        if code not in FINANCIAL_INDICATORS and name not in FINANCIAL_INDICATORS_BY_NAME
+    )
+    print(f"🔢 Полей: {len(fields)}, без точного совпадения по коду/названию: {unmatched}")
+
+    for lang in LANGS:
+        for code, name in fields:
+            expected = legacy_get_translated_indicator(code, name, lang)
+            actual = get_translated_indicator(code, name, lang)
+            if expected != actual:
+                raise SystemExit(f"❌ Расхождение: {lang} {code!r} {name!r}: {expected!r} != {actual!r}")
+    print("✅ Переводы совпадают с прежней реализацией")
+
+    print("\n⏱  Перевод всех полей отчета")
+    legacy = measure("линейный поиск", legacy_get_translated_indicator, fields, args.rounds)
+    cold = measure("индекс без кэша", get_translated_indicator, fields, args.rounds, clear_cache=True)
+    warm = measure("индекс + кэш", get_translated_indicator, fields, args.rounds)
+    print(f"\n   Ускорение: без кэша x{legacy / cold:.1f}, с кэшем x{legacy / warm:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Бенчмарк потокового парсера JSON дампа reviews_b2bhintcompany (helpers/json_stream.py).
+
+Генерирует файл в формате выгрузки { "reviews_b2bhintcompany": [ {...}, ... ] }
+(по умолчанию 2 ГБ) и замеряет:
+  - новый парсер (stream_array) на всем файле
+  - прежний парсер (str буфер + lstrip/срез после каждой записи) на файле
+    поменьше того же формата и на файле с крупными записями (--record-kb),
+    которые он разбирает заново после каждого дочитанного блока
+Перед замером stream_array сверяется с json.load на небольшом файле.
+
+Запуск: python bench_import_parser.py [--size-mb 2048] [--legacy-mb 64] [--record-kb 1024] [--dir /tmp] [--keep]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from helpers.json_stream import stream_array
+
+KEY = "reviews_b2bhintcompany"
+CHECK_SIZE_MB = 8
+TEMPLATES = 500
+
+
+def legacy_stream_array(path: str):
+    """Прежняя реализация из import_all_reviews.py"""
+    decoder = json.JSONDecoder()
+    buf = ""
+    in_array = False
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(65536)
+            if not chunk:
+                break
+            buf += chunk
+            if not in_array:
+                pos = buf.find("[")
+                if pos == -1:
+                    buf = ""
+                    continue
+                in_array = True
+                buf = buf[pos + 1 :]
+            while True:
+                buf = buf.lstrip()
+                if not buf:
+                    break
+                if buf[0] == "]":
+                    return
+                try:
+                    obj, end = decoder.raw_decode(buf)
+                    yield obj
+                    buf = buf[end:]
+                    if buf.startswith(","):
+                        buf = buf[1:]
+                except json.JSONDecodeError:
+                    break
+
+
+def make_record(rnd: random.Random, comment_kb: int = 0) -> dict:
+    """Запись b2bhint: ~30 полей, кириллица, экранирование, скобки в тексте"""
+    word = lambda: "".join(rnd.choice("абвгдежзиклмнопрстуфхцabcdefghijk") for _ in range(rnd.randint(3, 12)))
+    text = " ".join(word() for _ in range(rnd.randint(5, 60)))
+    if comment_kb:
+        text = (text + " ") * (comment_kb * 1024 // (len(text) + 1) + 1)
+    return {
+        "id": 0,
+        "name": f"ООО \"{word().upper()}\" {{{word()}}}",
+        "comment": text if rnd.random() < 0.7 else None,
+        "reviewer": word(),
+        "rating": rnd.randint(1, 5),
+        "status": "active",
+        "review_date": f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00:00Z",
+        "source": "b2bhint",
+        "jurisdiction": rnd.choice(["RU", "KZ", "UA", "MD", "BY"]),
+        "country": rnd.choice(["Россия", "Казахстан", "Молдова"]),
+        "company_number": str(rnd.randint(10**9, 10**10)),
+        "registration_number": str(rnd.randint(10**12, 10**13)),
+        "registration_date": f"20{rnd.randint(0, 23):02d}-01-01",
+        "legal_form": "Общество с ограниченной ответственностью",
+        "short_name": word(),
+        "cin": None,
+        "authorized_capital": f"{rnd.randint(10, 10**6)} руб.",
+        "paid_up_capital": None,
+        "subtype": None,
+        "activity_type": f"[{rnd.randint(1, 99)}.{rnd.randint(1, 99)}] {text[:80]}",
+        "legal_address": f"г. {word()}, ул. {word()}, д. {rnd.randint(1, 200)}\\{rnd.randint(1, 9)}",
+        "ogrn": str(rnd.randint(10**12, 10**13)),
+        "inn": str(rnd.randint(10**9, 10**10)),
+        "liquidation_date": None,
+        "managers": json.dumps([{"name": word(), "role": "Директор"}], ensure_ascii=False),
+        "branch": None,
+        "mailing_address": None,
+        "created_at": "2025-08-19T16:24:00Z",
+    }
+
+
+def generate(path: str, size_mb: int, comment_kb: int = 0, seed: int = 1) -> int:
+    """Файл в формате выгрузки, не меньше size_mb МБ; возвращает число записей"""
+    rnd = random.Random(seed)
+    # Шаблоны без id: каждая запись — '{"id" : N, ' + остаток шаблона
+    tails = []
+    for _ in range(TEMPLATES if not comment_kb else 4):
+        dumped = json.dumps(make_record(rnd, comment_kb), ensure_ascii=False, indent="\t\t", separators=(",", " : "))
+        tails.append(dumped.split(",", 1)[1])
+    limit = size_mb * 1024 * 1024
+    written = 0
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n"%s": [\n' % KEY)
+        block = []
+        while written < limit:
+            count += 1
+            record = '\t{\n\t\t"id" : %d,%s' % (count, tails[count % len(tails)])
+            if count > 1:
+                record = ",\n" + record
+            block.append(record)
+            written += len(record.encode("utf-8"))
+            if len(block) >= 10000:
+                f.write("".join(block))
+                block = []
+        f.write("".join(block))
+        f.write("\n]\n}\n")
+    return count
+
+
+def measure(label: str, stream, path: str, total: int) -> int:
+    size = os.path.getsize(path)
+    started = time.perf_counter()
+    count = 0
+    for _ in stream(path):
+        count += 1
+    elapsed = time.perf_counter() - started
+    print(f"   {label:<20} {count:>10,} записей {elapsed:8.1f} с "
+          f"{size / elapsed / 1024 / 1024:8.1f} МБ/с {count / elapsed:10,.0f} записей/с")
+    if count < total:
+        print(f"   ⚠️ разобрано {count:,} из {total:,}: после блока, закончившегося сразу за объектом, "
+              f"буфер начинается с запятой и разбор дальше не продвигается")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк парсера JSON дампа отзывов")
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--legacy-mb", type=int, default=64, help="размер файла для прежнего парсера")
+    parser.add_argument("--record-kb", type=int, default=1024, help="размер записи в файле с крупными записями")
+    parser.add_argument("--dir", default="/tmp")
+    parser.add_argument("--keep", action="store_true", help="не удалять сгенерированные файлы")
+    args = parser.parse_args()
+
+    paths = {
+        "check": os.path.join(args.dir, f"bench_{KEY}_check.json"),
+        "legacy": os.path.join(args.dir, f"bench_{KEY}_{args.legacy_mb}mb.json"),
+        "large": os.path.join(args.dir, f"bench_{KEY}_{args.record_kb}kb_records.json"),
+        "full": os.path.join(args.dir, f"bench_{KEY}_{args.size_mb}mb.json"),
+    }
+    try:
+        print(f"📝 Генерация файлов: {CHECK_SIZE_MB} МБ, {args.legacy_mb} МБ, {args.size_mb} МБ")
+        generate(paths["check"], CHECK_SIZE_MB)
+        legacy_total = generate(paths["legacy"], args.legacy_mb)
+        large_total = generate(paths["large"], args.legacy_mb, comment_kb=args.record_kb)
+        total = generate(paths["full"], args.size_mb)
+        print(f"   {total:,} записей, {os.path.getsize(paths['full']) / 1024 / 1024:,.0f} МБ")
+
+        with open(paths["check"], encoding="utf-8") as f:
+            expected = json.load(f)[KEY]
+        if list(stream_array(paths["check"])) != expected:
+            raise SystemExit("❌ stream_array расходится с json.load")
+        print(f"✅ stream_array совпадает с json.load ({len(expected):,} записей)")
+
+        print(f"\n⏱  Файл {args.legacy_mb} МБ")
+        measure("прежний парсер", legacy_stream_array, paths["legacy"], legacy_total)
+        measure("stream_array", stream_array, paths["legacy"], legacy_total)
+        print(f"\n⏱  Файл {args.legacy_mb} МБ, записи по {args.record_kb} КБ")
+        measure("прежний парсер", legacy_stream_array, paths["large"], large_total)
+        measure("stream_array", stream_array, paths["large"], large_total)
+        print(f"\n⏱  Файл {args.size_mb} МБ")
+        if measure("stream_array", stream_array, paths["full"], total) != total:
+            raise SystemExit("❌ stream_array разобрал не все записи")
+    finally:
+        if not args.keep:
+            for path in paths.values():
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 Настройка подключения к базе данных
 """
 import os
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from dotenv import load_dotenv
@@ -51,4 +54,39 @@ async def get_db() -> AsyncSession:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+# === Счётчик SQL запросов на один HTTP запрос ===
+
+# Диагностика: заголовок X-DB-Queries в ответах — только для отладки, не в продакшене
+QUERY_COUNT_HEADER = os.getenv("QUERY_COUNT_HEADER", "0") == "1"
+
+class QueryCounter:
+    """Количество SQL запросов, выполненных в рамках одного HTTP запроса"""
+
+    def __init__(self):
+        self.count = 0
+
+
+_query_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+def start_query_counter() -> QueryCounter:
+    """Начать подсчёт запросов для текущего контекста (вызывается из middleware)"""
+    counter = QueryCounter()
+    _query_counter.set(counter)
+    return counter
+
+
+def get_query_count() -> int:
+    """Получить количество запросов, выполненных в текущем контексте"""
+    counter = _query_counter.get()
+    return counter.count if counter else 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
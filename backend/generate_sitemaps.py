@@ -1,193 +1,167 @@
 """
 Скрипт для генерации всех sitemap файлов
-Запуск: python generate_sitemaps.py
+Запуск: python generate_sitemaps.py [--full] [--workers N]
+
+Файлы пишутся потоково сразу в .xml.gz (helpers/sitemap_writer.py), компании читаются
+одним запросом через серверный курсор — память не зависит от числа компаний.
+
+Генерация инкрементальная: компании берутся из companies и раскладываются по шардам,
+для каждого шарда в манифесте (sitemap-manifest.json) хранятся границы, количество
+компаний/URL и максимальный companies.updated_at. Перезаписываются только шарды,
+у которых это изменилось; --full перезаписывает все. Раскладка и манифест общие
+с routes/seo.py (services/sitemap_service.py).
+
+SITEMAP_HREFLANG=1 — один набор файлов с hreflang вместо копий по языкам.
+
+<lastmod> — реальное время изменения: companies.updated_at для страниц компании,
+company_list_anchors.changed_at для страниц списка; changefreq — по давности изменения.
+
+Компании шарда читаются из БД один раз, файлы языков (отличаются только префиксом
+/{lang}/) пишутся параллельно в пуле процессов; --workers 0 — без пула.
 """
 import os
+import time
 import asyncio
+import argparse
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, func
-from datetime import datetime
 from dotenv import load_dotenv
 
-from models.review import Review
+from services.reviews_service import ReviewsService
+from services.sitemap_service import (
+    SitemapService,
+    SUPPORTED_LANGS,
+    SITEMAP_DIR,
+    SITEMAP_HREFLANG,
+    SITEMAP_LANGS,
+    company_shard_filename,
+    pages_sitemap_filename,
+    load_manifest,
+    save_manifest,
+    sitemap_exists,
+    shard_marker,
+    shard_urls_source,
+    pages_marker,
+    pages_sitemap_range,
+    utc_today,
+    pages_sitemaps_count,
+    write_pages_sitemap,
+    write_company_shard,
+    write_sitemap_index,
+)
+from helpers.sitemap_writer import GZIP_SUFFIX
 
 load_dotenv()
 
-SUPPORTED_LANGS = ["ru", "en", "uk", "ro"]
-DEFAULT_LANG = "ru"
-SITEMAP_DIR = "static/sitemaps"
 os.makedirs(SITEMAP_DIR, exist_ok=True)
 
 BASE_URL = os.getenv("BASE_URL", "https://safelogist.net").rstrip('/')
+SITEMAP_WORKERS = int(os.getenv("SITEMAP_WORKERS", str(min(len(SUPPORTED_LANGS), os.cpu_count() or 1))))
 
 
-def normalize_lang(lang: str) -> str:
-    lang_code = (lang or "").lower()
-    return lang_code if lang_code in SUPPORTED_LANGS else DEFAULT_LANG
-
-
-def save_sitemap(content: str, filename: str) -> None:
-    """Сохранить sitemap в файл"""
-    filepath = os.path.join(SITEMAP_DIR, filename)
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(content)
-    print(f"✓ Сохранён: {filename}")
-
-
-async def generate_sitemap_pages(db: AsyncSession, lang: str, page_num: int, total_companies: int):
-    """Генерация sitemap для страниц пагинации списка отзывов"""
-    companies_per_page = 10
-    total_pages = max(1, (total_companies + companies_per_page - 1) // companies_per_page)
-    
-    # Максимум 40,000 URL на файл (главная + пагинация)
-    max_urls_per_sitemap = 40000
-    pages_per_sitemap = max_urls_per_sitemap - 1  # -1 для главной страницы
-    
-    start_page = (page_num - 1) * pages_per_sitemap + 1
-    end_page = min(start_page + pages_per_sitemap - 1, total_pages)
-    
-    urls = []
-    
-    # Первая страница только в первом sitemap
-    if page_num == 1:
-        urls.append(f"""  <url>
-    <loc>{BASE_URL}/{lang}/reviews</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>daily</changefreq>
-    <priority>1.0</priority>
-  </url>""")
-        start_page = 2
-    
-    # Страницы пагинации
-    for page in range(start_page, end_page + 1):
-        urls.append(f"""  <url>
-    <loc>{BASE_URL}/{lang}/reviews?page={page}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>daily</changefreq>
-    <priority>0.9</priority>
-  </url>""")
-    
-    if not urls:
-        return False
-    
-    sitemap = f"""<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">
-{chr(10).join(urls)}
-</urlset>
-"""
+def write_pages_task(base_url: str, lang: Optional[str], page_num: int, pages: list[tuple[int, str, str]]) -> list[str]:
+    """Задача пула: sitemap страниц списка; возвращает строки для вывода"""
+    filename = pages_sitemap_filename(lang, page_num)
+    write_pages_sitemap(base_url, lang, page_num, pages)
+    return [f"✓ Сохранён: {filename}"]
 
-    filename = f"sitemap-pages-{lang}-{page_num}.xml"
-    save_sitemap(sitemap, filename)
-    return True
-
-
-async def generate_sitemap_companies(db: AsyncSession, lang: str, page: int, last_subject: str = None):
-    """Генерация sitemap для компаний с лимитом 45,000 URL, но включая ВСЕ страницы каждой компании"""
-    lang_code = normalize_lang(lang)
-    max_urls_per_sitemap = 45000  # Жесткий лимит
-    reviews_per_page = 10
-    
-    # Получаем компании (берем с запасом, чтобы точно хватило)
-    query = (
-        select(
-            Review.subject.label("subject"),
-            func.min(Review.id).label("company_id"),
-            func.count(Review.id).label("reviews_count")
-        )
-        .group_by(Review.subject)
-        .order_by(Review.subject)
-    )
-    
-    # Если есть last_subject, начинаем с него (для продолжения после предыдущего файла)
-    if last_subject:
-        query = query.where(Review.subject > last_subject)
-    
-    query = query.limit(10000)  # Берем с большим запасом
-    result = await db.execute(query)
-    companies = result.all()
-    
-    if not companies:
-        return None, False  # Нет компаний для этой страницы
-    
-    urls = []
-    current_url_count = 0
-    last_processed_subject = None
-    
-    for row in companies:
-        company_id = row.company_id
-        subject = row.subject
-        reviews_count = row.reviews_count or 0
-        total_pages = max(1, (reviews_count + reviews_per_page - 1) // reviews_per_page)
-        
-        # Рассчитываем количество URL для этой компании
-        company_urls_count = total_pages  # 1 главная + (total_pages - 1) пагинации
-        
-        # Проверяем, не превысим ли лимит, добавив ВСЕ страницы этой компании
-        if current_url_count + company_urls_count > max_urls_per_sitemap and current_url_count > 0:
-            # Останавливаемся, не добавляя эту компанию
-            break
-        
-        # Добавляем ВСЕ страницы этой компании
-        # Первая страница (основная)
-        urls.append(f"""  <url>
-    <loc>{BASE_URL}/{lang_code}/reviews/item/{company_id}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.8</priority>
-  </url>""")
-
-        # Все остальные страницы пагинации
-        if total_pages > 1:
-            for page_num in range(2, total_pages + 1):
-                urls.append(f"""  <url>
-    <loc>{BASE_URL}/{lang_code}/reviews/item/{company_id}?page={page_num}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.7</priority>
-  </url>""")
-        
-        current_url_count += company_urls_count
-        last_processed_subject = subject
-    
-    if not urls:
-        return None, False
-    
-    sitemap = f"""<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">
-{chr(10).join(urls)}
-</urlset>
-"""
 
-    filename = f"sitemap-{lang_code}-{page}.xml"
-    save_sitemap(sitemap, filename)
-    print(f"   → {filename}: {current_url_count} URLs")
-    return last_processed_subject, True
-
-
-async def generate_sitemap_index():
-    """Генерация главного sitemap index на основе существующих файлов"""
-    sitemaps = []
-    
-    # Ищем все сгенерированные sitemap файлы
-    for filename in sorted(os.listdir(SITEMAP_DIR)):
-        if filename.startswith("sitemap-") and filename.endswith(".xml"):
-            sitemaps.append(f"""  <sitemap>
-    <loc>{BASE_URL}/{filename}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-  </sitemap>""")
-    
-    sitemap_index = f"""<?xml version="1.0" encoding="UTF-8"?>
-<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/siteindex.xsd">
-{chr(10).join(sitemaps)}
-</sitemapindex>
-"""
+def write_shard_task(
+    base_url: str, lang: Optional[str], page: int, companies: list[tuple[int, int, str, str]]
+) -> list[str]:
+    """Задача пула: один язык шарда компаний (None — общий файл с hreflang)"""
+    filename = company_shard_filename(lang, page)
+    urls_count = write_company_shard(base_url, lang, page, companies)
+    return [f"✓ Сохранён: {filename}", f"   → {filename}: {urls_count} URLs"]
+
+
+class TaskRunner:
+    """
+    Запуск задач записи в пуле процессов с ограничением числа задач в очереди —
+    чтение шардов из БД не уходит далеко вперед записи (в памяти несколько шардов).
+    """
+
+    def __init__(self, workers: int):
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.max_pending = max(1, workers) * 2
+        self.pending = set()
+
+    async def submit(self, func, *args) -> None:
+        if self.pool is None:
+            self._report(func(*args))
+            return
+        while len(self.pending) >= self.max_pending:
+            await self._wait(asyncio.FIRST_COMPLETED)
+        self.pending.add(asyncio.get_running_loop().run_in_executor(self.pool, func, *args))
+
+    async def drain(self) -> None:
+        while self.pending:
+            await self._wait(asyncio.ALL_COMPLETED)
+
+    async def _wait(self, return_when) -> None:
+        done, self.pending = await asyncio.wait(self.pending, return_when=return_when)
+        for future in done:
+            self._report(future.result())
+
+    @staticmethod
+    def _report(lines: list[str]) -> None:
+        for line in lines:
+            print(line)
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def print_phase(name: str, started: float) -> float:
+    """Время фазы; возвращает начало следующей"""
+    now = time.perf_counter()
+    print(f"   ⏱ {name}: {now - started:.2f} с")
+    return now
+
+
+def remove_stale_sitemaps(prefix: str, keep: int) -> None:
+    """Удалить шарды с номерами больше keep (компаний стало меньше)"""
+    suffix = ".xml" + GZIP_SUFFIX
+    for filename in os.listdir(SITEMAP_DIR):
+        if not (filename.startswith(prefix) and filename.endswith(suffix)):
+            continue
+        number = filename[len(prefix):-len(suffix)]
+        if number.isdigit() and int(number) > keep:
+            os.remove(os.path.join(SITEMAP_DIR, filename))
+            print(f"✗ Удалён: {filename}")
+
+
+def remove_stale_pages_sitemaps(keep: int) -> None:
+    """Лишние sitemap страниц списка; файлы другого режима (по языкам / hreflang) — все"""
+    remove_stale_sitemaps("sitemap-pages-", keep if SITEMAP_HREFLANG else 0)
+    for lang in SUPPORTED_LANGS:
+        remove_stale_sitemaps(f"sitemap-pages-{lang}-", 0 if SITEMAP_HREFLANG else keep)
+
 
-    save_sitemap(sitemap_index, "sitemap.xml")
+def remove_stale_company_shards(keep: int) -> None:
+    """Лишние шарды компаний; файлы другого режима (по языкам / hreflang) — все"""
+    remove_stale_sitemaps("sitemap-companies-", keep if SITEMAP_HREFLANG else 0)
+    for lang in SUPPORTED_LANGS:
+        remove_stale_sitemaps(f"sitemap-{lang}-", 0 if SITEMAP_HREFLANG else keep)
+
+
+def remove_plain_sitemaps() -> None:
+    """Удалить несжатые .xml от прежних версий генератора — отдаются только .xml.gz"""
+    for filename in os.listdir(SITEMAP_DIR):
+        if filename.startswith("sitemap") and filename.endswith(".xml"):
+            os.remove(os.path.join(SITEMAP_DIR, filename))
 
 
 async def main():
     """Главная функция"""
+    parser = argparse.ArgumentParser(description="Генерация sitemap")
+    parser.add_argument("--full", action="store_true", help="перезаписать все шарды")
+    parser.add_argument("--workers", type=int, default=SITEMAP_WORKERS, help="процессов записи (0 — без пула)")
+    args = parser.parse_args()
+
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         print("❌ Ошибка: DATABASE_URL не установлен в .env")
@@ -197,54 +171,111 @@ async def main():
     engine = create_async_engine(database_url)
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-    async with async_session() as db:
-        print(f"📊 Генерация sitemap для {BASE_URL}\n")
-
-        # 1. Подсчитываем количество компаний
-        count_query = select(func.count(func.distinct(Review.subject)))
-        count_result = await db.execute(count_query)
-        total_companies = count_result.scalar() or 0
-        
-        print(f"\n1. Найдено компаний: {total_companies}\n")
-        
-        # 2. Генерируем sitemap для страниц пагинации списка отзывов
-        print("2. Генерация sitemap для страниц пагинации...")
-        companies_per_page = 10
-        total_pages = max(1, (total_companies + companies_per_page - 1) // companies_per_page)
-        max_urls_per_sitemap = 40000
-        pages_per_sitemap = max_urls_per_sitemap - 1
-        num_pages_sitemaps = max(1, (total_pages + pages_per_sitemap - 1) // pages_per_sitemap)
-        
-        for lang in SUPPORTED_LANGS:
-            for page_num in range(1, num_pages_sitemaps + 1):
-                await generate_sitemap_pages(db, lang, page_num, total_companies)
-
-        # 3. Генерируем sitemap для компаний
-        print("\n3. Генерация sitemap для компаний...")
-        generated_files = []
-        
-        for lang in SUPPORTED_LANGS:
-            page = 1
-            last_subject = None
+    previous = {} if args.full else load_manifest(BASE_URL)
+    previous_shards = previous.get("shards", [])
+    manifest = {"base_url": BASE_URL, "hreflang": SITEMAP_HREFLANG, "shards": []}
+
+    runner = TaskRunner(args.workers)
+    today = utc_today()
+    started = time.perf_counter()
+    phase_started = started
+
+    try:
+        async with async_session() as db:
+            print(f"📊 Генерация sitemap для {BASE_URL}")
+            print(f"   Режим: {'один набор с hreflang' if SITEMAP_HREFLANG else 'отдельно по языкам'}\n")
+
+            service = SitemapService(db)
+
+            # 1. Подсчитываем количество компаний (все компании списка /{lang}/reviews)
+            total_companies = await service.count_companies()
+            manifest["total_companies"] = total_companies
+            
+            print(f"\n1. Найдено компаний: {total_companies}\n")
+
+            # Якоря страниц списка компаний — страницы из sitemap открываются без OFFSET
+            anchors_count = await ReviewsService(db).rebuild_companies_page_anchors()
+            print(f"   Якорей страниц списка: {anchors_count}")
+            phase_started = print_phase("компании и якоря", phase_started)
+            print()
             
-            while True:
-                last_subject, success = await generate_sitemap_companies(db, lang, page, last_subject)
-                if not success:
-                    break  # Нет больше компаний
-                generated_files.append(f"sitemap-{lang}-{page}.xml")
+            # 2. Генерируем sitemap для страниц пагинации списка отзывов
+            print("2. Генерация sitemap для страниц пагинации...")
+            num_pages_sitemaps = pages_sitemaps_count(total_companies, BASE_URL)
+
+            previous_pages = previous.get("pages", [])
+            manifest["pages"] = []
+            pages_rewritten = 0
+
+            for page_num in range(1, num_pages_sitemaps + 1):
+                first_page, last_page = pages_sitemap_range(page_num, total_companies, BASE_URL)
+                pages = await service.get_list_pages(first_page, last_page, today)
+                marker = pages_marker(pages)
+                manifest["pages"].append(marker)
+
+                unchanged = (
+                    page_num <= len(previous_pages)
+                    and previous_pages[page_num - 1] == marker
+                    and all(sitemap_exists(pages_sitemap_filename(lang, page_num)) for lang in SITEMAP_LANGS)
+                )
+                if unchanged:
+                    continue
+
+                for lang in SITEMAP_LANGS:
+                    await runner.submit(write_pages_task, BASE_URL, lang, page_num, pages)
+                pages_rewritten += 1
+
+            await runner.drain()
+            remove_stale_pages_sitemaps(num_pages_sitemaps)
+
+            print(f"   Sitemap страниц: {num_pages_sitemaps}, перезаписано: {pages_rewritten}")
+            phase_started = print_phase("страницы списка", phase_started)
+
+            # 3. Генерируем sitemap для компаний — только измененные шарды
+            print("\n3. Генерация sitemap для компаний...")
+            rewritten = 0
+            skipped = 0
+            page = 0
+
+            async for companies, urls_count in service.iter_company_shards(BASE_URL):
                 page += 1
-        
-        print(f"\n   Сгенерировано файлов: {len(generated_files)}")
+                # Один список на все языки, каждый язык — отдельная задача пула
+                urls_source = shard_urls_source(companies, today)
+                marker = shard_marker(companies, urls_count, urls_source)
+                manifest["shards"].append(marker)
+
+                unchanged = (
+                    page <= len(previous_shards)
+                    and previous_shards[page - 1] == marker
+                    and all(sitemap_exists(company_shard_filename(lang, page)) for lang in SITEMAP_LANGS)
+                )
+                if unchanged:
+                    skipped += 1
+                    continue
+
+                for lang in SITEMAP_LANGS:
+                    await runner.submit(write_shard_task, BASE_URL, lang, page, urls_source)
+                rewritten += 1
 
-        # 4. Генерируем главный sitemap index
-        print("\n4. Генерация sitemap.xml (index)...")
-        await generate_sitemap_index()
+            await runner.drain()
+            remove_stale_company_shards(page)
 
-        print(f"\n✅ Генерация завершена! Все файлы сохранены в {SITEMAP_DIR}/")
+            print(f"\n   Шардов: {page}, перезаписано: {rewritten}, без изменений: {skipped}")
+            phase_started = print_phase("шарды компаний", phase_started)
 
-    await engine.dispose()
+            # 4. Генерируем главный sitemap index
+            print("\n4. Генерация sitemap.xml (index)...")
+            remove_plain_sitemaps()
+            write_sitemap_index(BASE_URL)
+            print("✓ Сохранён: sitemap.xml")
+            save_manifest(manifest)
+            print_phase("sitemap index", phase_started)
+
+            print(f"\n✅ Генерация завершена за {time.perf_counter() - started:.2f} с! Все файлы сохранены в {SITEMAP_DIR}/")
+    finally:
+        runner.close()
+        await engine.dispose()
 
 
 if __name__ == "__main__":
     asyncio.run(main())
-
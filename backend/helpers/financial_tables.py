@@ -0,0 +1,98 @@
+"""
+Предрасчет финансовых таблиц отчетов Молдовы для страницы компании
+
+Из detailed_data отчета один раз (при сохранении/импорте) строятся:
+  - key_figures — ключевые показатели для SEO описания (активы, капитал, ...)
+  - groups — переведенные таблицы по языкам: {lang: [{"title", "rows": [...]}]}
+
+Результат хранится в reviews.financial_tables, страница только выбирает язык.
+Пересчет существующих отчетов: python update_financial_tables.py
+"""
+from typing import Optional
+
+from helpers.financial_translations import get_translated_group_name, get_translated_indicator
+from helpers.translations import SUPPORTED_LANGS
+
+# Увеличивается при изменении формата или переводов — устаревшие таблицы пересчитываются
+FINANCIAL_TABLES_VERSION = 1
+
+
+def extract_key_figures(groups: list) -> dict:
+    """Ключевые показатели для SEO: последнее найденное значение по каждому ключу"""
+    key_figures = {}
+    for group in groups:
+        fields = group.get('fields', [])
+        for field in fields:
+            name = field.get('name', '').lower()
+            current = field.get('dateCurrent', '')
+            if not isinstance(current, str) or not current.strip():
+                continue
+            # Итого активы
+            if 'total active' in name or 'итого активы' in name:
+                key_figures['assets'] = current
+            # Итого внеоборотные активы
+            elif 'total active imobilizate' in name or 'итого внеоборотные активы' in name:
+                key_figures['fixed_assets'] = current
+            # Итого оборотные активы
+            elif 'total active circulante' in name or 'итого оборотные активы' in name:
+                key_figures['current_assets'] = current
+            # Денежные средства
+            elif 'numerar' in name or 'денежные средства' in name:
+                key_figures['cash'] = current
+            # Уставный капитал
+            elif 'capital social' in name or 'уставный капитал' in name or 'уставний капітал' in name:
+                key_figures['capital'] = current
+    return key_figures
+
+
+def build_financial_groups(groups: list, lang: str) -> list:
+    """Таблицы отчета на одном языке: группы с переведенными названиями показателей"""
+    financial_groups = []
+    for group in groups:
+        group_name = group.get("name", "")
+        fields = group.get("fields", [])
+        rows = []
+        for field in fields:
+            code = field.get("code", "")
+            name = field.get("name", "")
+            date_prev = field.get("datePrev", "")
+            date_current = field.get("dateCurrent", "")
+            if date_prev or date_current:
+                rows.append({
+                    "code": code,
+                    "name": get_translated_indicator(code, name, lang),
+                    "date_prev": date_prev if date_prev else "—",
+                    "date_current": date_current if date_current else "—",
+                })
+        if rows:
+            financial_groups.append({
+                "title": get_translated_group_name(group_name, lang),
+                "rows": rows,
+            })
+    return financial_groups
+
+
+def build_financial_tables(detailed_data) -> Optional[dict]:
+    """Значение для reviews.financial_tables; None — в отчете нет групп показателей"""
+    if not detailed_data or not isinstance(detailed_data, dict) or 'groups' not in detailed_data:
+        return None
+
+    groups = detailed_data['groups'] or []
+    return {
+        "version": FINANCIAL_TABLES_VERSION,
+        "key_figures": extract_key_figures(groups),
+        "groups": {lang: build_financial_groups(groups, lang) for lang in SUPPORTED_LANGS},
+    }
+
+
+def get_financial_tables(review) -> Optional[dict]:
+    """
+    Сохраненные таблицы отчета; если их еще нет или формат устарел —
+    строятся на лету из detailed_data (до запуска update_financial_tables.py)
+    """
+    if review is None:
+        return None
+    tables = getattr(review, "financial_tables", None)
+    if tables and tables.get("version") == FINANCIAL_TABLES_VERSION:
+        return tables
+    return build_financial_tables(getattr(review, "detailed_data", None))
@@ -3,6 +3,8 @@
 Названия групп (BILANȚUL, SITUAȚIA DE PROFIT ȘI PIERDERE и т.д.)
 и названия показателей по кодам
 """
+from bisect import bisect_left
+from functools import lru_cache
 
 # Переводы названий групп (разделов) финансовых отчетов
 FINANCIAL_GROUP_NAMES = {
@@ -1031,6 +1033,67 @@ def get_translated_group_name(original_name: str, lang: str) -> str:
     return translations.get(original_name, original_name)
 
 
+class _IndicatorNameIndex:
+    """
+    Индекс FINANCIAL_INDICATORS_BY_NAME для частичного совпадения названия.
+
+    Повторяет линейный проход по словарю: из всех ключей, которые являются
+    началом названия или начинаются с очищенного названия, выбирается первый
+    по порядку в словаре. Ключи-префиксы названия ищутся проходом по префиксному
+    дереву (обычно обрывается на первых символах), ключи с началом clean_name —
+    диапазоном в отсортированном списке.
+    """
+
+    def __init__(self, indicators: dict, lang: str):
+        self.translations = []
+        order_by_key = {}
+        for name_key, trans in indicators.items():
+            if lang in trans and name_key not in order_by_key:
+                order_by_key[name_key] = len(self.translations)
+                self.translations.append(trans[lang])
+
+        # Префиксное дерево: символ -> узел, в узле под ключом None — порядок ключа
+        self.trie = {}
+        for name_key, order in order_by_key.items():
+            node = self.trie
+            for char in name_key:
+                node = node.setdefault(char, {})
+            node[None] = order
+
+        self.sorted_keys = sorted(order_by_key)
+        self.sorted_orders = [order_by_key[name_key] for name_key in self.sorted_keys]
+
+    def find(self, original_name: str, clean_name: str):
+        best = None
+        # Ключи, с которых начинается название
+        node = self.trie
+        for char in original_name:
+            node = node.get(char)
+            if node is None:
+                break
+            order = node.get(None)
+            if order is not None and (best is None or order < best):
+                best = order
+        # Ключи, которые начинаются с очищенного названия
+        lo = bisect_left(self.sorted_keys, clean_name)
+        hi = bisect_left(self.sorted_keys, clean_name + "\U0010ffff")
+        if lo < hi:
+            order = min(self.sorted_orders[lo:hi])
+            if best is None or order < best:
+                best = order
+        return self.translations[best] if best is not None else None
+
+
+# Строится один раз при импорте модуля
+_INDICATOR_NAME_INDEX = {
+    lang: _IndicatorNameIndex(FINANCIAL_INDICATORS_BY_NAME, lang)
+    for lang in ("ru", "en", "uk")
+}
+
+# Размер кэша переводов (code, name, lang) — поля отчетов сильно повторяются
+INDICATOR_CACHE_SIZE = 8192
+
+
 def get_translated_indicator(code: str, original_name: str, lang: str) -> str:
     """
     Получить перевод показателя по коду или названию.
@@ -1043,7 +1106,12 @@ def get_translated_indicator(code: str, original_name: str, lang: str) -> str:
     # Если язык румынский - возвращаем оригинал
     if lang == "ro":
         return original_name
-    
+
+    return _translate_indicator(code, original_name, lang)
+
+
+@lru_cache(maxsize=INDICATOR_CACHE_SIZE)
+def _translate_indicator(code: str, original_name: str, lang: str) -> str:
     # Пробуем найти по коду
     if code in FINANCIAL_INDICATORS:
         indicator_trans = FINANCIAL_INDICATORS[code]
@@ -1066,10 +1134,9 @@ def get_translated_indicator(code: str, original_name: str, lang: str) -> str:
             return trans[lang]
     
     # Ищем частичное совпадение (начало строки)
-    for name_key, trans in FINANCIAL_INDICATORS_BY_NAME.items():
-        if original_name.startswith(name_key) or name_key.startswith(clean_name):
-            if lang in trans:
-                return trans[lang]
+    translated = _INDICATOR_NAME_INDEX[lang].find(original_name, clean_name)
+    if translated is not None:
+        return translated
     
     # Возвращаем оригинал если перевод не найден
     return original_name
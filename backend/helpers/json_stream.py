@@ -0,0 +1,192 @@
+"""
+Потоковый разбор больших JSON дампов вида { "ключ": [ {...}, {...}, ... ] }
+
+Байты читаются блоками через readinto в один bytearray (memoryview без копий)
+и инкрементально декодируются — UTF-8 символ может быть разрезан границей блока.
+Объекты разбираются json raw_decode прямо в буфере по курсору: буфер не режется
+после каждого объекта, разобранный текст отбрасывается один раз на прочитанный
+блок. Объект, не поместившийся в буфер, дочитывается так, что доступный текст
+каждый раз растет вдвое — время разбора линейно от размера файла.
+
+read_chunks — куски файла из целых записей (JSON или JSONL) для конвейеров импорта,
+line_ranges — те же куски JSONL как диапазоны байт (файл читают процессы разбора).
+"""
+import codecs
+import json
+import mmap
+import os
+import re
+from typing import BinaryIO, Iterator
+
+READ_SIZE = 1024 * 1024
+MAX_RECORD_SIZE = 256 * 1024 * 1024
+
+# Пробельные символы JSON — только ASCII, их длина в символах равна длине в байтах
+_SEPARATORS = re.compile(r"[ \t\r\n,]*")
+_HEAD = re.compile(r'[ \t\r\n]*(?:\{[ \t\r\n]*"(?:[^"\\]|\\.)*"[ \t\r\n]*:[ \t\r\n]*)?\[')
+_HEAD_MAX_SIZE = 64 * 1024
+
+_END = object()
+
+
+class _ArrayCursor:
+    """Курсор по элементам массива; keep >= 0 — начало текста, сохраняемого при дочитывании"""
+
+    def __init__(self, f: BinaryIO, read_size: int, max_record_size: int):
+        self._f = f
+        self._raw = bytearray(read_size)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._max_record_size = max_record_size
+        self._eof = False
+        self.buf = ""
+        self.pos = 0
+        self.keep = -1
+        self.start = 0  # начало последнего элемента
+        self.gap = 0  # символов-разделителей перед последним элементом
+
+    def _fill(self, need: int) -> None:
+        """Сдвинуть буфер и дочитать не меньше need символов (или до конца файла)"""
+        keep = self.keep if self.keep >= 0 else self.pos
+        parts = [self.buf[keep:]]
+        got = 0
+        while got < need and not self._eof:
+            with memoryview(self._raw) as view:
+                read = self._f.readinto(view)
+                text = self._decoder.decode(view[:read], final=not read)
+            self._eof = not read
+            parts.append(text)
+            got += len(text)
+        self.buf = "".join(parts)
+        self.pos -= keep
+        self.start -= keep
+        if self.keep >= 0:
+            self.keep -= keep
+
+    def open(self) -> str:
+        """Пропустить все до открывающей скобки массива, вернуть пропущенный текст"""
+        while True:
+            match = _HEAD.match(self.buf)
+            if match:
+                self.pos = match.end()
+                return self.buf[:self.pos]
+            if self._eof or len(self.buf) > _HEAD_MAX_SIZE:
+                raise ValueError("Массив не найден в начале файла")
+            self._fill(len(self._raw))
+
+    def next_element(self):
+        """Следующий элемент (курсор встает за ним) или _END на закрывающей скобке"""
+        self.gap = 0
+        while True:
+            pos = _SEPARATORS.match(self.buf, self.pos).end()
+            self.gap += pos - self.pos
+            self.pos = pos
+            if pos < len(self.buf):
+                char = self.buf[pos]
+                if char == "]":
+                    return _END
+                if char not in "{[":
+                    raise ValueError(f"Ожидался объект, найдено {char!r}")
+                try:
+                    obj, end = self._json.raw_decode(self.buf, pos)
+                except json.JSONDecodeError as e:
+                    if self._eof:
+                        raise ValueError(f"Некорректный JSON: {e}") from None
+                    if len(self.buf) - pos > self._max_record_size:
+                        raise ValueError(f"Объект больше {self._max_record_size} символов") from None
+                else:
+                    self.start = pos
+                    self.pos = end
+                    return obj
+            elif self._eof:
+                raise ValueError("Неожиданный конец файла")
+            # Объект не дочитан: доступный текст от его начала растет минимум вдвое
+            self._fill(max(len(self._raw), len(self.buf) - pos))
+
+
+def stream_array(path: str, read_size: int = READ_SIZE, max_record_size: int = MAX_RECORD_SIZE) -> Iterator[dict]:
+    """Объекты первого массива в JSON файле по одному"""
+    with open(path, "rb") as f:
+        cursor = _ArrayCursor(f, read_size, max_record_size)
+        cursor.open()
+        while True:
+            obj = cursor.next_element()
+            if obj is _END:
+                return
+            yield obj
+
+
+def scan_array(
+    f: BinaryIO,
+    chunk_size: int,
+    read_size: int = READ_SIZE,
+    max_record_size: int = MAX_RECORD_SIZE,
+    start: int = 0,
+) -> Iterator[tuple[bytes, int]]:
+    """
+    Массив кусками из целых объектов: (байты куска, смещение его конца в файле).
+    Объекты копятся, пока кусок не наберет chunk_size символов; разделители между
+    ними остаются как в файле — json.loads(b"[" + кусок + b"]") дает его объекты.
+    start — смещение конца ранее выданного куска: разбор продолжается с него.
+    """
+    cursor = _ArrayCursor(f, read_size, max_record_size)
+    if start:
+        f.seek(start)
+        offset = start
+    else:
+        offset = len(cursor.open().encode("utf-8"))  # байтовое смещение cursor.pos
+    chunk_offset = 0
+    while True:
+        obj = cursor.next_element()
+        if obj is _END:
+            break
+        if cursor.keep < 0:
+            cursor.keep = cursor.start
+            chunk_offset = offset + cursor.gap
+        if cursor.pos - cursor.keep >= chunk_size:
+            data = cursor.buf[cursor.keep:cursor.pos].encode("utf-8")
+            offset = chunk_offset + len(data)
+            cursor.keep = -1
+            yield data, offset
+    if cursor.keep >= 0:
+        data = cursor.buf[cursor.keep:cursor.pos].encode("utf-8")
+        yield data, chunk_offset + len(data)
+
+
+def read_chunks(path: str, kind: str, chunk_size: int, start: int = 0) -> Iterator[tuple[bytes, int]]:
+    """
+    Файл JSON (kind="json", массив объектов) или JSONL кусками из целых записей,
+    начиная с границы записи start: (байты куска, смещение его конца в файле)
+    """
+    with open(path, "rb") as f:
+        if kind == "json":
+            yield from scan_array(f, chunk_size, start=start)
+            return
+        f.seek(start)
+        offset = start
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            if not data.endswith(b"\n"):
+                data += f.readline()
+            offset += len(data)
+            yield data, offset
+
+
+def line_ranges(path: str, chunk_size: int, start: int = 0) -> Iterator[tuple[int, int]]:
+    """
+    Границы кусков JSONL без чтения содержимого: (начало, конец) диапазонов по
+    границам строк — те же, что у read_chunks. Ищется только перевод строки после
+    каждых chunk_size байт mmap, затрагивается одна страница файла на кусок.
+    """
+    size = os.path.getsize(path)
+    if start >= size:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        pos = start
+        while pos < size:
+            newline = mapped.find(b"\n", min(pos + chunk_size, size) - 1)
+            end = size if newline < 0 else newline + 1
+            yield pos, end
+            pos = end
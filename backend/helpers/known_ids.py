@@ -0,0 +1,162 @@
+"""
+Фильтры уже загруженных ключей (review_id) для импорта — до записи в БД
+
+Два варианта:
+  - KnownIdSet — точный набор самих ключей. Если все ключи — десятичные числа,
+    это отсортированный array('q') (8 байт на ключ), иначе — ключи подряд в одном
+    отсортированном UTF-8 буфере с массивом смещений (длина ключа + 4–8 байт).
+    Поиск — bisect, ответ точный: известные записи отбрасываются без запроса к БД.
+  - BloomFilter — битовый массив на заданную долю ложных срабатываний
+    (~1.2 байта на ключ при 1%) по 64-битному хэшу blake2b (в отличие от hash()
+    он одинаков во всех процессах разбора). Положительный ответ — "возможно
+    известен", его нужно проверить в БД.
+"""
+import math
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from typing import Iterable, Optional
+
+
+def id_hash(key: str) -> int:
+    """64-битный хэш ключа, одинаковый во всех процессах"""
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# Самое длинное число, которое точно помещается в array('q')
+_MAX_NUMERIC_DIGITS = 18
+
+
+def numeric_id(key: str) -> Optional[int]:
+    """Ключ как число, если он записан каноническим десятичным числом (без знака и ведущих нулей)"""
+    if (
+        0 < len(key) <= _MAX_NUMERIC_DIGITS
+        and key.isascii()
+        and key.isdigit()
+        and (key[0] != "0" or key == "0")
+    ):
+        return int(key)
+    return None
+
+
+class _SortedKeys:
+    """Ключи UTF-8 буфера как последовательность bytes — для bisect без списка строк"""
+
+    def __init__(self, buffer: bytes, offsets: array):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, pos: int) -> bytes:
+        return self.buffer[self.offsets[pos]:self.offsets[pos + 1]]
+
+
+class KnownIdSet:
+    """
+    Точный компактный набор ключей.
+    Ключи, пришедшие в порядке байтов UTF-8 (ORDER BY ... COLLATE "C"), не сортируются повторно.
+    """
+
+    exact = True
+
+    def __init__(self, keys: Iterable[str]):
+        numbers: Optional[array] = array("q")
+        buffer = bytearray()
+        offsets = array("Q", [0])
+        previous = None
+        in_order = True
+        for key in keys:
+            encoded = key.encode("utf-8")
+            if previous is not None:
+                if encoded == previous:
+                    continue
+                in_order = in_order and previous < encoded
+            previous = encoded
+            buffer += encoded
+            offsets.append(len(buffer))
+            if numbers is not None:
+                value = numeric_id(key)
+                if value is None:
+                    numbers = None
+                else:
+                    numbers.append(value)
+
+        self._numbers: Optional[array] = None
+        self._keys: Optional[_SortedKeys] = None
+        if numbers is not None:
+            self._numbers = array("q", sorted(set(numbers)))
+            return
+        if not in_order:
+            parts = sorted({bytes(buffer[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)})
+            buffer = bytearray().join(parts)
+            offsets = array("Q", [0])
+            total = 0
+            for part in parts:
+                total += len(part)
+                offsets.append(total)
+            del parts
+        if offsets[-1] < 2 ** 32:
+            offsets = array("I", offsets)
+        self._keys = _SortedKeys(bytes(buffer), offsets)
+
+    def __len__(self) -> int:
+        return len(self._numbers) if self._numbers is not None else len(self._keys)
+
+    @property
+    def nbytes(self) -> int:
+        if self._numbers is not None:
+            return len(self._numbers) * self._numbers.itemsize
+        offsets = self._keys.offsets
+        return len(self._keys.buffer) + len(offsets) * offsets.itemsize
+
+    def __contains__(self, key: str) -> bool:
+        if self._numbers is not None:
+            value = numeric_id(key)
+            if value is None:
+                return False
+            values = self._numbers
+        else:
+            value = key.encode("utf-8")
+            values = self._keys
+        pos = bisect_left(values, value)
+        return pos < len(values) and values[pos] == value
+
+
+class BloomFilter:
+    """Фильтр Блума: "нет" — точно не известен, "да" — известен с ошибкой fpr"""
+
+    exact = False
+
+    def __init__(self, capacity: int, fpr: float):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(fpr) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def _positions(self, value: int):
+        # Двойное хэширование: k позиций из двух половин 64-битного хэша
+        h1, h2 = value & 0xFFFFFFFF, (value >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add_hash(self, value: int) -> None:
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self._count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        for pos in self._positions(id_hash(key)):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
@@ -0,0 +1,137 @@
+"""
+In-process кэш отрендеренных SSR страниц отзывов (LRU + TTL, учет размера в байтах)
+
+Страницы кэшируются с тегами (название компании, списки). При изменении данных
+компании через админку, заявки на отзывы или заявки на компанию вызывается
+invalidate_company — удаляются страницы компании и все страницы списков/поиска.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+# Тег для страниц списка и поиска — зависят от всех компаний сразу
+LIST_TAG = "__lists__"
+
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "5000"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "600"))
+
+
+def company_tag(company_name: str) -> str:
+    return f"company:{company_name}"
+
+
+class PageCache:
+    """LRU кэш страниц с ограничением по количеству, суммарному размеру и времени жизни"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (body, expires_at, tags)
+        self._entries: "OrderedDict[tuple, tuple[bytes, float, tuple[str, ...]]]" = OrderedDict()
+        self._tags: dict[str, set[tuple]] = {}
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        """Получить тело страницы или None (промах / истек TTL)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        body, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, key: tuple, body: bytes, tags: Iterable[str] = ()) -> None:
+        """Сохранить страницу; при переполнении вытесняются давно не используемые"""
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        tags = tuple(tags)
+        self._entries[key] = (body, time.monotonic() + self.ttl, tags)
+        self.size_bytes += len(body)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, tag: str) -> int:
+        """Удалить все страницы с тегом, вернуть их количество"""
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def invalidate_company(self, company_name: Optional[str]) -> None:
+        """Сбросить страницы компании и все страницы списков/поиска"""
+        if company_name:
+            self.invalidate(company_tag(company_name))
+        self.invalidate(LIST_TAG)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        body, _, tags = entry
+        self.size_bytes -= len(body)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+page_cache = PageCache(
+    max_entries=PAGE_CACHE_MAX_ENTRIES,
+    max_bytes=PAGE_CACHE_MAX_BYTES,
+    ttl=PAGE_CACHE_TTL,
+)
@@ -0,0 +1,138 @@
+"""
+Потоковая запись sitemap в .xml.gz
+
+XML пишется по одному URL сразу в gzip поток — память не зависит от размера шарда.
+Файл пишется во временный и атомарно переименовывается, читатели никогда не видят
+недописанный sitemap. gzip без имени файла и с mtime=0 — одинаковое содержимое
+дает побайтно одинаковый файл.
+"""
+import gzip
+import io
+import os
+import tempfile
+
+URLSET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 '
+    'http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">\n'
+)
+URLSET_FOOTER = "\n</urlset>\n"
+
+# urlset с языковыми версиями страниц (<xhtml:link rel="alternate" hreflang>)
+URLSET_HREFLANG_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:xhtml="http://www.w3.org/1999/xhtml">\n'
+)
+
+# Лимиты протокола sitemap на один файл
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024  # без сжатия
+
+SITEMAPINDEX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 '
+    'http://www.sitemaps.org/schemas/sitemap/0.9/siteindex.xsd">\n'
+)
+SITEMAPINDEX_FOOTER = "\n</sitemapindex>\n"
+
+GZIP_SUFFIX = ".gz"
+
+
+def gz_path(directory: str, filename: str) -> str:
+    """Путь к сжатому файлу для публичного имени sitemap (sitemap-ru-1.xml)"""
+    return os.path.join(directory, filename + GZIP_SUFFIX)
+
+
+def make_tmp_file(path: str) -> tuple[int, str]:
+    """
+    Уникальный временный файл рядом с path (тот же каталог — os.replace атомарен).
+    Пересборки идут в потоках одного процесса, имя от pid у них совпало бы.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    # mkstemp создает файл с правами 0600, а sitemap раздает nginx
+    os.fchmod(fd, 0o644)
+    return fd, tmp_path
+
+
+def format_url(loc: str, lastmod: str, changefreq: str, priority: str, alternates: tuple = ()) -> str:
+    """Элемент <url>; alternates — (hreflang, href) языковых версий страницы"""
+    links = "".join(
+        f'\n    <xhtml:link rel="alternate" hreflang="{hreflang}" href="{href}"/>'
+        for hreflang, href in alternates
+    )
+    return f"""  <url>
+    <loc>{loc}</loc>{links}
+    <lastmod>{lastmod}</lastmod>
+    <changefreq>{changefreq}</changefreq>
+    <priority>{priority}</priority>
+  </url>"""
+
+
+class SitemapWriter:
+    """
+    Запись одного sitemap файла:
+
+        with SitemapWriter(path) as writer:
+            writer.add_url(loc, lastmod, "weekly", "0.8")
+    """
+
+    def __init__(self, path: str, header: str = URLSET_HEADER, footer: str = URLSET_FOOTER):
+        self.path = path
+        self.header = header
+        self.footer = footer
+        self.urls_count = 0
+        self._tmp_path = None
+        self._raw = None
+        self._gzip = None
+        self._text = None
+
+    def __enter__(self) -> "SitemapWriter":
+        fd, self._tmp_path = make_tmp_file(self.path)
+        self._raw = os.fdopen(fd, "wb")
+        self._gzip = gzip.GzipFile(filename="", mode="wb", fileobj=self._raw, mtime=0)
+        self._text = io.TextIOWrapper(self._gzip, encoding="utf-8", newline="\n", write_through=False)
+        self._text.write(self.header)
+        return self
+
+    def write_entry(self, fragment: str) -> None:
+        """Добавить готовый XML элемент (<url> или <sitemap>)"""
+        if self.urls_count:
+            self._text.write("\n")
+        self._text.write(fragment)
+        self.urls_count += 1
+
+    def add_url(
+        self, loc: str, lastmod: str, changefreq: str, priority: str, alternates: tuple = ()
+    ) -> None:
+        self.write_entry(format_url(loc, lastmod, changefreq, priority, alternates))
+
+    def add_sitemap(self, loc: str, lastmod: str) -> None:
+        self.write_entry(f"""  <sitemap>
+    <loc>{loc}</loc>
+    <lastmod>{lastmod}</lastmod>
+  </sitemap>""")
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self._text.write(self.footer)
+            self._text.close()  # закрывает gzip поток
+            self._raw.close()
+            if exc_type is None:
+                os.replace(self._tmp_path, self.path)
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+
+def read_sitemap(path: str) -> bytes:
+    """Распакованное содержимое .xml.gz"""
+    with gzip.open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,65 @@
+"""
+Потоковый рендер Jinja шаблонов (async generate + StreamingResponse)
+
+Для тяжелых страниц (страница компании с финансовыми таблицами и JSON-LD):
+<head> с CSS отправляется клиенту сразу, остальная страница — частями
+по мере рендера, не дожидаясь сборки всего HTML.
+"""
+import logging
+import os
+from typing import Callable, Optional
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_STREAMING = os.getenv("TEMPLATE_STREAMING", "1") == "1"
+TEMPLATE_STREAM_CHUNK_SIZE = int(os.getenv("TEMPLATE_STREAM_CHUNK_SIZE", "16384"))
+
+# Отдельное окружение с enable_async — обычный Jinja2Templates рендерит синхронно
+stream_templates = Jinja2Templates(directory="templates", enable_async=True)
+
+
+def stream_template_response(
+    name: str,
+    context: dict,
+    on_complete: Optional[Callable[[bytes], None]] = None,
+    status_code: int = 200,
+) -> StreamingResponse:
+    """
+    Ответ с потоковым рендером шаблона.
+    on_complete получает полное тело страницы после успешного рендера (для кэша).
+    """
+    template = stream_templates.get_template(name)
+
+    async def body():
+        pending: list[bytes] = []
+        pending_size = 0
+        head_sent = False
+        rendered: list[bytes] = []
+
+        try:
+            async for piece in template.generate_async(context):
+                chunk = piece.encode("utf-8")
+                pending.append(chunk)
+                pending_size += len(chunk)
+                # Первым отправляется <head> целиком, дальше — блоками
+                if (not head_sent and "</head>" in piece) or pending_size >= TEMPLATE_STREAM_CHUNK_SIZE:
+                    head_sent = True
+                    data = b"".join(pending)
+                    rendered.append(data)
+                    pending, pending_size = [], 0
+                    yield data
+        except Exception:
+            logger.exception("Ошибка потокового рендера шаблона %s", name)
+            raise
+
+        data = b"".join(pending)
+        if data:
+            rendered.append(data)
+            yield data
+        if on_complete is not None:
+            on_complete(b"".join(rendered))
+
+    return StreamingResponse(body(), status_code=status_code, media_type="text/html")
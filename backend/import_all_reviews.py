@@ -3,19 +3,136 @@
 1) JSON { "reviews_b2bhintcompany": [ {...}, ... ] } — reviews_b2bhintcompany_202508191624.json
 2) JSONL — reviews_review.jsonl
 
-Стримовый парсер массива, батчи 200, ON CONFLICT DO NOTHING.
-Пропускает записи без name/subject.
+Конвейер: чтение файла кусками из целых записей (helpers/json_stream.py для JSON,
+границы строк для JSONL) -> процессы разбора (json + преобразование в строки
+reviews) -> ограниченная очередь -> несколько соединений записи. Размер очереди
+ограничивает чтение и разбор, когда запись не успевает (backpressure).
+--mmap для JSONL: файл отображается в память, основной процесс только делит его на
+диапазоны байт по границам строк (куски того же размера), процессы разбора читают
+свой диапазон из собственного mmap — байты файла не проходят через основной процесс.
+Пропускает записи без name/subject и с полями неподходящих типов. Поля отчета
+moldovafinreport (fiscal_code, report_year, detailed_data, ...) переносятся вместе с
+reviews.financial_tables, построенными при разборе (helpers/financial_tables.py), —
+страница компании не строит таблицы на каждый запрос.
+
+Запись по умолчанию — INSERT ... ON CONFLICT DO NOTHING на кусок; компании
+действительно вставленных строк в той же транзакции пишутся в reviews_import_touched.
+
+Режим --copy для больших дампов: куски идут через COPY (asyncpg
+copy_records_to_table) в UNLOGGED таблицу reviews_import_staging, затем переносятся
+в reviews одним INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+Последняя стадия — статистика companies (reviews_count, min_review_id, ...) только
+затронутых компаний одним upsert из агрегата (CompanyStatsService.refresh); в отчете —
+сколько компаний создано и обновлено.
+
+После каждого зафиксированного куска рядом с файлом пишется контрольная точка
+(<файл>.import-checkpoint.json): размер, mtime и inode файла, смещение, до которого
+все куски записаны, число записей и строк. --resume продолжает с этого смещения,
+если файл и режим не изменились; в режиме --copy staging сохраняется и его число
+строк сверяется с контрольной точкой. Список затронутых компаний режима INSERT
+удаляется только после пересчета их статистики — и при --resume, и при новом запуске
+после сбоя. Импортированный до конца файл остается отмеченным в своей
+контрольной точке (done) и при --resume пропускается; контрольные точки удаляются
+после успешного импорта обоих файлов и в начале запуска без --resume.
+
+--skip-known set|bloom: при старте review_id из reviews загружаются в фильтр
+(helpers/known_ids.py), и записи с известными review_id отбрасываются еще при
+разборе. set — точный набор самих review_id (отсортированные числа или UTF-8 буфер),
+его совпадения отбрасываются без запроса к БД; bloom — фильтр Блума с долей ложных
+срабатываний --bloom-fpr, его срабатывания проверяются в БД одним чтением на кусок.
+
+В конце — скорость каждой стадии, дубликаты, отклоненные и пропущенные известные записи.
+
+Запуск: python import_all_reviews.py [--copy] [--resume] [--json PATH] [--jsonl PATH]
+        [--workers N] [--writers M] [--queue-size K] [--chunk-kb KB]
+        [--skip-known set|bloom] [--bloom-fpr P] [--mmap]
 """
+import os
+import glob
 import json
+import mmap
+import time
 import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from sqlalchemy.dialects.postgresql import insert
+from typing import Optional
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
 from database import AsyncSessionLocal
+from helpers.financial_tables import build_financial_tables
+from helpers.json_stream import read_chunks, line_ranges
+from helpers.known_ids import KnownIdSet, BloomFilter, id_hash
 from models.review import Review
+from services.company_stats_service import CompanyStatsService
 
 JSON_PATH = "reviews_b2bhintcompany_202508191624.json"
 JSONL_PATH = "reviews_review.jsonl"
-BATCH = 200
+
+# Конвейер
+CHUNK_KB = 1024  # Кусок файла — единица разбора и записи (одна транзакция)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 1)))
+IMPORT_WRITERS = int(os.getenv("IMPORT_WRITERS", "4"))
+IMPORT_QUEUE_SIZE = int(os.getenv("IMPORT_QUEUE_SIZE", "8"))
+PROGRESS_EVERY = 100000  # Строк между сообщениями о ходе записи
+
+CHECKPOINT_SUFFIX = ".import-checkpoint.json"
+
+# --skip-known
+KNOWN_IDS_BATCH = 100000  # review_id за одно чтение при загрузке фильтра
+BLOOM_FPR = 0.01
+TOUCHED_TABLE = "reviews_import_touched"  # Компании вставленных строк до пересчета статистики
+
+# Режим --copy
+STAGING_TABLE = "reviews_import_staging"
+STAGING_CHUNK_COLUMN = "import_chunk"  # Номер куска строки staging — для --resume
+MAX_PRINTED_ERRORS = 10
+
+# Колонки reviews, которые заполняет импорт (порядок записей COPY)
+IMPORT_COLUMNS = (
+    "id", "subject", "review_id", "comment", "reviewer", "rating", "status",
+    "review_date", "source", "jurisdiction", "country", "company_number",
+    "registration_number", "registration_date", "legal_form", "short_name", "cin",
+    "authorized_capital", "paid_up_capital", "subtype", "activity_type",
+    "legal_address", "ogrn", "inn", "liquidation_date", "managers", "branch",
+    "mailing_address", "created_at",
+    "fiscal_code", "report_type", "report_year", "detail_data", "detailed_data", "financial_tables",
+)
+INTEGER_COLUMNS = {"id", "rating", "report_year"}
+DATETIME_COLUMNS = {"review_date", "created_at"}
+JSON_COLUMNS = {"detail_data", "detailed_data", "financial_tables"}
+REQUIRED_COLUMNS = ("subject", "review_id", "created_at")
+REVIEW_ID_INDEX = IMPORT_COLUMNS.index("review_id")
+
+# Вставка куска одним запросом: колонки передаются массивами и разворачиваются unnest
+_COLUMN_TYPES = {
+    column: Review.__table__.c[column].type.compile(dialect=postgresql.dialect())
+    for column in IMPORT_COLUMNS
+}
+INSERT_REVIEWS = text(f"""
+    INSERT INTO reviews ({", ".join(IMPORT_COLUMNS)})
+    SELECT * FROM unnest({", ".join(f"CAST(:{c} AS {_COLUMN_TYPES[c]}[])" for c in IMPORT_COLUMNS)})
+    ON CONFLICT DO NOTHING
+""")
+
+# Кусок и компании его вставленных строк — в одной транзакции, без уникального
+# ключа: параллельные соединения не блокируют друг друга, повторы убирает DISTINCT
+INSERT_REVIEWS_TOUCHED = text(f"""
+    WITH inserted AS ({INSERT_REVIEWS.text.rstrip()}
+        RETURNING subject
+    )
+    INSERT INTO {TOUCHED_TABLE} (subject) SELECT DISTINCT subject FROM inserted
+""")
+
+SELECT_KNOWN_IDS = text("SELECT review_id FROM reviews WHERE review_id = ANY(CAST(:review_ids AS varchar[]))")
+
+# Фильтр известных review_id процесса разбора (--skip-known)
+_known_ids = None
+# Отображения JSONL файлов процесса разбора (--mmap): путь -> mmap
+_mmaps = {}
 
 def parse_dt(val: str):
     if not val:
@@ -25,169 +142,708 @@ def parse_dt(val: str):
     except Exception:
         return None
 
-def stream_array(path: str):
-    decoder = json.JSONDecoder()
-    buf = ""
-    in_array = False
-    with open(path, "r", encoding="utf-8") as f:
-        while True:
-            chunk = f.read(65536)
-            if not chunk:
-                break
-            buf += chunk
-            if not in_array:
-                pos = buf.find("[")
-                if pos == -1:
-                    buf = ""
-                    continue
-                in_array = True
-                buf = buf[pos + 1 :]
-            while True:
-                buf = buf.lstrip()
-                if not buf:
-                    break
-                if buf[0] == "]":
-                    return
-                try:
-                    obj, end = decoder.raw_decode(buf)
-                    yield obj
-                    buf = buf[end:]
-                    if buf.startswith(","):
-                        buf = buf[1:]
-                except json.JSONDecodeError:
-                    break
-
-async def insert_batch(session, rows, attempts_counter):
-    if not rows:
-        return attempts_counter
-    stmt = insert(Review).values(rows).on_conflict_do_nothing()
-    await session.execute(stmt)
-    await session.commit()
-    attempts_counter += len(rows)
-    if attempts_counter % 2000 == 0:
-        print(f"✅ Попыток вставки: {attempts_counter}", flush=True)
-    return attempts_counter
-
-async def import_json(session, path):
-    batch = []
-    attempts = 0
-    errors = 0
-    for idx, rec in enumerate(stream_array(path), 1):
+def load_json_field(value):
+    """JSON поле выгрузки — объектом или строкой; ValueError — строка не JSON"""
+    if value is None or value == "":
+        return None
+    return json.loads(value) if isinstance(value, str) else value
+
+def map_report_fields(rec: dict) -> dict:
+    """Поля отчета moldovafinreport и его предрассчитанные таблицы (helpers/financial_tables.py)"""
+    detailed_data = load_json_field(rec.get("detailed_data"))
+    return {
+        "fiscal_code": rec.get("fiscal_code"),
+        "report_type": rec.get("report_type"),
+        "report_year": rec.get("report_year"),
+        "detail_data": load_json_field(rec.get("detail_data")),
+        "detailed_data": detailed_data,
+        "financial_tables": build_financial_tables(detailed_data),
+    }
+
+def map_b2b_record(rec: dict):
+    """Запись reviews_b2bhintcompany -> строка reviews; None — без названия компании"""
+    subject = rec.get("name")
+    if not subject:
+        return None
+    return {
+        "id": rec.get("id"),
+        "subject": subject,
+        "review_id": f"b2b-{rec.get('id')}",
+        "comment": rec.get("comment"),
+        "reviewer": rec.get("reviewer"),
+        "rating": rec.get("rating"),
+        "status": rec.get("status"),
+        "review_date": parse_dt(rec.get("review_date")),
+        "source": rec.get("source") or "b2bhint",
+        "jurisdiction": rec.get("jurisdiction"),
+        "country": rec.get("country"),
+        "company_number": rec.get("company_number"),
+        "registration_number": rec.get("registration_number"),
+        "registration_date": rec.get("registration_date"),
+        "legal_form": rec.get("legal_form"),
+        "short_name": rec.get("short_name"),
+        "cin": rec.get("cin"),
+        "authorized_capital": rec.get("authorized_capital"),
+        "paid_up_capital": rec.get("paid_up_capital"),
+        "subtype": rec.get("subtype"),
+        "activity_type": rec.get("activity_type"),
+        "legal_address": rec.get("legal_address"),
+        "ogrn": rec.get("ogrn"),
+        "inn": rec.get("inn"),
+        "liquidation_date": rec.get("liquidation_date"),
+        "managers": rec.get("managers"),
+        "branch": rec.get("branch"),
+        "mailing_address": rec.get("mailing_address"),
+        "created_at": parse_dt(rec.get("created_at")) or datetime.now(timezone.utc),
+        **map_report_fields(rec),
+    }
+
+def map_review_line(line: bytes):
+    """Строка reviews_review.jsonl -> строка reviews; None — без названия компании"""
+    data = json.loads(line)
+    subject = data.get("subject")
+    if not subject:
+        return None
+    return {
+        "id": data.get("id"),
+        "subject": subject,
+        "review_id": data.get("review_id"),
+        "comment": data.get("comment"),
+        "reviewer": data.get("reviewer"),
+        "rating": data.get("rating"),
+        "status": data.get("status"),
+        "review_date": parse_dt(data.get("review_date")),
+        "source": data.get("source"),
+        "jurisdiction": data.get("jurisdiction"),
+        "country": data.get("country"),
+        "company_number": data.get("company_number"),
+        "registration_number": data.get("registration_number"),
+        "registration_date": data.get("registration_date"),
+        "legal_form": data.get("legal_form"),
+        "short_name": data.get("short_name"),
+        "cin": data.get("cin"),
+        "authorized_capital": data.get("authorized_capital"),
+        "paid_up_capital": data.get("paid_up_capital"),
+        "subtype": data.get("subtype"),
+        "activity_type": data.get("activity_type"),
+        "legal_address": data.get("legal_address"),
+        "ogrn": data.get("ogrn"),
+        "inn": data.get("inn"),
+        "liquidation_date": data.get("liquidation_date"),
+        "managers": data.get("managers"),
+        "branch": data.get("branch"),
+        "mailing_address": data.get("mailing_address"),
+        "created_at": parse_dt(data.get("created_at")),
+        **map_report_fields(data),
+    }
+
+def to_copy_record(row: dict) -> tuple:
+    """
+    Строка -> запись COPY в порядке IMPORT_COLUMNS. Типы проверяются заранее:
+    одна неподходящая запись иначе обрывает COPY всего пакета. ValueError — отклонить.
+    """
+    record = []
+    for column in IMPORT_COLUMNS:
+        value = row[column]
+        if value is None:
+            if column in REQUIRED_COLUMNS:
+                raise ValueError(f"пустое поле {column}")
+        elif column in INTEGER_COLUMNS:
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                raise ValueError(f"{column}: ожидается целое, получено {value!r}")
+            value = int(value)
+        elif column in DATETIME_COLUMNS:
+            if not isinstance(value, datetime):
+                raise ValueError(f"{column}: ожидается дата, получено {value!r}")
+        elif column in JSON_COLUMNS:
+            value = json.dumps(value, ensure_ascii=False)
+            if "\\u0000" in value:
+                raise ValueError(f"{column}: символ NUL")
+        else:
+            if not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+            if "\x00" in value:
+                raise ValueError(f"{column}: символ NUL")
+        record.append(value)
+    return tuple(record)
+
+
+# === Контрольные точки ===
+
+def file_identity(path: str) -> dict:
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inode": stat.st_ino,
+    }
+
+
+class ImportCheckpoint:
+    """
+    Контрольная точка импорта файла. Соединения фиксируют куски в любом порядке,
+    а offset сдвигается только по непрерывному ряду зафиксированных кусков —
+    все до него записано. Файл переписывается атомарно после каждого сдвига.
+    """
+
+    def __init__(self, path: str, mode: str, state: Optional[dict] = None):
+        self.filepath = path + CHECKPOINT_SUFFIX
+        self.state = state or {
+            "file": file_identity(path),
+            "mode": mode,
+            "offset": 0,  # байт файла прочитано и записано
+            "chunks": 0,  # кусков до offset; следующий кусок получит этот номер
+            "items": 0,
+            "rejected": 0,
+            "rows": 0,  # строк передано в reviews/staging
+            "done": False,  # файл импортирован полностью
+        }
+        self.next_chunk = self.state["chunks"]
+        self._chunks = {}  # номер -> [смещение конца, записей, отклонено, строк, зафиксирован]
+
+    @classmethod
+    def load(cls, path: str, mode: str) -> Optional["ImportCheckpoint"]:
+        """Контрольная точка прошлого запуска; None — нет или файл/режим другие"""
+        try:
+            with open(path + CHECKPOINT_SUFFIX, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("file") != file_identity(path) or state.get("mode") != mode:
+            print(f"⚠️ Контрольная точка {path}{CHECKPOINT_SUFFIX} от другого файла или режима — импорт с начала")
+            return None
+        return cls(path, mode, state)
+
+    def add(self, chunk: int, end_offset: int, items: int, rejected: int) -> None:
+        self._chunks[chunk] = [end_offset, items, rejected, 0, False]
+
+    def commit(self, chunk: int, rows: int) -> None:
+        """Кусок зафиксирован в БД; сдвинуть offset, если перед ним нет незаписанных"""
+        entry = self._chunks[chunk]
+        entry[3] = rows
+        entry[4] = True
+        state = self.state
+        advanced = False
+        while self._chunks.get(state["chunks"], (None,) * 5)[4]:
+            end_offset, items, rejected, rows, _ = self._chunks.pop(state["chunks"])
+            state["offset"] = end_offset
+            state["chunks"] += 1
+            state["items"] += items
+            state["rejected"] += rejected
+            state["rows"] += rows
+            advanced = True
+        if advanced:
+            self.save()
+
+    def save(self) -> None:
+        """Атомарная запись с fsync: после сбоя на диске прежняя или новая точка"""
+        tmp_path = f"{self.filepath}.tmp{os.getpid()}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def finish(self) -> None:
+        """Файл импортирован до конца — при --resume он пропускается"""
+        self.state["done"] = True
+        self.save()
+
+
+def remove_checkpoint(path: str) -> None:
+    """Удалить контрольную точку файла и временные файлы записи, оставшиеся после сбоя"""
+    for filepath in [path + CHECKPOINT_SUFFIX, *glob.glob(glob.escape(path + CHECKPOINT_SUFFIX) + ".tmp*")]:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+# === Стадии конвейера ===
+
+async def load_known_ids(mode: str, fpr: float):
+    """Фильтр review_id из reviews: KnownIdSet (set) или BloomFilter (bloom)"""
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        if mode == "bloom":
+            total = (await session.execute(text("SELECT count(*) FROM reviews"))).scalar()
+            known = BloomFilter(total, fpr)
+            result = await session.stream_scalars(
+                select(Review.review_id).execution_options(yield_per=KNOWN_IDS_BATCH)
+            )
+            async for review_id in result:
+                known.add_hash(id_hash(review_id))
+        else:
+            # Порядок байтов UTF-8 — KnownIdSet складывает ключи в буфер без сортировки
+            result = await session.stream_scalars(
+                select(Review.review_id)
+                .order_by(Review.review_id.collate("C"))
+                .execution_options(yield_per=KNOWN_IDS_BATCH)
+            )
+            known = KnownIdSet([review_id async for review_id in result])
+    print(f"🧮 Фильтр известных review_id ({mode}): {len(known):,} ключей, "
+          f"{known.nbytes / 1024 / 1024:,.1f} МБ за {time.perf_counter() - started:.1f} с")
+    return known
+
+
+def set_known_ids(known) -> None:
+    """Инициализатор процесса разбора: фильтр известных review_id"""
+    global _known_ids
+    _known_ids = known
+
+
+@dataclass
+class ChunkResult:
+    """Разобранный кусок: записи в порядке IMPORT_COLUMNS и отклоненные записи"""
+    records: list
+    items: int
+    rejected: int
+    errors: list  # (номер записи в куске, текст) — не больше MAX_PRINTED_ERRORS
+    seconds: float
+    known: int = 0  # отброшено точным фильтром известных review_id (--skip-known set)
+    known_bytes: int = 0  # размер полей отброшенных записей
+    candidates: list = field(default_factory=list)  # срабатывания фильтра Блума — проверить в БД
+
+
+def record_bytes(record: tuple) -> int:
+    """Примерный объем записи при отправке в БД — сумма длин значений полей"""
+    return sum(len(str(value)) for value in record if value is not None)
+
+
+def transform_chunk(kind: str, data: bytes) -> ChunkResult:
+    """Задача пула: разбор куска и преобразование записей в строки reviews"""
+    started = time.perf_counter()
+    if kind == "json":
+        items = json.loads(b"[" + data + b"]")
+        mapper = map_b2b_record
+    else:
+        items = [line for line in data.splitlines() if line.strip()]
+        mapper = map_review_line
+
+    records = []
+    candidates = []
+    known = 0
+    known_bytes = 0
+    rejected = 0
+    errors = []
+    for idx, item in enumerate(items, 1):
         try:
-            subject = rec.get("name")
-            if not subject:
-                errors += 1
+            row = mapper(item)
+            if row is None:
+                rejected += 1
                 continue
-            row = {
-                "id": rec.get("id"),
-                "subject": subject,
-                "review_id": f"b2b-{rec.get('id')}",
-                "comment": rec.get("comment"),
-                "reviewer": rec.get("reviewer"),
-                "rating": rec.get("rating"),
-                "status": rec.get("status"),
-                "review_date": parse_dt(rec.get("review_date")),
-                "source": rec.get("source") or "b2bhint",
-                "jurisdiction": rec.get("jurisdiction"),
-                "country": rec.get("country"),
-                "company_number": rec.get("company_number"),
-                "registration_number": rec.get("registration_number"),
-                "registration_date": rec.get("registration_date"),
-                "legal_form": rec.get("legal_form"),
-                "short_name": rec.get("short_name"),
-                "cin": rec.get("cin"),
-                "authorized_capital": rec.get("authorized_capital"),
-                "paid_up_capital": rec.get("paid_up_capital"),
-                "subtype": rec.get("subtype"),
-                "activity_type": rec.get("activity_type"),
-                "legal_address": rec.get("legal_address"),
-                "ogrn": rec.get("ogrn"),
-                "inn": rec.get("inn"),
-                "liquidation_date": rec.get("liquidation_date"),
-                "managers": rec.get("managers"),
-                "branch": rec.get("branch"),
-                "mailing_address": rec.get("mailing_address"),
-                "created_at": parse_dt(rec.get("created_at")) or datetime.now(timezone.utc),
-            }
-            batch.append(row)
-            if len(batch) >= BATCH:
-                attempts = await insert_batch(session, batch, attempts)
-                batch = []
+            record = to_copy_record(row)
         except Exception as e:
-            errors += 1
-            if errors < 10:
-                print(f"❌ Ошибка в JSON записи {idx}: {e}")
+            rejected += 1
+            if len(errors) < MAX_PRINTED_ERRORS:
+                errors.append((idx, str(e)))
+            continue
+        if _known_ids is not None and record[REVIEW_ID_INDEX] in _known_ids:
+            if _known_ids.exact:
+                known += 1
+                known_bytes += record_bytes(record)
+            else:
+                candidates.append(record)
             continue
-    attempts = await insert_batch(session, batch, attempts)
-    print(f"✅ Импорт JSON завершён. Попыток вставки: {attempts}, ошибок: {errors}")
+        records.append(record)
+    return ChunkResult(
+        records, len(items), rejected, errors, time.perf_counter() - started,
+        known, known_bytes, candidates,
+    )
+
+
+def transform_range(path: str, start: int, end: int) -> ChunkResult:
+    """Задача пула (--mmap): разбор диапазона строк JSONL из mmap процесса"""
+    mapped = _mmaps.get(path)
+    if mapped is None:
+        with open(path, "rb") as f:
+            mapped = _mmaps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return transform_chunk("jsonl", mapped[start:end])
+
+
+def read_tasks(path: str, kind: str, args, start: int):
+    """Задачи разбора по кускам файла: (функция, аргументы, байт, смещение конца куска)"""
+    chunk_size = args.chunk_kb * 1024
+    if kind == "jsonl" and args.mmap:
+        for range_start, range_end in line_ranges(path, chunk_size, start):
+            yield transform_range, (path, range_start, range_end), range_end - range_start, range_end
+        return
+    for data, end_offset in read_chunks(path, kind, chunk_size, start):
+        yield transform_chunk, (kind, data), len(data), end_offset
+
+
+@dataclass
+class PipelineStats:
+    """Счетчики и время стадий конвейера"""
+    read_bytes: int = 0
+    read_seconds: float = 0.0
+    items: int = 0
+    rejected: int = 0
+    transform_seconds: float = 0.0  # сумма по процессам
+    written: int = 0
+    write_seconds: float = 0.0  # сумма по соединениям
+    queue_full_seconds: float = 0.0  # разбор ждал места в очереди
+    queue_empty_seconds: float = 0.0  # запись ждала данных, сумма по соединениям
+    wall_seconds: float = 0.0
+    items_before: int = 0  # записей до точки продолжения — для номеров ошибок
+    known: int = 0  # известных review_id не отправлено на запись
+    known_bytes: int = 0  # размер полей этих записей
+    checked: int = 0  # срабатываний фильтра Блума, проверенных в БД
+    checked_bytes: int = 0  # размер review_id, отправленных на проверку
+    false_positives: int = 0  # из них новых записей
+    printed_errors: int = 0
+    next_progress: int = PROGRESS_EVERY
+    error: Optional[BaseException] = None
+
+
+async def write_insert(session, chunk: int, records: list) -> None:
+    """Кусок в reviews одним INSERT, компании вставленных строк — в TOUCHED_TABLE"""
+    columns = list(zip(*records))
+    await session.execute(INSERT_REVIEWS_TOUCHED, {c: list(columns[i]) for i, c in enumerate(IMPORT_COLUMNS)})
+    await session.commit()
+
+
+async def unknown_records(session, candidates: list) -> list:
+    """Срабатывания фильтра Блума, которых нет в reviews, — новые записи"""
+    result = await session.execute(
+        SELECT_KNOWN_IDS, {"review_ids": [record[REVIEW_ID_INDEX] for record in candidates]}
+    )
+    found = set(result.scalars())
+    await session.commit()  # COPY идет вне транзакции сессии — чтение ее не держит
+    return [record for record in candidates if record[REVIEW_ID_INDEX] not in found]
+
+
+async def write_copy(session, chunk: int, records: list) -> None:
+    """Кусок в staging через COPY (фиксируется сразу); строки помечаются номером куска"""
+    conn = await session.connection()
+    driver = (await conn.get_raw_connection()).driver_connection
+    await driver.copy_records_to_table(
+        STAGING_TABLE,
+        records=[record + (chunk,) for record in records],
+        columns=IMPORT_COLUMNS + (STAGING_CHUNK_COLUMN,),
+    )
+
+
+async def run_writer(
+    label: str, queue: asyncio.Queue, write, stats: PipelineStats, checkpoint: ImportCheckpoint
+) -> None:
+    """Соединение записи: берет куски из очереди до None"""
+    async with AsyncSessionLocal() as session:
+        while True:
+            waited = time.perf_counter()
+            item = await queue.get()
+            stats.queue_empty_seconds += time.perf_counter() - waited
+            if item is None:
+                return
+            if stats.error is not None:
+                continue  # после ошибки очередь только разгружается
+            chunk, records, candidates = item
+            started = time.perf_counter()
+            try:
+                if candidates:
+                    unknown = await unknown_records(session, candidates)
+                    stats.checked += len(candidates)
+                    stats.checked_bytes += sum(len(record[REVIEW_ID_INDEX]) for record in candidates)
+                    stats.false_positives += len(unknown)
+                    new_ids = {record[REVIEW_ID_INDEX] for record in unknown}
+                    for record in candidates:
+                        if record[REVIEW_ID_INDEX] not in new_ids:
+                            stats.known += 1
+                            stats.known_bytes += record_bytes(record)
+                    records = records + unknown
+                if records:
+                    await write(session, chunk, records)
+            except Exception as e:
+                stats.error = e
+                await session.rollback()
+                continue
+            stats.write_seconds += time.perf_counter() - started
+            stats.written += len(records)
+            checkpoint.commit(chunk, len(records))
+            if stats.written >= stats.next_progress:
+                stats.next_progress += PROGRESS_EVERY
+                print(f"   ↳ {label}: записано {stats.written:,} строк", flush=True)
+
+
+def report_chunk(label: str, stats: PipelineStats, result: ChunkResult) -> None:
+    """Учесть разобранный кусок; ошибки нумеруются по всему файлу"""
+    for idx, message in result.errors:
+        if stats.printed_errors < MAX_PRINTED_ERRORS:
+            stats.printed_errors += 1
+            print(f"❌ Ошибка в {label} записи {stats.items_before + stats.items + idx}: {message}")
+    stats.items += result.items
+    stats.rejected += result.rejected
+    stats.known += result.known
+    stats.known_bytes += result.known_bytes
+    stats.transform_seconds += result.seconds
+
+
+async def run_pipeline(
+    label: str, path: str, kind: str, write, args, checkpoint: ImportCheckpoint
+) -> PipelineStats:
+    """
+    Чтение -> workers процессов разбора -> очередь на queue_size кусков -> writers соединений.
+    Результаты разбора забираются в порядке чтения; при заполненной очереди чтение ждет.
+    Чтение начинается со смещения контрольной точки.
+    """
+    loop = asyncio.get_running_loop()
+    stats = PipelineStats(items_before=checkpoint.state["items"])
+    queue = asyncio.Queue(maxsize=max(1, args.queue_size))
+    pool = None
+    if args.workers > 0:
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers, initializer=set_known_ids, initargs=(_known_ids,)
+        )
+    max_pending = max(1, args.workers) * 2
+    pending = deque()
+    tasks = read_tasks(path, kind, args, checkpoint.state["offset"])
+    writers = [
+        asyncio.create_task(run_writer(label, queue, write, stats, checkpoint))
+        for _ in range(max(1, args.writers))
+    ]
+    started = time.perf_counter()
+
+    async def forward(chunk: int, end_offset: int, result: ChunkResult) -> None:
+        report_chunk(label, stats, result)
+        checkpoint.add(chunk, end_offset, result.items, result.rejected)
+        if not result.records and not result.candidates:
+            checkpoint.commit(chunk, 0)
+            return
+        waited = time.perf_counter()
+        await queue.put((chunk, result.records, result.candidates))
+        stats.queue_full_seconds += time.perf_counter() - waited
 
-async def import_jsonl(session, path):
-    batch = []
-    attempts = 0
-    errors = 0
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            for idx, line in enumerate(f, 1):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line)
-                    subject = data.get("subject")
-                    if not subject:
-                        errors += 1
-                        continue
-                    row = {
-                        "id": data.get("id"),
-                        "subject": subject,
-                        "review_id": data.get("review_id"),
-                        "comment": data.get("comment"),
-                        "reviewer": data.get("reviewer"),
-                        "rating": data.get("rating"),
-                        "status": data.get("status"),
-                        "review_date": parse_dt(data.get("review_date")),
-                        "source": data.get("source"),
-                        "jurisdiction": data.get("jurisdiction"),
-                        "country": data.get("country"),
-                        "company_number": data.get("company_number"),
-                        "registration_number": data.get("registration_number"),
-                        "registration_date": data.get("registration_date"),
-                        "legal_form": data.get("legal_form"),
-                        "short_name": data.get("short_name"),
-                        "cin": data.get("cin"),
-                        "authorized_capital": data.get("authorized_capital"),
-                        "paid_up_capital": data.get("paid_up_capital"),
-                        "subtype": data.get("subtype"),
-                        "activity_type": data.get("activity_type"),
-                        "legal_address": data.get("legal_address"),
-                        "ogrn": data.get("ogrn"),
-                        "inn": data.get("inn"),
-                        "liquidation_date": data.get("liquidation_date"),
-                        "managers": data.get("managers"),
-                        "branch": data.get("branch"),
-                        "mailing_address": data.get("mailing_address"),
-                        "created_at": parse_dt(data.get("created_at")),
-                    }
-                    batch.append(row)
-                    if len(batch) >= BATCH:
-                        attempts = await insert_batch(session, batch, attempts)
-                        batch = []
-                except Exception as e:
-                    errors += 1
-                    if errors < 10:
-                        print(f"❌ Ошибка в JSONL строке {idx}: {e}")
-                    continue
-    except FileNotFoundError:
-        print(f"⚠️ JSONL файл {path} не найден, пропускаем.")
-    attempts = await insert_batch(session, batch, attempts)
-    print(f"✅ Импорт JSONL завершён. Попыток вставки: {attempts}, ошибок: {errors}")
+        while stats.error is None:
+            read_started = time.perf_counter()
+            task = await asyncio.to_thread(next, tasks, None)
+            stats.read_seconds += time.perf_counter() - read_started
+            if task is None:
+                break
+            transform, task_args, size, end_offset = task
+            stats.read_bytes += size
+            number = checkpoint.next_chunk
+            checkpoint.next_chunk += 1
+            if pool is None:
+                await forward(number, end_offset, transform(*task_args))
+                continue
+            pending.append((number, end_offset, loop.run_in_executor(pool, transform, *task_args)))
+            while len(pending) >= max_pending:
+                number, end_offset, future = pending.popleft()
+                await forward(number, end_offset, await future)
+        while pending and stats.error is None:
+            number, end_offset, future = pending.popleft()
+            await forward(number, end_offset, await future)
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+        for _ in writers:
+            await queue.put(None)
+        await asyncio.gather(*writers)
+        tasks.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    stats.wall_seconds = time.perf_counter() - started
+    if stats.error is not None:
+        raise stats.error
+    return stats
 
-async def main():
+
+def print_pipeline_stats(label: str, stats: PipelineStats, args) -> None:
+    """Пропускная способность по стадиям (работа — суммарное время процессов/соединений)"""
+    rate = lambda amount, seconds: amount / max(seconds, 1e-9)
+    megabytes = stats.read_bytes / 1024 / 1024
+    print(f"   Чтение:  {megabytes:,.1f} МБ за {stats.read_seconds:.1f} с "
+          f"({rate(megabytes, stats.read_seconds):,.1f} МБ/с)")
+    print(f"   Разбор:  {stats.items:,} записей, процессов: {args.workers}, работа {stats.transform_seconds:.1f} с "
+          f"({rate(stats.items, stats.transform_seconds):,.0f} записей/с на процесс)")
+    print(f"   Запись:  {stats.written:,} строк, соединений: {max(1, args.writers)}, работа {stats.write_seconds:.1f} с "
+          f"({rate(stats.written, stats.write_seconds):,.0f} строк/с на соединение)")
+    print(f"   Очередь: разбор ждал места {stats.queue_full_seconds:.1f} с, "
+          f"запись ждала данных {stats.queue_empty_seconds:.1f} с")
+    if _known_ids is not None:
+        # Сэкономлено: поля не записанных строк минус review_id, отправленные на проверку
+        saved = (stats.known_bytes - stats.checked_bytes) / 1024 / 1024
+        print(f"   Известные: не отправлено {stats.known:,} строк (~{saved:,.1f} МБ полей)")
+        if not _known_ids.exact:
+            print(f"   Фильтр Блума: проверено в БД {stats.checked:,} review_id, "
+                  f"из них новых {stats.false_positives:,}")
+    print(f"   Итого {label}: {stats.wall_seconds:.1f} с, {rate(stats.items, stats.wall_seconds):,.0f} записей/с")
+
+def print_resume(label: str, checkpoint: ImportCheckpoint) -> None:
+    state = checkpoint.state
+    print(f"♻️ {label}: продолжение с {state['offset']:,} из {state['file']['size']:,} байт, "
+          f"уже записано строк: {state['rows']:,}")
+
+
+def print_companies(label: str, created: int, updated: int, seconds: float) -> None:
+    print(f"   Статистика компаний {label}: создано {created:,}, обновлено {updated:,} за {seconds:.1f} с")
+
+
+def is_done(label: str, checkpoint: Optional[ImportCheckpoint]) -> bool:
+    if checkpoint is None or not checkpoint.state.get("done"):
+        return False
+    print(f"⏭️ {label}: импортирован в прерванном запуске ({checkpoint.state['rows']:,} строк), пропускаем")
+    return True
+
+
+async def import_file(label: str, path: str, kind: str, args) -> None:
+    """Импорт файла: INSERT по кускам, затем статистика затронутых компаний"""
+    checkpoint = ImportCheckpoint.load(path, "insert") if args.resume else None
+    if is_done(label, checkpoint):
+        return
+    async with AsyncSessionLocal() as session:
+        if checkpoint is not None:
+            print_resume(label, checkpoint)
+        else:
+            checkpoint = ImportCheckpoint(path, "insert")
+        # Компании, оставшиеся от прерванного запуска, не удаляются: их строки уже в
+        # reviews и повторно не вставятся — статистика обновится финальным пересчетом
+        await session.execute(text(f"CREATE TABLE IF NOT EXISTS {TOUCHED_TABLE} (subject varchar NOT NULL)"))
+        await session.commit()
+
+    stats = await run_pipeline(label, path, kind, write_insert, args, checkpoint)
+
+    refresh_started = time.perf_counter()
     async with AsyncSessionLocal() as session:
-        print("🚀 Импорт JSON...")
-        await import_json(session, JSON_PATH)
-        print("🚀 Импорт JSONL...")
-        await import_jsonl(session, JSONL_PATH)
+        result = await session.execute(text(f"SELECT DISTINCT subject FROM {TOUCHED_TABLE}"))
+        subjects = result.scalars().all()
+        stats_service = CompanyStatsService(session)
+        created, updated = await stats_service.refresh(subjects, commit=False)
+        await session.execute(text(f"DROP TABLE {TOUCHED_TABLE}"))
+        await session.commit()
+        await stats_service.publish(subjects)
+    refresh_seconds = time.perf_counter() - refresh_started
+    checkpoint.finish()
+
+    print(f"✅ Импорт {label} завершён. Попыток вставки: {stats.written:,}, ошибок: {stats.rejected:,}")
+    print_pipeline_stats(label, stats, args)
+    print_companies(label, created, updated, refresh_seconds)
+
+async def copy_import(label: str, path: str, kind: str, args) -> None:
+    """
+    Режим --copy: куски -> COPY в staging -> один INSERT ... SELECT в reviews.
+    COPY каждого куска фиксируется сразу (staging — UNLOGGED, без индексов);
+    перенос в reviews — одна транзакция.
+    --resume: строки кусков после контрольной точки удаляются из staging (их COPY мог
+    пройти до сбоя), оставшееся число строк должно совпасть с контрольной точкой.
+    """
+    columns = ", ".join(IMPORT_COLUMNS)
+    checkpoint = ImportCheckpoint.load(path, "copy") if args.resume else None
+    if is_done(label, checkpoint):
+        return
+    async with AsyncSessionLocal() as session:
+        if checkpoint is not None:
+            staged = None
+            if (await session.execute(text("SELECT to_regclass(:t)"), {"t": STAGING_TABLE})).scalar():
+                await session.execute(
+                    text(f"DELETE FROM {STAGING_TABLE} WHERE {STAGING_CHUNK_COLUMN} >= :chunks"),
+                    {"chunks": checkpoint.state["chunks"]},
+                )
+                staged = (await session.execute(text(f"SELECT count(*) FROM {STAGING_TABLE}"))).scalar()
+            if staged != checkpoint.state["rows"]:
+                print(f"⚠️ В {STAGING_TABLE} {staged if staged is not None else 'нет'} строк, "
+                      f"в контрольной точке {checkpoint.state['rows']:,} — импорт с начала")
+                checkpoint = None
+            else:
+                print_resume(label, checkpoint)
+        if checkpoint is None:
+            checkpoint = ImportCheckpoint(path, "copy")
+            await session.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+            await session.execute(text(
+                f"CREATE UNLOGGED TABLE {STAGING_TABLE} AS "
+                f"SELECT {columns}, 0 AS {STAGING_CHUNK_COLUMN} FROM reviews WITH NO DATA"
+            ))
+        await session.commit()
+
+    stats = await run_pipeline(label, path, kind, write_copy, args, checkpoint)
+    staged = checkpoint.state["rows"]
+
+    # Перенос: конфликт по review_id (или id) — запись уже есть, пропускается
+    merge_started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(text(f"""
+            WITH inserted AS (
+                INSERT INTO reviews ({columns})
+                SELECT {columns} FROM {STAGING_TABLE}
+                ON CONFLICT DO NOTHING
+                RETURNING subject
+            )
+            SELECT subject, count(*) AS inserted FROM inserted GROUP BY subject
+        """))
+        touched = result.all()
+        inserted = sum(row.inserted for row in touched)
+        merge_seconds = time.perf_counter() - merge_started
+
+        refresh_started = time.perf_counter()
+        subjects = [row.subject for row in touched]
+        stats_service = CompanyStatsService(session)
+        created, updated = await stats_service.refresh(subjects, commit=False)
+        await session.commit()
+        await stats_service.publish(subjects)
+        refresh_seconds = time.perf_counter() - refresh_started
+
+        await session.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+        await session.commit()
+    checkpoint.finish()
+
+    print(f"✅ Импорт {label} (COPY) завершён за {stats.wall_seconds + merge_seconds + refresh_seconds:.1f} с")
+    print_pipeline_stats(label, stats, args)
+    print(f"   Перенос в reviews: {merge_seconds:.1f} с")
+    print(f"   Вставлено: {inserted:,}, дубликатов: {staged - inserted:,}, "
+          f"отклонено: {checkpoint.state['rejected']:,}")
+    print_companies(label, created, updated, refresh_seconds)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Импорт отзывов")
+    parser.add_argument("--copy", action="store_true", help="загрузка через COPY и staging таблицу")
+    parser.add_argument("--resume", action="store_true", help="продолжить с контрольной точки прошлого запуска")
+    parser.add_argument("--json", default=JSON_PATH, help="файл reviews_b2bhintcompany (JSON)")
+    parser.add_argument("--jsonl", default=JSONL_PATH, help="файл reviews_review (JSONL)")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="процессов разбора (0 — без пула)")
+    parser.add_argument("--writers", type=int, default=IMPORT_WRITERS, help="соединений записи")
+    parser.add_argument("--queue-size", type=int, default=IMPORT_QUEUE_SIZE,
+                        help="разобранных кусков в очереди на запись, дальше чтение ждет")
+    parser.add_argument("--chunk-kb", type=int, default=CHUNK_KB, help="размер куска файла, КБ")
+    parser.add_argument("--skip-known", choices=("set", "bloom"),
+                        help="отбрасывать при разборе записи с review_id, которые уже есть в reviews")
+    parser.add_argument("--bloom-fpr", type=float, default=BLOOM_FPR,
+                        help="доля ложных срабатываний фильтра Блума")
+    parser.add_argument("--mmap", action="store_true",
+                        help="JSONL: процессы разбора читают свои диапазоны строк из mmap файла")
+    args = parser.parse_args()
+
+    if args.skip_known:
+        set_known_ids(await load_known_ids(args.skip_known, args.bloom_fpr))
+
+    paths = (args.json, args.jsonl)
+    if not args.resume:
+        for path in paths:
+            remove_checkpoint(path)
+
+    run = copy_import if args.copy else import_file
+    completed = True
+    print("🚀 Импорт JSON...")
+    try:
+        await run("JSON", args.json, "json", args)
+    except ValueError as e:
+        completed = False
+        print(f"❌ Файл {args.json} разобран не полностью: {e}")
+    print("🚀 Импорт JSONL...")
+    try:
+        await run("JSONL", args.jsonl, "jsonl", args)
+    except FileNotFoundError:
+        print(f"⚠️ JSONL файл {args.jsonl} не найден, пропускаем.")
+
+    # Контрольные точки нужны, пока импорт не завершен целиком
+    if completed:
+        for path in paths:
+            remove_checkpoint(path)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,403 @@
+"""
+Импорт финансовых отчетов Молдовы в moldovafinreport и moldova_indicators.
+
+Файлы — выгрузки таблицы moldovafinreport: JSON { "moldovafinreport": [ {...}, ... ] }
+или JSONL (.jsonl). Поля записи — колонки таблицы: company_name, fiscal_code,
+report_type, report_year, detail_data, detailed_data (JSON поля — объектом или строкой).
+
+Конвейер: чтение кусками из целых записей (helpers/json_stream.py) -> процессы
+разбора -> запись. Разбор проверяет запись, из повторов отчета (fiscal_code,
+report_type, report_year) в куске оставляет последний и раскладывает
+detailed_data.groups[].fields[] в строки moldova_indicators (datePrev/dateCurrent -> numeric).
+
+Запись куска — одна транзакция: компании фискальных кодов куска
+(reviews.fiscal_code -> reviews.subject = companies.name), id отчетов из
+последовательности moldovafinreport, удаление прежних версий тех же отчетов вместе
+с показателями, COPY отчетов и COPY показателей (с компанией в subject).
+Повторный импорт файла заменяет отчеты, а не дублирует их, и связывает показатели
+с компаниями, появившимися после прошлого импорта.
+
+В конце — скорость, число отчетов и показателей и сколько фискальных кодов связано
+с компаниями.
+
+Запуск: python import_moldova_reports.py FILE [FILE ...] [--workers N] [--chunk-kb KB]
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+from sqlalchemy import text
+from database import AsyncSessionLocal
+from helpers.json_stream import read_chunks
+
+CHUNK_KB = 4096  # Кусок файла — единица разбора и записи (одна транзакция)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 1)))
+MAX_PRINTED_ERRORS = 10
+
+REQUIRED_FIELDS = ("company_name", "fiscal_code", "report_type", "report_year")
+
+# Колонки COPY; отчет от разбора приходит без id и дат, показатель — без report_id
+REPORT_COLUMNS = (
+    "id", "company_name", "fiscal_code", "report_type", "report_year",
+    "detail_data", "detailed_data", "created_at", "updated_at",
+)
+INDICATOR_COLUMNS = (
+    "report_id", "line_no", "fiscal_code", "report_year", "group_no", "code", "prev", "current", "subject",
+)
+
+# Разделители разрядов и пустые значения в datePrev/dateCurrent
+_AMOUNT_SPACES = str.maketrans("", "", " \u00a0\u202f'")
+_EMPTY_AMOUNTS = {"", "-", "—", "–"}
+
+NEXT_REPORT_IDS = text(
+    "SELECT nextval(pg_get_serial_sequence('moldovafinreport', 'id')) FROM generate_series(1, :count)"
+)
+
+# Прежние версии отчетов куска (ключи — массивами) вместе с их показателями
+DELETE_REPORTS = text("""
+    WITH keys AS (
+        SELECT * FROM unnest(
+            CAST(:fiscal_codes AS varchar[]), CAST(:report_types AS varchar[]), CAST(:report_years AS integer[])
+        ) AS k(fiscal_code, report_type, report_year)
+    ), deleted AS (
+        DELETE FROM moldovafinreport m USING keys k
+        WHERE m.fiscal_code = k.fiscal_code
+          AND m.report_type = k.report_type
+          AND m.report_year = k.report_year
+        RETURNING m.id
+    ), deleted_indicators AS (
+        DELETE FROM moldova_indicators WHERE report_id IN (SELECT id FROM deleted)
+    )
+    SELECT count(*) FROM deleted
+""")
+
+# Компания фискального кода (если кодом отмечены отзывы разных компаний — первая по имени)
+SELECT_COMPANY_NAMES = text("""
+    SELECT r.fiscal_code, min(r.subject)
+    FROM reviews r
+    WHERE r.fiscal_code = ANY(CAST(:fiscal_codes AS varchar[]))
+      AND EXISTS (SELECT 1 FROM companies c WHERE c.name = r.subject)
+    GROUP BY r.fiscal_code
+""")
+
+
+def parse_amount(value) -> Optional[Decimal]:
+    """Сумма показателя: "1 234,5", "(120)", 1234 -> Decimal; None — пусто или не число"""
+    if isinstance(value, str):
+        if not value:
+            return None
+        try:
+            amount = Decimal(value)  # обычный случай — число без форматирования
+        except InvalidOperation:
+            return parse_formatted_amount(value)
+        return amount if amount.is_finite() else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return parse_formatted_amount(str(value))
+    return None
+
+
+def parse_formatted_amount(value: str) -> Optional[Decimal]:
+    """
+    Сумма с разделителями разрядов, десятичным разделителем или в скобках (отрицательная).
+    Румынский/русский формат выгрузок: "1.234,56", "1 234,567" — запятая десятичная;
+    встречается и "1,234.56". Разделители — по положению (последний из двух разных —
+    десятичный) и группировке разрядов (split_amount); неоднозначная или неверная
+    группировка — None, а не угаданное число.
+    """
+    value = value.strip()
+    if value in _EMPTY_AMOUNTS:
+        return None
+    negative = value.startswith("(") and value.endswith(")")
+    if negative:
+        value = value[1:-1].strip()
+    spaced = value.translate(_AMOUNT_SPACES)
+    parts = split_amount(spaced, grouped_by_spaces=spaced != value)
+    if parts is None:
+        return None
+    integer, fraction = parts
+    try:
+        amount = Decimal(f"{integer}.{fraction}" if fraction is not None else integer)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+    return -amount if negative else amount
+
+
+def split_amount(value: str, grouped_by_spaces: bool) -> Optional[tuple[str, Optional[str]]]:
+    """
+    (целая часть без разделителей разрядов, дробная часть или None).
+    Десятичный разделитель: из точки и запятой — последний; если есть только один
+    знак — десятичный, кроме случаев, когда он разделяет разряды: повторяется
+    ("1.234.567", "1,234,567") или это запятая "1,234" (1–3 цифры, затем ровно три).
+    Если разряды уже разделены пробелами ("1 234,567"), одиночный знак — десятичный.
+    """
+    dot, comma = value.rfind("."), value.rfind(",")
+    if dot >= 0 and comma >= 0:
+        decimal = "." if dot > comma else ","
+    elif dot < 0 and comma < 0:
+        decimal = None
+    else:
+        separator = "." if dot >= 0 else ","
+        if value.count(separator) > 1:
+            decimal = None
+        elif grouped_by_spaces or separator == ".":
+            decimal = separator
+        else:
+            head, _, tail = value.partition(",")
+            digits = head.lstrip("+-")
+            is_group = 1 <= len(digits) <= 3 and digits[0] != "0" and len(tail) == 3
+            decimal = None if is_group else ","
+
+    integer, fraction = value.rsplit(decimal, 1) if decimal else (value, None)
+    if fraction is not None and not fraction.isdigit():
+        return None
+    for separator in ".,":
+        if separator in integer:
+            groups = integer.split(separator)
+            first = groups[0].lstrip("+-")
+            if not (1 <= len(first) <= 3 and all(len(group) == 3 for group in groups[1:])):
+                return None
+            integer = "".join(groups)
+    return integer, fraction
+
+
+def load_json_field(value):
+    """JSON поле выгрузки: (объект, текст для COPY в jsonb)"""
+    if value is None or value == "":
+        return None, None
+    if isinstance(value, str):
+        return json.loads(value), value
+    return value, json.dumps(value, ensure_ascii=False)
+
+
+def map_report(item: dict):
+    """Запись выгрузки -> (строка отчета без id и дат, строки показателей без report_id)"""
+    if not isinstance(item, dict):
+        raise ValueError("запись не объект")
+    for name in REQUIRED_FIELDS:
+        if item.get(name) in (None, ""):
+            raise ValueError(f"нет поля {name}")
+    fiscal_code = str(item["fiscal_code"]).strip()
+    report_year = int(item["report_year"])
+    _, detail_text = load_json_field(item.get("detail_data"))
+    detailed, detailed_text = load_json_field(item.get("detailed_data"))
+
+    indicators = []
+    groups = detailed.get("groups") if isinstance(detailed, dict) else None
+    line_no = 0
+    for group_no, group in enumerate(groups or [], 1):
+        for field in (group.get("fields") or []) if isinstance(group, dict) else []:
+            line_no += 1
+            prev = parse_amount(field.get("datePrev"))
+            current = parse_amount(field.get("dateCurrent"))
+            if prev is None and current is None:
+                continue
+            code = field.get("code")
+            indicators.append((
+                line_no, fiscal_code, report_year, group_no,
+                str(code) if code not in (None, "") else None, prev, current,
+            ))
+
+    report = (
+        str(item["company_name"]), fiscal_code, str(item["report_type"]), report_year,
+        detail_text, detailed_text,
+    )
+    return report, indicators
+
+
+@dataclass
+class ChunkResult:
+    """Разобранный кусок: отчеты и их показатели (списки одной длины)"""
+    reports: list
+    indicators: list
+    items: int
+    rejected: int
+    errors: list  # (номер записи в куске, текст ошибки)
+    seconds: float
+
+
+def transform_chunk(kind: str, data: bytes) -> ChunkResult:
+    """Задача пула: разбор куска; повтор отчета в куске заменяет предыдущий"""
+    started = time.perf_counter()
+    if kind == "json":
+        items = json.loads(b"[" + data + b"]")
+    else:
+        items = [line for line in data.splitlines() if line.strip()]
+
+    parsed = {}
+    rejected = 0
+    errors = []
+    for idx, item in enumerate(items, 1):
+        try:
+            if kind != "json":
+                item = json.loads(item)
+            report, indicators = map_report(item)
+        except Exception as e:
+            rejected += 1
+            if len(errors) < MAX_PRINTED_ERRORS:
+                errors.append((idx, str(e)))
+            continue
+        key = (report[1], report[2], report[3])
+        parsed.pop(key, None)
+        parsed[key] = (report, indicators)
+    return ChunkResult(
+        [report for report, _ in parsed.values()],
+        [indicators for _, indicators in parsed.values()],
+        len(items), rejected, errors, time.perf_counter() - started,
+    )
+
+
+@dataclass
+class ImportStats:
+    """Счетчики и время стадий импорта файла"""
+    read_bytes: int = 0
+    items: int = 0
+    rejected: int = 0
+    reports: int = 0
+    replaced: int = 0
+    indicators: int = 0
+    transform_seconds: float = 0.0  # сумма по процессам
+    write_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    printed_errors: int = 0
+
+
+async def write_chunk(session, result: ChunkResult) -> tuple[int, dict]:
+    """
+    Кусок одной транзакцией: замена прежних версий отчетов, COPY отчетов и показателей.
+    Возвращает (заменено отчетов, {фискальный код: компания}).
+    """
+    reports = result.reports
+    company_names = dict((await session.execute(
+        SELECT_COMPANY_NAMES, {"fiscal_codes": sorted({r[1] for r in reports})}
+    )).all())
+    ids = (await session.execute(NEXT_REPORT_IDS, {"count": len(reports)})).scalars().all()
+    replaced = (await session.execute(DELETE_REPORTS, {
+        "fiscal_codes": [r[1] for r in reports],
+        "report_types": [r[2] for r in reports],
+        "report_years": [r[3] for r in reports],
+    })).scalar()
+
+    now = datetime.now(timezone.utc)
+    conn = await session.connection()
+    driver = (await conn.get_raw_connection()).driver_connection
+    await driver.copy_records_to_table(
+        "moldovafinreport",
+        records=[(report_id, *report, now, now) for report_id, report in zip(ids, reports)],
+        columns=REPORT_COLUMNS,
+    )
+    await driver.copy_records_to_table(
+        "moldova_indicators",
+        records=[
+            (report_id, *row, company_names.get(row[1]))
+            for report_id, rows in zip(ids, result.indicators)
+            for row in rows
+        ],
+        columns=INDICATOR_COLUMNS,
+    )
+    await session.commit()
+    return replaced, company_names
+
+
+def report_chunk(label: str, stats: ImportStats, result: ChunkResult) -> None:
+    """Учесть разобранный кусок; ошибки нумеруются по всему файлу"""
+    for idx, message in result.errors:
+        if stats.printed_errors < MAX_PRINTED_ERRORS:
+            stats.printed_errors += 1
+            print(f"❌ Ошибка в {label} записи {stats.items + idx}: {message}")
+    stats.items += result.items
+    stats.rejected += result.rejected
+    stats.transform_seconds += result.seconds
+
+
+async def import_file(path: str, args) -> None:
+    """
+    Импорт одного файла: чтение -> workers процессов разбора -> запись кусков по
+    порядку одним соединением (пока идет COPY, процессы разбирают следующие куски)
+    """
+    label = os.path.basename(path)
+    kind = "jsonl" if path.endswith(".jsonl") else "json"
+    loop = asyncio.get_running_loop()
+    stats = ImportStats()
+    fiscal_codes = set()
+    linked_codes = set()
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 0 else None
+    max_pending = max(1, args.workers) * 2
+    pending = deque()
+    chunks = read_chunks(path, kind, args.chunk_kb * 1024)
+    started = time.perf_counter()
+
+    async def write(session, result: ChunkResult) -> None:
+        report_chunk(label, stats, result)
+        if not result.reports:
+            return
+        write_started = time.perf_counter()
+        replaced, company_names = await write_chunk(session, result)
+        stats.replaced += replaced
+        stats.write_seconds += time.perf_counter() - write_started
+        stats.reports += len(result.reports)
+        stats.indicators += sum(len(rows) for rows in result.indicators)
+        fiscal_codes.update(report[1] for report in result.reports)
+        linked_codes.update(company_names)
+
+    try:
+        async with AsyncSessionLocal() as session:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                data, _ = chunk
+                stats.read_bytes += len(data)
+                if pool is None:
+                    await write(session, transform_chunk(kind, data))
+                    continue
+                pending.append(loop.run_in_executor(pool, transform_chunk, kind, data))
+                while len(pending) >= max_pending:
+                    await write(session, await pending.popleft())
+            while pending:
+                await write(session, await pending.popleft())
+    finally:
+        for future in pending:
+            future.cancel()
+        chunks.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    stats.wall_seconds = time.perf_counter() - started
+
+    wall = stats.wall_seconds or 1e-9
+    print(f"✅ Импорт {label} завершён за {stats.wall_seconds:.1f} с")
+    print(f"   Прочитано: {stats.read_bytes / 1024 / 1024:,.1f} МБ ({stats.read_bytes / 1024 / 1024 / wall:,.1f} МБ/с)")
+    print(f"   Отчетов: {stats.reports:,} (заменено прежних: {stats.replaced:,}), "
+          f"показателей: {stats.indicators:,}, отклонено записей: {stats.rejected:,}")
+    print(f"   Разбор: процессов {max(1, args.workers)}, работа {stats.transform_seconds:.1f} с; "
+          f"запись: {stats.write_seconds:.1f} с, {stats.indicators / wall:,.0f} показателей/с")
+    print(f"   Связано с компаниями: {len(linked_codes):,} из {len(fiscal_codes):,} фискальных кодов")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Импорт финансовых отчетов Молдовы")
+    parser.add_argument("files", nargs="+", help="выгрузки moldovafinreport (JSON или .jsonl)")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="процессов разбора (0 — без пула)")
+    parser.add_argument("--chunk-kb", type=int, default=CHUNK_KB, help="размер куска файла, КБ")
+    args = parser.parse_args()
+
+    for path in args.files:
+        print(f"🚀 Импорт {path}...")
+        try:
+            await import_file(path, args)
+        except FileNotFoundError:
+            print(f"⚠️ Файл {path} не найден, пропускаем.")
+        except ValueError as e:
+            print(f"❌ Файл {path} разобран не полностью: {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,7 @@
 Скрипт для инициализации базы данных - создание всех таблиц
 """
 import asyncio
+from sqlalchemy import text
 from database import engine
 from models.base import Base
 from models.user import User
@@ -12,6 +13,8 @@ from models.review import Review
 async def init_db():
     """Создает все таблицы в базе данных"""
     async with engine.begin() as conn:
+        # pg_trgm нужен для индекса поиска компаний по названию
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         # Создаем все таблицы
         await conn.run_sync(Base.metadata.create_all)
     print("✅ Таблицы успешно созданы!")
@@ -1,5 +1,6 @@
 """Главный файл FastAPI приложения"""
 
+import asyncio
 import os
 
 from fastapi import Depends, FastAPI, Request
@@ -11,8 +12,10 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.sessions import SessionMiddleware
 
+from database import AsyncSessionLocal, QUERY_COUNT_HEADER, start_query_counter
 from dependencies.auth import get_user_from_cookie
 from helpers.translations import DEFAULT_LANG, SUPPORTED_LANGS, get_translations, normalize_lang
+from services.company_index import COMPANY_INDEX_ENABLED, run_company_index
 from routes import registration, login, forgot_password, profile, openapi, legat, offdata, reviews_pages, seo, admin, company_claim, review_request, landing
 
 # Создание приложения FastAPI
@@ -78,7 +81,12 @@ async def log_requests(request: Request, call_next):
     if not request.url.path.startswith("/static") and not request.url.path.startswith("/uploads"):
         print(f"[{real_ip}] {request.method} {request.url.path} ua=\"{user_agent}\"")
     
+    # Отладка: число SQL запросов за время обработки запроса (QUERY_COUNT_HEADER=1)
+    if not QUERY_COUNT_HEADER:
+        return await call_next(request)
+    counter = start_query_counter()
     response = await call_next(request)
+    response.headers["X-DB-Queries"] = str(counter.count)
     return response
 
 # Настройка CORS (разрешить запросы с фронтенда)
@@ -110,6 +118,13 @@ app.include_router(admin.router)
 app.include_router(landing.router)
 
 
+@app.on_event("startup")
+async def start_company_index():
+    """Индекс автодополнения компаний строится в фоне — старт не ждет загрузки"""
+    if COMPANY_INDEX_ENABLED:
+        app.state.company_index_task = asyncio.create_task(run_company_index(AsyncSessionLocal))
+
+
 @app.get("/{lang}/profile", response_class=HTMLResponse)
 @app.get("/{lang}/profile/{path:path}", response_class=HTMLResponse)
 @app.get("/{lang}/settings", response_class=HTMLResponse)
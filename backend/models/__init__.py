@@ -3,6 +3,8 @@ from models.user import User, UserRole
 from models.codes import VerificationCode
 from models.review import Review
 from models.company import Company
+from models.company_list_anchor import CompanyListAnchor
+from models.review_page_anchor import ReviewPageAnchor
 from models.company_claim import CompanyClaim, ClaimStatus
 from models.review_request import ReviewRequest, ReviewRequestStatus
 
@@ -13,6 +15,8 @@ __all__ = [
     "VerificationCode",
     "Review",
     "Company",
+    "CompanyListAnchor",
+    "ReviewPageAnchor",
     "CompanyClaim",
     "ClaimStatus",
     "ReviewRequest",
@@ -1,7 +1,8 @@
 """
 Модель для таблицы companies (кэш уникальных названий компаний)
 """
-from sqlalchemy import Column, String, Integer, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, ForeignKey, Text, Float, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 
 from models.base import Base
@@ -10,15 +11,30 @@ from models.base import Base
 class Company(Base):
     """
     Кэш-таблица уникальных названий компаний с предрассчитанной статистикой.
-    Используется для быстрого автопоиска и пагинации.
+    Используется для быстрого автопоиска, пагинации и страницы компании.
 
-    Обновлять периодически скриптом: sql/update_companies_stats.sql
+    Статистика обновляется при каждой записи в reviews (services/company_stats_service.py).
+    Полная пересборка при расхождении: python update_companies_stats.py
+
+    Поиск по названию: GIN-индекс pg_trgm (подстрока и похожесть) и btree по первым
+    1–2 символам lower(name) с числом отзывов для коротких запросов по началу названия
+    (services/reviews_service.py).
     """
     __tablename__ = "companies"
 
     name = Column(String, primary_key=True, index=True)
     reviews_count = Column(Integer, default=0, nullable=False)
     min_review_id = Column(Integer, nullable=True, index=True)
+
+    # Агрегаты по отзывам для страницы компании
+    comments_count = Column(Integer, default=0, nullable=False, server_default="0")  # Отзывы с комментариями
+    avg_rating = Column(Float, nullable=True)  # Средняя оценка (ATI без оценки = 5)
+    jurisdiction = Column(String, nullable=True)  # Юрисдикция из любого отзыва
+    report_years = Column(ARRAY(Integer), nullable=True)  # Годы отчетов, по убыванию
+
+    # Маркер изменения: новые/измененные отзывы или правка данных компании (sitemap,
+    # опрос изменений индексом поиска — services/company_index.py)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(), index=True)
     
     # Владелец компании (если заявка одобрена)
     owner_user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
@@ -34,5 +50,29 @@ class Company(Base):
     # Связь с пользователем-владельцем
     owner = relationship("User", foreign_keys=[owner_user_id])
 
+    __table_args__ = (
+        Index(
+            "ix_companies_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # Короткий запрос: компании на эти 1–2 символа сразу по убыванию числа отзывов
+        Index(
+            "ix_companies_prefix1_popular",
+            func.left(func.lower(name), 1),
+            reviews_count.desc(),
+            name,
+        ),
+        Index(
+            "ix_companies_prefix2_popular",
+            func.left(func.lower(name), 2),
+            reviews_count.desc(),
+            name,
+        ),
+        # Совпадения с началом названия для поиска от 3 символов — в порядке байтов
+        Index("ix_companies_name_lower_c", func.lower(name).collate("C")),
+    )
+
     def __repr__(self):
         return f"<Company(name='{self.name}', reviews={self.reviews_count}, owner_id={self.owner_user_id})>"
\ No newline at end of file
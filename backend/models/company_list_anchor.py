@@ -0,0 +1,28 @@
+"""
+Модель для таблицы company_list_anchors (якоря страниц списка компаний)
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+
+from models.base import Base
+
+
+class CompanyListAnchor(Base):
+    """
+    Первая компания каждой страницы списка /{lang}/reviews (порядок по name).
+    Позволяет открыть любую страницу без OFFSET.
+
+    changed_at — когда изменилось содержимое страницы: сдвиг состава страницы
+    или изменение одной из ее компаний (<lastmod> страницы в sitemap).
+
+    Пересобирается вместе с sitemap (python generate_sitemaps.py); при создании компаний
+    (CompanyStatsService.refresh, профиль владельца, одобрение заявки на компанию) — со
+    страницы, на которую попала первая новая.
+    """
+    __tablename__ = "company_list_anchors"
+
+    page = Column(Integer, primary_key=True)
+    first_name = Column(String, nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<CompanyListAnchor(page={self.page}, first_name='{self.first_name}')>"
@@ -0,0 +1,38 @@
+"""
+Модель для показателей финансовых отчетов Молдовы (MoldovaIndicator)
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String, Numeric, Index
+
+from models.base import Base
+
+
+class MoldovaIndicator(Base):
+    """
+    Строка показателя из detailed_data отчета moldovafinreport:
+    одна строка на поле группы (groups[].fields[]) со значениями как числами.
+
+    Связь с компаниями — subject (companies.name), заполняется при загрузке по
+    фискальному коду: reviews.fiscal_code -> reviews.subject. NULL — компании с таким
+    кодом еще нет. Загружается вместе с отчетами: python import_moldova_reports.py
+    """
+    __tablename__ = "moldova_indicators"
+
+    report_id = Column(Integer, primary_key=True)  # moldovafinreport.id
+    line_no = Column(Integer, primary_key=True)  # Порядковый номер поля в отчете
+    fiscal_code = Column(String, nullable=False)
+    report_year = Column(Integer, nullable=False)
+    group_no = Column(SmallInteger, nullable=False)  # Номер группы (таблицы) отчета
+    code = Column(String, nullable=True)
+    prev = Column(Numeric, nullable=True)  # Значение на начало периода (datePrev)
+    current = Column(Numeric, nullable=True)  # Значение на конец периода (dateCurrent)
+    subject = Column(String, nullable=True)  # Компания (companies.name)
+
+    __table_args__ = (
+        # Показатель компании по годам
+        Index("ix_moldova_indicators_fiscal_code_code_year", fiscal_code, code, report_year),
+        # Показатели по компании (странице компании)
+        Index("ix_moldova_indicators_subject_code_year", subject, code, report_year),
+    )
+
+    def __repr__(self):
+        return f"<MoldovaIndicator(report_id={self.report_id}, code='{self.code}', current={self.current})>"
@@ -2,7 +2,7 @@
 Модель для отзывов о компаниях
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from models.base import Base
 
@@ -46,6 +46,8 @@ class Review(Base):
     report_year = Column(Integer, nullable=True)
     detail_data = Column(JSONB, nullable=True)
     detailed_data = Column(JSONB, nullable=True)
+    # Переведенные таблицы и ключевые показатели из detailed_data (helpers/financial_tables.py)
+    financial_tables = Column(JSONB, nullable=True)
     # Поля из legalEntity
     cuiio = Column(String, nullable=True)
     email = Column(String, nullable=True)
@@ -85,6 +87,15 @@ class Review(Base):
     legal_entity_id = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
 
+    __table_args__ = (
+        # Keyset-пагинация отзывов компании (только отзывы с комментариями)
+        Index(
+            "ix_reviews_subject_date_id_commented",
+            subject, review_date.desc(), id,
+            postgresql_where=text("comment IS NOT NULL AND comment <> ''"),
+        ),
+    )
+
     def __repr__(self):
         return f"<Review(id={self.id}, subject='{self.subject}', rating={self.rating})>"
 
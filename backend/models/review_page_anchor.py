@@ -0,0 +1,26 @@
+"""
+Модель для таблицы review_page_anchors (якоря страниц отзывов компании)
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+
+from models.base import Base
+
+
+class ReviewPageAnchor(Base):
+    """
+    Ключ (review_date, id) каждого REVIEW_ANCHOR_EVERY-го отзыва с комментарием компании
+    в порядке страницы компании (review_date DESC, id). position — номер отзыва с нуля,
+    нулевой не хранится. ?page=N открывается от ближайшего якоря: OFFSET не длиннее
+    REVIEW_ANCHOR_EVERY записей индекса при любой глубине страницы.
+
+    Пересобирается для затронутых компаний при пересчете статистики (CompanyStatsService).
+    """
+    __tablename__ = "review_page_anchors"
+
+    subject = Column(String, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    review_date = Column(DateTime(timezone=True), nullable=True)
+    review_id = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<ReviewPageAnchor(subject='{self.subject}', position={self.position})>"
@@ -17,6 +17,10 @@ from models.user import User, UserRole
 from models.company_claim import CompanyClaim, ClaimStatus
 from models.review_request import ReviewRequest, ReviewRequestStatus
 from services.review_request_service import ReviewRequestService
+from services.company_stats_service import CompanyStatsService
+from services.company_index import company_index
+from helpers.financial_tables import build_financial_tables
+from helpers.page_cache import page_cache
 from services.landing.hero_service import HeroService
 from services.landing import LandingService
 from schemas.landing import (
@@ -112,6 +116,32 @@ async def get_stats(db: AsyncSession = Depends(get_db)):
     )
 
 
+@router.get("/page-cache")
+async def get_page_cache_stats():
+    """Статистика кэша SSR страниц: попадания, промахи, вытеснения, размер"""
+    return page_cache.stats()
+
+
+@router.delete("/page-cache")
+async def clear_page_cache():
+    """Очистить кэш SSR страниц"""
+    page_cache.clear()
+    return {"message": "Кэш страниц очищен"}
+
+
+@router.get("/company-index")
+async def get_company_index_stats():
+    """Состояние индекса автодополнения компаний"""
+    return company_index.stats()
+
+
+@router.post("/company-index/rebuild")
+async def rebuild_company_index(db: AsyncSession = Depends(get_db)):
+    """Пересобрать индекс автодополнения из таблицы companies"""
+    await company_index.rebuild(db)
+    return company_index.stats()
+
+
 @router.get("/users", response_model=PaginatedUsersResponse)
 async def list_users(
     page: int = Query(1, ge=1),
@@ -700,12 +730,16 @@ async def update_review(
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
 
+    old_subject = review.subject
     update_data = data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         if hasattr(review, field):
             setattr(review, field, value)
+    if "detailed_data" in update_data:
+        review.financial_tables = build_financial_tables(review.detailed_data)
 
-    await db.commit()
+    await db.flush()
+    await CompanyStatsService(db).refresh([old_subject, review.subject])
     await db.refresh(review)
     return {"message": "Отзыв обновлён", "id": review.id}
 
@@ -718,8 +752,10 @@ async def delete_review(review_id: int, db: AsyncSession = Depends(get_db)):
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
 
+    subject = review.subject
     await db.delete(review)
-    await db.commit()
+    await db.flush()
+    await CompanyStatsService(db).refresh([subject])
     return {"message": "Отзыв удалён"}
 
 
@@ -1127,6 +1163,7 @@ async def update_company_info(company_name: str, payload: dict, db: AsyncSession
     
     await db.commit()
     await db.refresh(company)
+    page_cache.invalidate_company(company_name)
     return {"message": "Updated successfully"}
 
 
@@ -1180,11 +1217,15 @@ async def update_review(review_id: int, payload: dict, db: AsyncSession = Depend
         raise HTTPException(status_code=404, detail="Review not found")
     
     # Обновляем все переданные поля
+    old_subject = review.subject
     for key, value in payload.items():
         if hasattr(review, key):
             setattr(review, key, value)
+    if "detailed_data" in payload:
+        review.financial_tables = build_financial_tables(review.detailed_data)
     
-    await db.commit()
+    await db.flush()
+    await CompanyStatsService(db).refresh([old_subject, review.subject])
     await db.refresh(review)
     return {"message": "Updated successfully"}
 
@@ -1198,6 +1239,8 @@ async def delete_review(review_id: int, db: AsyncSession = Depends(get_db)):
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     
+    subject = review.subject
     await db.delete(review)
-    await db.commit()
+    await db.flush()
+    await CompanyStatsService(db).refresh([subject])
     return {"message": "Deleted successfully"}
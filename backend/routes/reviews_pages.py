@@ -3,21 +3,22 @@
 """
 import os
 import logging
-from urllib.parse import quote, unquote
+from urllib.parse import quote, unquote, urlencode
 from fastapi import APIRouter, Depends, Request, Query
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import get_db
-from services.reviews_service import ReviewsService
+from services.reviews_service import ReviewsService, CompanyPageLoader, ReviewKey, encode_cursor, decode_cursor
+from services.company_index import company_index
 from helpers.translations import (
     SUPPORTED_LANGS, DEFAULT_LANG,
     normalize_lang, get_translations
 )
-from helpers.financial_translations import (
-    get_translated_group_name, get_translated_indicator
-)
+from helpers.financial_tables import get_financial_tables
+from helpers.page_cache import page_cache, company_tag, LIST_TAG
+from helpers.template_stream import TEMPLATE_STREAMING, stream_template_response
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -162,11 +163,33 @@ def extract_path_without_lang(request: Request) -> str:
     return f"/{tail}" if tail else "/"
 
 
-def build_seo_context(request: Request, lang_code: str) -> dict:
-    """Строит SEO контекст для шаблона"""
+def seo_query(params: dict) -> str:
+    """
+    Query canonical/hreflang из разобранных параметров маршрута, в порядке передачи.
+    Пустые и page=1 опускаются; курсоры ссылок пагинации (after/before) сюда не
+    передаются — страница та же, что и по ?page=N.
+    """
+    return urlencode([
+        (key, value) for key, value in params.items()
+        if value is not None and not (key == "page" and value == 1)
+    ])
+
+
+def parse_cursor(value: str | None) -> ReviewKey | None:
+    """Курсор из URL; некорректный — None (страница откроется по номеру)"""
+    if not value:
+        return None
+    try:
+        return decode_cursor(value)
+    except ValueError:
+        return None
+
+
+def build_seo_context(request: Request, lang_code: str, **params) -> dict:
+    """Строит SEO контекст для шаблона; params — разобранные параметры запроса страницы"""
     base_url = build_base_url(request)
     path_without_lang = extract_path_without_lang(request)
-    query_part = request.url.query
+    query_part = seo_query(params)
     hreflangs = build_alt_links(request, path_without_lang, query_part)
     canonical = f"{base_url}/{lang_code}{path_without_lang}"
     if query_part:
@@ -178,6 +201,29 @@ def build_seo_context(request: Request, lang_code: str) -> dict:
     }
 
 
+def page_cache_key(request: Request, route: str, lang: str, *params, **seo_params) -> tuple:
+    """
+    Ключ кэша страницы: маршрут, язык, параметры и всё, что влияет на canonical/hreflang.
+    Только разобранные параметры — лишние или переставленные в URL не создают новых записей.
+    """
+    return (route, lang, *params, build_base_url(request), seo_query(seo_params))
+
+
+def cursor_noindex(response: Response, *cursors: str | None) -> Response:
+    """
+    URL с курсором пагинации — копия ?page=N: canonical ведет на нее, а сама копия
+    не индексируется (заголовок, а не meta — тело страницы общее в кэше)
+    """
+    if any(cursors):
+        response.headers["X-Robots-Tag"] = "noindex, follow"
+    return response
+
+
+def cached_page(key: tuple) -> HTMLResponse | None:
+    body = page_cache.get(key)
+    return HTMLResponse(content=body) if body is not None else None
+
+
 # === Роуты ===
 
 @router.get("/reviews", response_class=RedirectResponse, status_code=302)
@@ -193,13 +239,18 @@ async def reviews_list_page(
     db: AsyncSession = Depends(get_db)
 ):
     lang_code = normalize_lang(lang)
-    
+
+    cache_key = page_cache_key(request, "reviews_list", lang, page=page)
+    cached = cached_page(cache_key)
+    if cached:
+        return cached
+
     service = ReviewsService(db)
 
     companies, has_next = await service.get_companies_page(page)
     companies_data = [c.model_dump() for c in companies]
 
-    seo = build_seo_context(request, lang_code)
+    seo = build_seo_context(request, lang_code, page=page)
     t = get_translations(lang_code)
 
     # Формируем мета-теги: разные для первой страницы и последующих
@@ -210,7 +261,7 @@ async def reviews_list_page(
         meta_title = t.get("list_title_page", "All company reviews — page {page}").format(page=page) + " | SafeLogist"
         meta_desc = t.get("list_subtitle_page", "").format(page=page)
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "reviews_list.html",
         {
             "request": request,
@@ -226,6 +277,8 @@ async def reviews_list_page(
             **seo,
         }
     )
+    page_cache.set(cache_key, response.body, tags=(LIST_TAG,))
+    return response
 
 
 @router.get("/api/reviews/search", response_class=JSONResponse)
@@ -238,8 +291,12 @@ async def reviews_search_api(
     if not search_term:
         return JSONResponse(content={"companies": []})
 
-    service = ReviewsService(db)
-    companies = await service.search_companies(search_term, limit)
+    # Индекс в памяти (префикс, затем подстрока); в БД — только пока он не построен.
+    # Нечеткий поиск (опечатки) — на странице /reviews/search
+    companies = await company_index.search(search_term, limit)
+    if companies is None:
+        service = ReviewsService(db)
+        companies = await service.search_companies(search_term, limit)
 
     return JSONResponse(content={
         "companies": [{"name": c.name, "id": c.id, "reviews_count": c.reviews_count} for c in companies]
@@ -259,14 +316,21 @@ async def reviews_search_page(
     db: AsyncSession = Depends(get_db)
 ):
     lang_code = normalize_lang(lang)
+
+    search_query = q.strip()
+    cache_key = page_cache_key(request, "reviews_search", lang, q=search_query)
+    cached = cached_page(cache_key)
+    if cached:
+        return cached
+
     service = ReviewsService(db)
 
-    companies = await service.search_companies_with_stats(q.strip())
+    companies = await service.search_companies_with_stats(search_query)
     reports_data = [c.model_dump() for c in companies]
 
-    seo = build_seo_context(request, lang_code)
+    seo = build_seo_context(request, lang_code, q=search_query)
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "reviews_list.html",
         {
             "request": request,
@@ -274,12 +338,14 @@ async def reviews_search_page(
             "current_page": 1,
             "total_pages": 1,
             "total_companies": len(reports_data),
-            "search_query": q,
+            "search_query": search_query,
             "lang": lang_code,
             "t": get_translations(lang_code),
             **seo,
         }
     )
+    page_cache.set(cache_key, response.body, tags=(LIST_TAG,))
+    return response
 
 
 @router.get("/reviews/{company_slug:path}", response_class=RedirectResponse, status_code=302)
@@ -304,18 +370,31 @@ async def company_reviews_page(
     company_id: int,
     page: int = Query(1, ge=1),
     year: int = Query(None),
+    after: str = Query(None),
+    before: str = Query(None),
     db: AsyncSession = Depends(get_db)
 ):
     lang_code = normalize_lang(lang)
+
+    cache_key = page_cache_key(request, "company_reviews", lang, company_id, page=page, year=year)
+    cached = cached_page(cache_key)
+    if cached:
+        return cursor_noindex(cached, after, before)
+
     t = get_translations(lang_code)
-    seo = build_seo_context(request, lang_code)
+    seo = build_seo_context(request, lang_code, page=page, year=year)
     
-    service = ReviewsService(db)
     per_page = 10
 
-    # Получаем название компании
-    company_name = await service.get_company_name_by_review_id(company_id)
-    if not company_name:
+    # Все данные страницы — за два запроса к БД; ссылки пагинации передают курсор.
+    # Курсор не проверяется на принадлежность странице page (устаревший или чужой),
+    # поэтому страница по курсору в общий кэш ?page=N не попадает
+    after_key = parse_cursor(after) if page > 1 else None
+    before_key = parse_cursor(before) if page > 1 else None
+    cacheable = after_key is None and before_key is None
+    loader = CompanyPageLoader(db)
+    data = await loader.load(company_id, page, year, per_page, after=after_key, before=before_key)
+    if data is None:
         return HTMLResponse(
             content=f"""<!DOCTYPE html>
             <html lang="{lang_code}">
@@ -332,85 +411,44 @@ async def company_reviews_page(
             status_code=404
         )
 
-    # Получаем данные
-    total_reviews = await service.get_company_reviews_count(company_name)
-    reviews = await service.get_company_reviews(company_name, page, per_page)
-    
-    # Получаем доступные годы отчетов
-    available_years = await service.get_available_report_years(company_name)
-    selected_year = year if year and year in available_years else (available_years[0] if available_years else None)
-    
-    # Получаем данные за выбранный год (для финансовых отчетов)
-    financial_review = None
-    if selected_year:
-        financial_review = await service.get_company_review_by_year(company_name, selected_year)
-    
-    # Проверяем, занята ли компания (есть ли владелец) и получаем данные владельца
-    from models.company import Company
-    from models.review import Review
-    from models.user import User
-    from sqlalchemy import select as sql_select
-
-    base_review_query = sql_select(Review).where(Review.id == company_id)
-    base_review_result = await db.execute(base_review_query)
-    base_review = base_review_result.scalars().first()
-    company_query = sql_select(Company).where(Company.name == company_name)
-    company_result = await db.execute(company_query)
-    company = company_result.scalars().first()
+    company_name = data.company_name
+    total_reviews = data.total_reviews
+    reviews = data.reviews
+    available_years = data.available_years
+    selected_year = data.selected_year
+    financial_review = data.financial_review
+    base_review = data.base_review
+    company = data.company
     is_claimed = company and company.owner_user_id is not None
-    
+
     # Получаем данные владельца компании
     owner_data = None
-    if is_claimed and company.owner_user_id:
-        owner_query = sql_select(User).where(User.id == company.owner_user_id)
-        owner_result = await db.execute(owner_query)
-        owner = owner_result.scalars().first()
-        if owner:
-            # Используем данные из company (приоритет), если нет - из user
-            photo_path = company.logo if company.logo else owner.photo
-            owner_data = {
-                "name": company.contact_person if company.contact_person else owner.name,
-                "position": owner.position,
-                "email": company.contact_email if company.contact_email else owner.email,
-                "phone": company.contact_phone if company.contact_phone else owner.phone,
-                "photo": f"/static/user_photos/{photo_path}" if photo_path else None,
-            }
-            print(f"✅ Owner data loaded: {owner_data}")
+    owner = data.owner
+    if is_claimed and owner:
+        # Используем данные из company (приоритет), если нет - из user
+        photo_path = company.logo if company.logo else owner.photo
+        owner_data = {
+            "name": company.contact_person if company.contact_person else owner.name,
+            "position": owner.position,
+            "email": company.contact_email if company.contact_email else owner.email,
+            "phone": company.contact_phone if company.contact_phone else owner.phone,
+            "photo": f"/static/user_photos/{photo_path}" if photo_path else None,
+        }
 
     total_pages = (total_reviews + per_page - 1) // per_page
     display_name = reviews[0].subject if reviews else company_name
 
-    # Вычисляем средний рейтинг и юрисдикцию по ВСЕМ отзывам компании для SEO
-    avg_rating = await service.get_company_avg_rating(company_name)
-    jurisdiction = await service.get_company_jurisdiction(company_name)
-
-    # Извлекаем финансовые данные для SEO из financial_review (если есть)
-    financial_data = None
-    if financial_review and hasattr(financial_review, 'detailed_data') and financial_review.detailed_data:
-        detailed_data = financial_review.detailed_data
-        if isinstance(detailed_data, dict) and 'groups' in detailed_data:
-            financial_data = {}
-            for group in detailed_data['groups']:
-                fields = group.get('fields', [])
-                for field in fields:
-                    name = field.get('name', '').lower()
-                    current = field.get('dateCurrent', '')
-                    if current and current.strip():
-                        # Итого активы
-                        if 'total active' in name or 'итого активы' in name:
-                            financial_data['assets'] = current
-                        # Итого внеоборотные активы
-                        elif 'total active imobilizate' in name or 'итого внеоборотные активы' in name:
-                            financial_data['fixed_assets'] = current
-                        # Итого оборотные активы
-                        elif 'total active circulante' in name or 'итого оборотные активы' in name:
-                            financial_data['current_assets'] = current
-                        # Денежные средства
-                        elif 'numerar' in name or 'денежные средства' in name:
-                            financial_data['cash'] = current
-                        # Уставный капитал
-                        elif 'capital social' in name or 'уставный капитал' in name or 'уставний капітал' in name:
-                            financial_data['capital'] = current
+    # Соседние страницы открываются от первого / последнего отзыва этой — без OFFSET
+    prev_cursor = encode_cursor((reviews[0].review_date, reviews[0].id)) if reviews and page > 2 else None
+    next_cursor = encode_cursor((reviews[-1].review_date, reviews[-1].id)) if reviews else None
+
+    # Средний рейтинг и юрисдикция по ВСЕМ отзывам компании для SEO
+    avg_rating = data.avg_rating
+    jurisdiction = data.jurisdiction
+
+    # Финансовые таблицы и показатели для SEO предрассчитаны при сохранении отчета
+    financial_tables = get_financial_tables(financial_review)
+    financial_data = financial_tables["key_figures"] if financial_tables else None
 
     # Генерируем SEO мета-теги с учётом данных компании
     seo_data = generate_company_seo(
@@ -425,9 +463,7 @@ async def company_reviews_page(
     meta_title = seo_data["title"]
     meta_desc = seo_data["description"]
 
-    # Получаем ID reviewer'ов
-    reviewer_names = [r.reviewer for r in reviews if r.reviewer and r.reviewer.strip()]
-    reviewer_id_map = await service.get_reviewer_ids(reviewer_names) if reviewer_names else {}
+    reviewer_id_map = data.reviewer_ids
 
     # Формируем данные отзывов
     review_items = []
@@ -606,33 +642,8 @@ async def company_reviews_page(
         },
     ])
 
-    if has_financial_data:
-        detailed_data = get_attr(fin_review, "detailed_data")
-        if detailed_data and isinstance(detailed_data, dict):
-            groups = detailed_data.get("groups", [])
-            for group in groups:
-                group_name = group.get("name", "")
-                fields = group.get("fields", [])
-                translated_group_name = get_translated_group_name(group_name, lang)
-                rows = []
-                for field in fields:
-                    code = field.get("code", "")
-                    name = field.get("name", "")
-                    date_prev = field.get("datePrev", "")
-                    date_current = field.get("dateCurrent", "")
-                    translated_name = get_translated_indicator(code, name, lang)
-                    if date_prev or date_current:
-                        rows.append({
-                            "code": code,
-                            "name": translated_name,
-                            "date_prev": date_prev if date_prev else "—",
-                            "date_current": date_current if date_current else "—",
-                        })
-                if rows:
-                    financial_groups.append({
-                        "title": translated_group_name,
-                        "rows": rows,
-                    })
+    if has_financial_data and financial_tables:
+        financial_groups = financial_tables["groups"].get(lang_code, [])
 
     first_for_jsonld = fin_review or base_review
     if first_for_jsonld:
@@ -660,32 +671,46 @@ async def company_reviews_page(
         if structured_reviews:
             company_jsonld["review"] = structured_reviews
 
-    return templates.TemplateResponse(
-        "company_reviews.html",
-        {
-            "request": request,
-            "lang": lang_code,
-            "t": t,
-            "display_name": display_name,
-            "total_reviews": total_reviews,
-            "page": page,
-            "total_pages": total_pages,
-            "reviews": review_items,
-            "company_id": company_id,
-            "company_jsonld": company_jsonld,
-            "company_sections": company_sections,
-            "financial_sections": financial_sections,
-            "financial_groups": financial_groups,
-            "available_years": available_years,
-            "selected_year": selected_year,
-            "meta_title": meta_title,
-            "meta_desc": meta_desc,
-            "og_url": seo['canonical'],
-            "og_image": f"{seo['base_url']}/static/safelogist_1.png",
-            "is_claimed": is_claimed,
-            "owner_data": owner_data,  # Данные владельца
-            "avg_rating": avg_rating,  # Средний рейтинг
-            "show_locked_ui": True,
-            **seo,
-        }
-    )
+    context = {
+        "request": request,
+        "lang": lang_code,
+        "t": t,
+        "display_name": display_name,
+        "total_reviews": total_reviews,
+        "page": page,
+        "total_pages": total_pages,
+        "prev_cursor": prev_cursor,
+        "next_cursor": next_cursor,
+        "reviews": review_items,
+        "company_id": company_id,
+        "company_jsonld": company_jsonld,
+        "company_sections": company_sections,
+        "financial_sections": financial_sections,
+        "financial_groups": financial_groups,
+        "available_years": available_years,
+        "selected_year": selected_year,
+        "meta_title": meta_title,
+        "meta_desc": meta_desc,
+        "og_url": seo['canonical'],
+        "og_image": f"{seo['base_url']}/static/safelogist_1.png",
+        "is_claimed": is_claimed,
+        "owner_data": owner_data,  # Данные владельца
+        "avg_rating": avg_rating,  # Средний рейтинг
+        "show_locked_ui": True,
+        **seo,
+    }
+    tags = (company_tag(company_name),)
+
+    def store(body: bytes) -> None:
+        if cacheable:
+            page_cache.set(cache_key, body, tags=tags)
+
+    if TEMPLATE_STREAMING:
+        return cursor_noindex(
+            stream_template_response("company_reviews.html", context, on_complete=store),
+            after, before,
+        )
+
+    response = templates.TemplateResponse("company_reviews.html", context)
+    store(response.body)
+    return cursor_noindex(response, after, before)
@@ -1,37 +1,145 @@
 """
 SEO роуты: sitemap.xml, robots.txt
+
+Sitemap отдаются из файлов generate_sitemaps.py; отсутствующий файл генерируется
+по запросу тем же services/sitemap_service.py (шард компаний — по манифесту шардов).
 """
 import os
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import Response
+import asyncio
+import hashlib
+from typing import Optional
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from datetime import datetime
 
 from database import get_db
-from models.review import Review
+from helpers.sitemap_writer import gz_path, read_sitemap
+from services.sitemap_service import (
+    SitemapService,
+    SITEMAP_DIR,
+    SITEMAP_LANGS,
+    company_shard_filename,
+    pages_sitemap_filename,
+    pages_sitemap_range,
+    utc_today,
+    write_pages_sitemap,
+    write_sitemap_index,
+)
 
 SUPPORTED_LANGS = ["ru", "en", "uk", "ro"]
 DEFAULT_LANG = "ru"
-SITEMAP_DIR = "static/sitemaps"
 os.makedirs(SITEMAP_DIR, exist_ok=True)
 
 router = APIRouter(tags=["seo"])
 
+# path -> ((st_mtime_ns, st_size), md5 содержимого)
+_etags: dict[str, tuple[tuple[int, int], str]] = {}
+
 
 def normalize_lang(lang: str) -> str:
     lang_code = (lang or "").lower()
     return lang_code if lang_code in SUPPORTED_LANGS else DEFAULT_LANG
 
 
-def save_sitemap(content: str, filename: str) -> None:
-    """Сохранить sitemap в статическую директорию"""
+def get_base_url(request: Request) -> str:
+    base_url = os.getenv("BASE_URL", str(request.base_url)).rstrip('/')
+    if base_url.startswith("http://"):
+        base_url = "https://" + base_url.removeprefix("http://")
+    return base_url
+
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read(), usedforsecurity=False).hexdigest()
+
+
+async def sitemap_etag(path: str, stat_result: os.stat_result) -> str:
+    """
+    Strong ETag по содержимому .xml.gz. gzip детерминированный, поэтому
+    перезаписанный без изменений шард сохраняет ETag. Считается один раз на версию файла.
+    """
+    version = (stat_result.st_mtime_ns, stat_result.st_size)
+    cached = _etags.get(path)
+    if cached and cached[0] == version:
+        return cached[1]
+    digest = await asyncio.to_thread(_file_digest, path)
+    _etags[path] = (version, digest)
+    return digest
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Accept-Encoding допускает gzip (RFC 9110): gzip или x-gzip с q > 0; если gzip не
+    назван — по "*". "gzip;q=0" — отказ.
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        coding = coding.lower()
+        if coding == "x-gzip":
+            coding = "gzip"
+        if coding:
+            qualities[coding] = max(qualities.get(coding, 0.0), quality)
+    quality = qualities.get("gzip", qualities.get("*", 0.0))
+    return quality > 0
+
+
+def is_not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    """Условный GET: If-None-Match важнее If-Modified-Since (RFC 9110)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Для GET сравнение слабое: W/"..." совпадает с "..."
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(stat_result.st_mtime) <= since
+    return False
+
+
+async def sitemap_file_response(request: Request, filename: str) -> Response | None:
+    """
+    Отдать сохраненный sitemap: клиенту с gzip — файл .xml.gz как есть через FileResponse
+    (чтение частями вне event loop), иначе распакованным в потоке.
+    ETag/Last-Modified и 304 на If-None-Match/If-Modified-Since. None — файла нет.
+    """
+    filepath = gz_path(SITEMAP_DIR, filename)
     try:
-        filepath = os.path.join(SITEMAP_DIR, filename)
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(content)
-    except IOError as e:
-        print(f"Error saving sitemap {filename}: {e}")
+        stat_result = await asyncio.to_thread(os.stat, filepath)
+    except FileNotFoundError:
+        return None
+
+    gzip_accepted = accepts_gzip(request.headers.get("accept-encoding", ""))
+    digest = await sitemap_etag(filepath, stat_result)
+    # У сжатого и распакованного представлений разные strong ETag; Vary — у обоих и у 304
+    etag = f'"{digest}"' if gzip_accepted else f'"{digest}-xml"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Vary": "Accept-Encoding",
+    }
+
+    if is_not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    if gzip_accepted:
+        headers["Content-Encoding"] = "gzip"
+        return FileResponse(filepath, media_type="application/xml", headers=headers, stat_result=stat_result)
+    content = await asyncio.to_thread(read_sitemap, filepath)
+    return Response(content=content, media_type="application/xml", headers=headers)
 
 
 @router.get("/robots.txt", response_class=Response)
@@ -51,41 +159,84 @@ Sitemap: https://safelogist.net/sitemap.xml
 
 
 @router.get("/sitemap.xml", response_class=Response)
-async def sitemap_index(request: Request, db: AsyncSession = Depends(get_db)):
+async def sitemap_index(request: Request):
     """
     Sitemap Index - главный файл со ссылками на все sitemap
     """
     filename = "sitemap.xml"
-    filepath = os.path.join(SITEMAP_DIR, filename)
     
     # Если файл существует, отдаём его
-    if os.path.exists(filepath):
-        with open(filepath, "r", encoding="utf-8") as f:
-            content = f.read()
-        return Response(content=content, media_type="application/xml")
+    cached = await sitemap_file_response(request, filename)
+    if cached:
+        return cached
     
+    # Если файла нет, генерируем по существующим sitemap
+    await asyncio.to_thread(write_sitemap_index, get_base_url(request))
+    return await sitemap_file_response(request, filename)
+
+
+async def pages_sitemap_response(
+    request: Request, db: AsyncSession, lang: Optional[str], page_num: int
+) -> Response:
+    """Sitemap страниц списка: из файла или генерируется (только для текущего режима)"""
+    filename = pages_sitemap_filename(lang, page_num)
+
+    # Если файл существует, отдаём его
+    cached = await sitemap_file_response(request, filename)
+    if cached:
+        return cached
+
     # Если файла нет, генерируем
-    base_url = os.getenv("BASE_URL", str(request.base_url)).rstrip('/')
-    if base_url.startswith("http://"):
-        base_url = "https://" + base_url.removeprefix("http://")
-    
-    # Ищем все сгенерированные sitemap файлы
-    sitemaps = []
-    for filename in sorted(os.listdir(SITEMAP_DIR)):
-        if filename.startswith("sitemap-") and filename.endswith(".xml"):
-            sitemaps.append(f"""  <sitemap>
-    <loc>{base_url}/{filename}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-  </sitemap>""")
-    
-    sitemap_index = f"""<?xml version="1.0" encoding="UTF-8"?>
-<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/siteindex.xsd">
-{chr(10).join(sitemaps)}
-</sitemapindex>
-"""
-    
-    save_sitemap(sitemap_index, filename)
-    return Response(content=sitemap_index, media_type="application/xml")
+    if lang not in SITEMAP_LANGS:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    base_url = get_base_url(request)
+    service = SitemapService(db)
+    pages_range = pages_sitemap_range(page_num, await service.count_companies(), base_url)
+    if pages_range is None:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    pages = await service.get_list_pages(*pages_range, utc_today())
+    await asyncio.to_thread(write_pages_sitemap, base_url, lang, page_num, pages)
+    return await sitemap_file_response(request, filename)
+
+
+async def company_shard_response(
+    request: Request, db: AsyncSession, lang: Optional[str], page: int
+) -> Response:
+    """
+    Sitemap шарда компаний; отсутствующий шард пересобирается по манифесту
+    (границы шарда по названию компании) — те же шарды, что у generate_sitemaps.py
+    """
+    filename = company_shard_filename(lang, page)
+
+    # Если файл существует, отдаём его
+    cached = await sitemap_file_response(request, filename)
+    if cached:
+        return cached
+
+    # Если файла нет, генерируем только этот шард
+    if lang not in SITEMAP_LANGS:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    urls_count = await SitemapService(db).rebuild_company_shard(get_base_url(request), lang, page)
+    if urls_count is None:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    return await sitemap_file_response(request, filename)
+
+
+# Общие файлы режима hreflang — объявлены раньше языковых, :int отделяет их пути
+@router.get("/sitemap-pages-{page_num:int}.xml", response_class=Response)
+async def sitemap_pages_hreflang(page_num: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Sitemap для пагинации списка отзывов, все языки через hreflang
+    """
+    return await pages_sitemap_response(request, db, None, page_num)
+
+
+@router.get("/sitemap-companies-{page:int}.xml", response_class=Response)
+async def sitemap_companies_hreflang(page: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Sitemap шарда компаний, все языки через hreflang
+    """
+    return await company_shard_response(request, db, None, page)
 
 
 @router.get("/sitemap-pages-{lang}-{page_num}.xml", response_class=Response)
@@ -93,146 +244,12 @@ async def sitemap_pages(lang: str, page_num: int, request: Request, db: AsyncSes
     """
     Sitemap для пагинации списка отзывов (по языкам)
     """
-    lang_code = normalize_lang(lang)
-    filename = f"sitemap-pages-{lang_code}-{page_num}.xml"
-    filepath = os.path.join(SITEMAP_DIR, filename)
-    
-    # Если файл существует, отдаём его
-    if os.path.exists(filepath):
-        with open(filepath, "r", encoding="utf-8") as f:
-            content = f.read()
-        return Response(content=content, media_type="application/xml")
-    
-    # Если файла нет, генерируем
-    base_url = os.getenv("BASE_URL", str(request.base_url)).rstrip('/')
-    if base_url.startswith("http://"):
-        base_url = "https://" + base_url.removeprefix("http://")
-    
-    # Получаем количество компаний для расчета пагинации
-    count_query = select(func.count(func.distinct(Review.subject)))
-    count_result = await db.execute(count_query)
-    total_companies = count_result.scalar() or 0
-    
-    companies_per_page = 10
-    total_pages = max(1, (total_companies + companies_per_page - 1) // companies_per_page)
-    
-    # Максимум 40,000 URL на файл (главная + пагинация)
-    max_urls_per_sitemap = 40000
-    pages_per_sitemap = max_urls_per_sitemap - 1  # -1 для главной страницы
-    
-    start_page = (page_num - 1) * pages_per_sitemap + 1
-    end_page = min(start_page + pages_per_sitemap - 1, total_pages)
-    
-    urls = []
-    
-    # Первая страница только в первом sitemap
-    if page_num == 1:
-        urls.append(f"""  <url>
-    <loc>{base_url}/{lang_code}/reviews</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>daily</changefreq>
-    <priority>1.0</priority>
-  </url>""")
-        start_page = 2
-    
-    # Страницы пагинации
-    for page in range(start_page, end_page + 1):
-        urls.append(f"""  <url>
-    <loc>{base_url}/{lang_code}/reviews?page={page}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>daily</changefreq>
-    <priority>0.9</priority>
-  </url>""")
-    
-    sitemap = f"""<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">
-{chr(10).join(urls)}
-</urlset>
-"""
-    
-    save_sitemap(sitemap, filename)
-    return Response(content=sitemap, media_type="application/xml")
+    return await pages_sitemap_response(request, db, normalize_lang(lang), page_num)
 
 
 @router.get("/sitemap-{lang}-{page}.xml", response_class=Response)
 async def sitemap_companies(lang: str, page: int, request: Request, db: AsyncSession = Depends(get_db)):
-    lang_code = normalize_lang(lang)
-    filename = f"sitemap-{lang_code}-{page}.xml"
-    filepath = os.path.join(SITEMAP_DIR, filename)
-    
-    # Если файл существует, отдаём его
-    if os.path.exists(filepath):
-        with open(filepath, "r", encoding="utf-8") as f:
-            content = f.read()
-        return Response(content=content, media_type="application/xml")
-    
-    # Если файла нет, генерируем
-    base_url = os.getenv("BASE_URL", str(request.base_url)).rstrip('/')
-    if base_url.startswith("http://"):
-        base_url = "https://" + base_url.removeprefix("http://")
-    
-    max_urls_per_sitemap = 45000  # Жесткий лимит
-    reviews_per_page = 10
-    batch_size = 5000  # Берем с запасом для фильтрации
-    offset = (page - 1) * batch_size
-
-    # Получаем компании с их минимальным ID (для URL) и количеством отзывов
-    query = (
-        select(
-            Review.subject.label("subject"),
-            func.min(Review.id).label("company_id"),
-            func.count(Review.id).label("reviews_count")
-        )
-        .group_by(Review.subject)
-        .order_by(Review.subject)
-        .limit(batch_size)
-        .offset(offset)
-    )
-    result = await db.execute(query)
-    companies = result.all()
-    
-    urls = []
-    current_url_count = 0
-    
-    for row in companies:
-        company_id = row.company_id
-        reviews_count = row.reviews_count or 0
-        total_pages = max(1, (reviews_count + reviews_per_page - 1) // reviews_per_page)
-        
-        # Рассчитываем количество URL для этой компании
-        company_urls_count = total_pages
-        
-        # Проверяем, не превысим ли лимит, добавив ВСЕ страницы этой компании
-        if current_url_count + company_urls_count > max_urls_per_sitemap and current_url_count > 0:
-            # Останавливаемся, не добавляя эту компанию
-            break
-
-        # Первая страница (основная)
-        urls.append(f"""  <url>
-    <loc>{base_url}/{lang_code}/reviews/item/{company_id}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.8</priority>
-  </url>""")
-
-        # Все остальные страницы пагинации
-        if total_pages > 1:
-            for page_num in range(2, total_pages + 1):
-                urls.append(f"""  <url>
-    <loc>{base_url}/{lang_code}/reviews/item/{company_id}?page={page_num}</loc>
-    <lastmod>{datetime.now().date().isoformat()}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.7</priority>
-  </url>""")
-        
-        current_url_count += company_urls_count
-    
-    sitemap = f"""<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd">
-{chr(10).join(urls)}
-</urlset>
-"""
-    
-    save_sitemap(sitemap, filename)
-    return Response(content=sitemap, media_type="application/xml")
-
+    """
+    Sitemap шарда компаний (по языкам)
+    """
+    return await company_shard_response(request, db, normalize_lang(lang), page)
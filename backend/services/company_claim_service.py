@@ -12,6 +12,8 @@ from models.company_claim import CompanyClaim, ClaimStatus
 from models.user import User
 from schemas.company_claim import CompanyClaimRequest
 from services.telegram_notifier import telegram_notifier
+from services.reviews_service import ReviewsService
+from helpers.page_cache import page_cache
 
 
 UPLOAD_DIR = "uploads/company_claims"
@@ -269,6 +271,9 @@ class CompanyClaimService:
                 contact_person=user.name
             )
             self.db.add(company)
+            # Новая компания сдвигает страницы списка после себя
+            await self.db.flush()
+            await ReviewsService(self.db).rebuild_companies_page_anchors(since=company_name, commit=False)
             print(f"✅ Создана новая компания '{company_name}' с владельцем user_id={user.id}")
 
         # Обновляем статус заявки
@@ -276,6 +281,7 @@ class CompanyClaimService:
 
         await self.db.commit()
         await self.db.refresh(claim)
+        page_cache.invalidate_company(company_name)
 
         # Отправляем email с учетными данными (только для новых пользователей)
         if is_new_user and temp_password:
@@ -0,0 +1,580 @@
+"""
+In-process индекс названий компаний для автодополнения (/api/reviews/search)
+
+Нормализованные названия лежат одним UTF-8 буфером (каждое с завершающим
+нулевым байтом) с массивом смещений array('I'), исходные названия — так же,
+без разделителя; рядом — массивы min_review_id и reviews_count. Строк Python на
+каждую компанию нет, память — байты названий плюс ~30 байт на компанию и 4 байта
+на каждую различную триграмму ее ключа.
+Разные названия с одинаковым ключом (регистр, пробелы) — отдельные строки.
+
+Поиск по префиксу — два bisect по буферу дают диапазон, top-k по популярности
+в диапазоне — дерево отрезков с позицией максимума (O(k log n), без обхода
+всего диапазона). Если по префиксу найдено меньше limit, ищется подстрока по
+индексу триграмм байтов ключа: для каждой триграммы — отсортированный список
+позиций компаний (один array('I') на все списки, 4 байта на триграмму ключа).
+Кандидаты берутся из самого короткого списка триграмм запроса и проверяются по
+ключу; до SUBSTRING_CANDIDATES первых совпадений, из них — самые популярные.
+Проверок не больше SUBSTRING_MAX_CHECKS — поиск не проходит весь буфер.
+
+Сборка — потоком строк из companies в буферы и массивы, без списка кортежей;
+companies читаются почти в порядке ключа (ORDER BY ... COLLATE "C"), снимок
+пересортировывается, только если порядок нарушен.
+
+Изменения компаний (CompanyStatsService.refresh) попадают в небольшую дельту
+поверх основного массива; при переполнении дельта сливается в новый массив.
+Изменения, пришедшие во время сборки, остаются в дельте и после замены снимка.
+Изменения из других процессов (импорт, другие воркеры) подхватываются опросом
+companies по updated_at раз в COMPANY_INDEX_POLL_SECONDS; раз в
+COMPANY_INDEX_REFRESH_SECONDS индекс пересобирается полностью.
+"""
+import asyncio
+import heapq
+import os
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Iterable, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.company import Company
+from schemas.reviews import CompanySearchResult
+
+COMPANY_INDEX_ENABLED = os.getenv("COMPANY_INDEX_ENABLED", "1") == "1"
+COMPANY_INDEX_REFRESH_SECONDS = float(os.getenv("COMPANY_INDEX_REFRESH_SECONDS", "3600"))
+COMPANY_INDEX_MAX_DELTA = int(os.getenv("COMPANY_INDEX_MAX_DELTA", "1000"))
+COMPANY_INDEX_POLL_SECONDS = float(os.getenv("COMPANY_INDEX_POLL_SECONDS", "30"))
+# updated_at = now() — начало транзакции: строки длинной транзакции появляются
+# с отметкой в прошлом, поэтому каждый опрос перечитывает это окно
+COMPANY_INDEX_POLL_OVERLAP_SECONDS = float(os.getenv("COMPANY_INDEX_POLL_OVERLAP_SECONDS", "300"))
+
+# Поиск по подстроке — с этой длины запроса (короче — только префикс)
+SUBSTRING_MIN_LENGTH = 3
+# Сколько первых совпадений по подстроке ранжировать по популярности
+SUBSTRING_CANDIDATES = 200
+# Сколько кандидатов из списка триграммы проверить за один поиск по подстроке
+SUBSTRING_MAX_CHECKS = 5000
+
+# Верхняя граница диапазона префикса в bisect (байта 0xff в UTF-8 нет)
+_PREFIX_END = b"\xff"
+
+
+def normalize_name(value: str) -> str:
+    """Ключ индекса: регистр не учитывается, пробелы схлопываются"""
+    return " ".join(value.casefold().split())
+
+
+class _Keys:
+    """Последовательность ключей поверх буфера — для bisect без списка строк"""
+
+    def __init__(self, buffer: bytes, offsets: array):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, pos: int) -> bytes:
+        # Без завершающего \x00
+        return self.buffer[self.offsets[pos]:self.offsets[pos + 1] - 1]
+
+
+def _trigrams(key: bytes) -> set[int]:
+    """Различные триграммы байтов ключа — 24-битными числами"""
+    return {(a << 16) | (b << 8) | c for a, b, c in zip(key, key[1:], key[2:])}
+
+
+class _SnapshotBuilder:
+    """
+    Сборка снимка потоком строк: буферы и массивы растут на одну компанию за раз.
+    Строки ожидаются по (key, name); если порядок нарушен — пересортировка в build().
+    """
+
+    def __init__(self):
+        self.key_buffer = bytearray()
+        self.key_offsets = array("I", [0])
+        self.name_buffer = bytearray()
+        self.name_offsets = array("I", [0])
+        self.ids = array("i")
+        self.counts = array("i")
+        self.in_order = True
+        self._last: Optional[tuple[bytes, bytes]] = None
+
+    def add(self, key: str, name: str, min_review_id: int, reviews_count: int) -> None:
+        # Порядок строк совпадает с порядком их UTF-8 байтов
+        current = (key.encode(), name.encode())
+        if self.in_order and self._last is not None and current < self._last:
+            self.in_order = False
+        self._last = current
+        self._append(*current, min_review_id, reviews_count)
+
+    def _append(self, key: bytes, name: bytes, min_review_id: int, reviews_count: int) -> None:
+        self.key_buffer += key
+        self.key_buffer.append(0)
+        self.key_offsets.append(len(self.key_buffer))
+        self.name_buffer += name
+        self.name_offsets.append(len(self.name_buffer))
+        self.ids.append(min_review_id)
+        self.counts.append(reviews_count)
+
+    def build(self) -> "_Snapshot":
+        if not self.in_order:
+            return self._sorted().build()
+        return _Snapshot(
+            self.key_buffer, self.key_offsets, self.name_buffer, self.name_offsets, self.ids, self.counts
+        )
+
+    def _sorted(self) -> "_SnapshotBuilder":
+        keys = _Keys(self.key_buffer, self.key_offsets)
+        names, name_offsets = self.name_buffer, self.name_offsets
+
+        def name(pos: int) -> bytes:
+            return names[name_offsets[pos]:name_offsets[pos + 1]]
+
+        order = sorted(range(len(self.ids)), key=lambda pos: (keys[pos], name(pos)))
+        builder = _SnapshotBuilder()
+        for pos in order:
+            builder._append(keys[pos], name(pos), self.ids[pos], self.counts[pos])
+        return builder
+
+
+class _Snapshot:
+    """
+    Неизменяемый отсортированный массив компаний + дерево отрезков по reviews_count
+    и индекс триграмм ключей для поиска по подстроке
+    """
+
+    def __init__(
+        self,
+        key_buffer: bytearray,
+        key_offsets: array,
+        name_buffer: bytearray,
+        name_offsets: array,
+        ids: array,
+        counts: array,
+    ):
+        # Компании отсортированы по (key, name) — _SnapshotBuilder
+        self.key_buffer = key_buffer
+        self.key_offsets = key_offsets
+        self.name_buffer = name_buffer
+        self.name_offsets = name_offsets
+        self.keys = _Keys(key_buffer, key_offsets)
+        self.ids = ids
+        self.counts = counts
+
+        size = 1
+        while size < len(ids):
+            size *= 2
+        self.size = size
+
+        # Узел хранит позицию компании с максимальным reviews_count в своем отрезке
+        tree = array("i", [-1]) * (2 * size)
+        tree[size:size + len(ids)] = array("i", range(len(ids)))
+        for node in range(size - 1, 0, -1):
+            tree[node] = self._better(tree[2 * node], tree[2 * node + 1])
+        self.tree = tree
+
+        self._build_trigrams()
+
+    def _build_trigrams(self) -> None:
+        """
+        Списки позиций по триграммам, подсчетом в два прохода: trigram_codes —
+        отсортированные триграммы, trigram_starts — начало списка каждой в trigram_positions.
+        Позиции идут по возрастанию: компании перебираются по порядку.
+        """
+        # Триграммы ключей подряд и границы по компаниям — считаются один раз
+        occurrences = array("I")
+        bounds = array("I", [0])
+        slots: Counter = Counter()
+        for pos in range(len(self)):
+            key_codes = _trigrams(self.keys[pos])
+            occurrences.extend(key_codes)
+            bounds.append(len(occurrences))
+            slots.update(key_codes)
+        codes = sorted(slots)
+        self.trigram_codes = array("I", codes)
+        self.trigram_starts = array("I", accumulate((slots[code] for code in codes), initial=0))
+        for code, start in zip(codes, self.trigram_starts):
+            slots[code] = start
+        del codes
+
+        # Второй проход: позиция компании — в следующий свободный слот списка каждой ее триграммы
+        positions = array("I", [0]) * len(occurrences)
+        for pos in range(len(self)):
+            for code in occurrences[bounds[pos]:bounds[pos + 1]]:
+                slot = slots[code]
+                positions[slot] = pos
+                slots[code] = slot + 1
+        self.trigram_positions = positions
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (
+            self.key_offsets, self.name_offsets, self.ids, self.counts, self.tree,
+            self.trigram_codes, self.trigram_starts, self.trigram_positions,
+        )
+        return (len(self.key_buffer) + len(self.name_buffer)
+                + sum(len(a) * a.itemsize for a in arrays))
+
+    def key(self, pos: int) -> str:
+        return self.keys[pos].decode()
+
+    def name(self, pos: int) -> str:
+        return self.name_buffer[self.name_offsets[pos]:self.name_offsets[pos + 1]].decode()
+
+    def rows(self):
+        for pos in range(len(self)):
+            yield self.key(pos), self.name(pos), self.ids[pos], self.counts[pos]
+
+    def _better(self, a: int, b: int) -> int:
+        # При равенстве — меньшая позиция, т.е. по алфавиту
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        count_a, count_b = self.counts[a], self.counts[b]
+        if count_a != count_b:
+            return a if count_a > count_b else b
+        return a if a < b else b
+
+    def _argmax(self, lo: int, hi: int) -> int:
+        """Позиция самой популярной компании в [lo, hi)"""
+        best = -1
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                best = self._better(best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self._better(best, self.tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def prefix_range(self, key: bytes) -> tuple[int, int]:
+        return bisect_left(self.keys, key), bisect_left(self.keys, key + _PREFIX_END)
+
+    def iter_top(self, lo: int, hi: int):
+        """Позиции диапазона [lo, hi) по убыванию reviews_count"""
+        if lo >= hi:
+            return
+        pos = self._argmax(lo, hi)
+        heap = [(-self.counts[pos], pos, lo, hi)]
+        while heap:
+            _, pos, lo, hi = heapq.heappop(heap)
+            yield pos
+            for sub_lo, sub_hi in ((lo, pos), (pos + 1, hi)):
+                if sub_lo < sub_hi:
+                    sub = self._argmax(sub_lo, sub_hi)
+                    heapq.heappush(heap, (-self.counts[sub], sub, sub_lo, sub_hi))
+
+    def _posting(self, code: int) -> tuple[int, int]:
+        """Диапазон trigram_positions со списком триграммы; пустой — ее нет ни в одном ключе"""
+        idx = bisect_left(self.trigram_codes, code)
+        if idx < len(self.trigram_codes) and self.trigram_codes[idx] == code:
+            return self.trigram_starts[idx], self.trigram_starts[idx + 1]
+        return 0, 0
+
+    def find_substring(self, key: bytes, skip: tuple[int, int], limit: int) -> list[int]:
+        """
+        Позиции первых limit компаний (вне диапазона skip), в ключе которых есть key.
+        Кандидаты — из самого короткого списка триграмм key, не больше SUBSTRING_MAX_CHECKS.
+        """
+        if len(key) < 3:
+            return []
+        start, end = min((self._posting(code) for code in _trigrams(key)), key=lambda r: r[1] - r[0])
+        positions, keys = self.trigram_positions, self.keys
+        found: list[int] = []
+        for slot in range(start, min(end, start + SUBSTRING_MAX_CHECKS)):
+            pos = positions[slot]
+            if not skip[0] <= pos < skip[1] and key in keys[pos]:
+                found.append(pos)
+                if len(found) >= limit:
+                    break
+        return found
+
+
+class CompanyIndex:
+    """Поиск компаний по префиксу и подстроке в памяти процесса с top-k по числу отзывов"""
+
+    def __init__(self, max_delta: int):
+        self.max_delta = max_delta
+        self._base: Optional[_Snapshot] = None
+        # name -> (seq, (key, min_review_id, reviews_count) или None для удаленной)
+        self._delta: dict[str, tuple[int, Optional[tuple[str, int, int]]]] = {}
+        self._seq = 0
+        self._compacting = False
+        self._building = False
+        self.built_at: Optional[float] = None
+        self.build_seconds = 0.0
+        self.lookups = 0
+        self.substring_lookups = 0
+        self.compactions = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._base is not None
+
+    @property
+    def accepting(self) -> bool:
+        """Изменения принимаются: индекс построен или строится (первая сборка)"""
+        return self._base is not None or self._building
+
+    async def search(self, query: str, limit: int = 10) -> Optional[list[CompanySearchResult]]:
+        """
+        Компании, название которых начинается с query, самые популярные первыми;
+        если их меньше limit — добавляются содержащие query.
+        None — индекс еще не построен (искать в БД).
+        """
+        base = self._base
+        if base is None:
+            return None
+
+        key = normalize_name(query)
+        if not key or "\x00" in key:
+            return []
+        self.lookups += 1
+
+        delta = self._delta
+        encoded = key.encode()
+
+        found: list[tuple[int, str, str, int]] = []
+        lo, hi = base.prefix_range(encoded)
+        for pos in base.iter_top(lo, hi):
+            name = base.name(pos)
+            if name in delta:
+                continue
+            found.append((base.counts[pos], base.key(pos), name, base.ids[pos]))
+            if len(found) >= limit:
+                break
+        found += self._delta_matches(delta, key, str.startswith)
+        found.sort(key=lambda item: (-item[0], item[1], item[2]))
+        found = found[:limit]
+
+        if len(found) < limit and len(key) >= SUBSTRING_MIN_LENGTH:
+            self.substring_lookups += 1
+            positions = base.find_substring(encoded, (lo, hi), SUBSTRING_CANDIDATES)
+            seen = {item[2] for item in found}
+            more = [
+                (base.counts[pos], base.key(pos), name, base.ids[pos])
+                for pos in positions
+                if (name := base.name(pos)) not in delta and name not in seen
+            ]
+            more += [
+                item for item in self._delta_matches(delta, key, str.__contains__)
+                if item[2] not in seen and not item[1].startswith(key)
+            ]
+            more.sort(key=lambda item: (-item[0], item[1], item[2]))
+            found += more[:limit - len(found)]
+
+        return [
+            CompanySearchResult(name=name, id=min_review_id, reviews_count=reviews_count)
+            for reviews_count, _, name, min_review_id in found
+        ]
+
+    @staticmethod
+    def _delta_matches(delta: dict, key: str, match) -> list[tuple[int, str, str, int]]:
+        return [
+            (entry[2], entry[0], name, entry[1])
+            for name, (_, entry) in delta.items()
+            if entry is not None and match(entry[0], key)
+        ]
+
+    def update(self, rows: Iterable[tuple[str, Optional[int], int]], removed: Iterable[str] = ()) -> None:
+        """
+        Применить изменения компаний: rows — (name, min_review_id, reviews_count).
+        Во время первой сборки изменения копятся в дельте и применяются после нее.
+        """
+        if not self.accepting:
+            return
+
+        for name, min_review_id, reviews_count in rows:
+            self._seq += 1
+            entry = (
+                (normalize_name(name), min_review_id, reviews_count or 0)
+                if min_review_id is not None else None
+            )
+            self._delta[name] = (self._seq, entry)
+        for name in removed:
+            self._seq += 1
+            self._delta[name] = (self._seq, None)
+
+        if len(self._delta) > self.max_delta and self._base is not None and not self._compacting:
+            asyncio.get_running_loop().create_task(self._compact())
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Полная пересборка из таблицы companies"""
+        started = time.perf_counter()
+        started_seq = self._seq
+        self._building = True
+        try:
+            base = await self._build(db)
+        finally:
+            self._building = False
+        self._swap(base, started_seq)
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+
+    @staticmethod
+    async def _build(db: AsyncSession) -> _Snapshot:
+        # Порядок близок к порядку ключей normalize_name — обычно без пересортировки
+        index_key = func.lower(func.btrim(func.regexp_replace(Company.name, r"\s+", " ", "g")))
+        result = await db.stream(
+            select(Company.name, Company.min_review_id, Company.reviews_count)
+            .where(Company.min_review_id.isnot(None))
+            .order_by(index_key.collate("C"), Company.name.collate("C"))
+            .execution_options(yield_per=10000)
+        )
+        builder = _SnapshotBuilder()
+        async for name, min_review_id, reviews_count in result:
+            builder.add(normalize_name(name), name, min_review_id, reviews_count or 0)
+
+        return await asyncio.to_thread(builder.build)
+
+    async def _compact(self) -> None:
+        """Слить дельту в новый основной массив (в отдельном потоке)"""
+        self._compacting = True
+        try:
+            started_seq = self._seq
+            base = self._base
+            delta = dict(self._delta)
+            merged = await asyncio.to_thread(self._merge, base, delta)
+            self._swap(merged, started_seq)
+            self.compactions += 1
+        finally:
+            self._compacting = False
+
+    def _swap(self, base: _Snapshot, started_seq: int) -> None:
+        # Изменения, пришедшие во время сборки, остаются в дельте
+        self._base = base
+        self._delta = {
+            name: value for name, value in self._delta.items() if value[0] > started_seq
+        }
+
+    @staticmethod
+    def _merge(base: _Snapshot, delta: dict) -> _Snapshot:
+        """Снимок без компаний дельты, слитый по порядку с ее новыми строками"""
+        kept = (row for row in base.rows() if row[1] not in delta)
+        added = sorted(
+            (entry[0], name, entry[1], entry[2])
+            for name, (_, entry) in delta.items()
+            if entry is not None
+        )
+        builder = _SnapshotBuilder()
+        for row in heapq.merge(kept, added, key=lambda row: (row[0], row[1])):
+            builder.add(*row)
+        return builder.build()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "companies": len(self._base) if self._base is not None else 0,
+            "delta": len(self._delta),
+            "memory_bytes": self._base.nbytes if self._base is not None else 0,
+            "built_at": self.built_at,
+            "build_seconds": round(self.build_seconds, 3),
+            "lookups": self.lookups,
+            "substring_lookups": self.substring_lookups,
+            "compactions": self.compactions,
+        }
+
+
+company_index = CompanyIndex(max_delta=COMPANY_INDEX_MAX_DELTA)
+
+
+async def reload_companies(db: AsyncSession, company_names: Iterable[str]) -> None:
+    """Перечитать компании из БД в индекс (после пересчета статистики)"""
+    if not company_index.accepting:
+        return
+    names = sorted({name for name in company_names if name})
+    if not names:
+        return
+
+    result = await db.execute(
+        select(Company.name, Company.min_review_id, Company.reviews_count)
+        .where(Company.name.in_(names))
+    )
+    rows = result.all()
+    found = {row.name for row in rows}
+    company_index.update(
+        [(row.name, row.min_review_id, row.reviews_count) for row in rows],
+        removed=[name for name in names if name not in found],
+    )
+
+
+class _CompanyPoller:
+    """
+    Изменения companies из других процессов по updated_at (индекс ix_companies_updated_at).
+    Каждый опрос читает строки новее отметки минус COMPANY_INDEX_POLL_OVERLAP_SECONDS;
+    уже примененные (name, updated_at) из этого окна пропускаются.
+    Компании без отзывов остаются в companies с min_review_id = NULL — в индексе удаляются.
+    """
+
+    def __init__(self):
+        self.watermark: Optional[datetime] = None
+        self._seen: dict[str, datetime] = {}
+
+    async def reset(self, db: AsyncSession) -> None:
+        """Отметка — перед полной пересборкой: все, что новее, подхватит опрос"""
+        self.watermark = await db.scalar(select(func.max(Company.updated_at)))
+        self._seen = {}
+
+    async def poll(self, db: AsyncSession) -> int:
+        """Применить изменения с последнего опроса; возвращает число измененных компаний"""
+        stmt = select(Company.name, Company.min_review_id, Company.reviews_count, Company.updated_at)
+        if self.watermark is not None:
+            overlap = timedelta(seconds=COMPANY_INDEX_POLL_OVERLAP_SECONDS)
+            stmt = stmt.where(Company.updated_at > self.watermark - overlap)
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            return 0
+
+        fresh = [row for row in rows if self._seen.get(row.name) != row.updated_at]
+        latest = max(row.updated_at for row in rows)
+        if self.watermark is None or latest > self.watermark:
+            self.watermark = latest
+        window_start = self.watermark - timedelta(seconds=COMPANY_INDEX_POLL_OVERLAP_SECONDS)
+        self._seen = {name: at for name, at in self._seen.items() if at > window_start}
+        self._seen.update((row.name, row.updated_at) for row in fresh)
+
+        company_index.update([(row.name, row.min_review_id, row.reviews_count) for row in fresh])
+        return len(fresh)
+
+
+async def run_company_index(session_factory) -> None:
+    """
+    Построить индекс при старте, подхватывать изменения companies опросом
+    и периодически пересобирать полностью
+    """
+    poller = _CompanyPoller()
+    poll_seconds = COMPANY_INDEX_POLL_SECONDS if COMPANY_INDEX_POLL_SECONDS > 0 else COMPANY_INDEX_REFRESH_SECONDS
+    while True:
+        try:
+            async with session_factory() as db:
+                await poller.reset(db)
+                await company_index.rebuild(db)
+            stats = company_index.stats()
+            print(f"🔎 Индекс компаний: {stats['companies']:,} за {stats['build_seconds']} с")
+        except Exception as e:
+            print(f"⚠️ Ошибка построения индекса компаний: {e}")
+
+        rebuild_at = time.monotonic() + COMPANY_INDEX_REFRESH_SECONDS
+        while (left := rebuild_at - time.monotonic()) > 0:
+            await asyncio.sleep(min(poll_seconds, left))
+            if not company_index.ready or time.monotonic() >= rebuild_at:
+                continue
+            try:
+                async with session_factory() as db:
+                    await poller.poll(db)
+            except Exception as e:
+                print(f"⚠️ Ошибка обновления индекса компаний: {e}")
@@ -0,0 +1,173 @@
+"""
+Сервис для поддержки статистики компаний в таблице companies
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import select, func, case, and_, or_, distinct, update, exists, any_, literal, literal_column, String
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.review import Review
+from models.company import Company
+from helpers.page_cache import page_cache
+from services.company_index import company_index, reload_companies
+from services.reviews_service import ReviewsService
+
+
+# Колонки companies, которые рассчитываются из reviews
+STATS_COLUMNS = (
+    "reviews_count",
+    "min_review_id",
+    "comments_count",
+    "avg_rating",
+    "jurisdiction",
+    "report_years",
+)
+
+
+def names_filter(column, company_names: list[str]):
+    """column = ANY(массив) — один параметр на любое число компаний вместо IN (...)"""
+    return column == any_(literal(company_names, ARRAY(String)))
+
+
+def build_stats_query(company_names: Optional[list[str]] = None):
+    """
+    Агрегат по reviews в разрезе компании — те же правила, что и на странице компании.
+    Для источника ATI, если рейтинг не указан, считается как 5.
+    """
+    rating_expr = case(
+        (Review.rating.isnot(None), Review.rating),
+        (func.upper(Review.source) == 'ATI', 5),
+        else_=None
+    )
+    query = (
+        select(
+            Review.subject.label("name"),
+            func.count(Review.id).label("reviews_count"),
+            func.min(Review.id).label("min_review_id"),
+            func.count(Review.id).filter(
+                and_(Review.comment.isnot(None), Review.comment != '')
+            ).label("comments_count"),
+            func.avg(rating_expr).label("avg_rating"),
+            func.min(Review.jurisdiction).filter(
+                and_(
+                    Review.jurisdiction.isnot(None),
+                    Review.jurisdiction != "",
+                    Review.jurisdiction != "—",
+                )
+            ).label("jurisdiction"),
+            func.array_agg(
+                aggregate_order_by(distinct(Review.report_year), Review.report_year.desc())
+            ).filter(Review.report_year.isnot(None)).label("report_years"),
+        )
+        .group_by(Review.subject)
+    )
+    if company_names is not None:
+        query = query.where(names_filter(Review.subject, company_names))
+    return query
+
+
+class CompanyStatsService:
+    """Пересчет статистики компаний после изменения отзывов"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def refresh(self, company_names: Iterable[str], commit: bool = True) -> tuple[int, int]:
+        """
+        Пересчитать статистику указанных компаний одним upsert из агрегата.
+        Компании без записи в companies создаются (якоря страниц списка после первой
+        из них пересобираются), компании без отзывов обнуляются; якоря страниц их
+        отзывов пересобираются.
+        updated_at переданных компаний сдвигается — их отзывы изменились.
+        commit=False — транзакцию фиксирует вызывающий, а затем вызывает publish():
+        кэш и индекс нельзя обновлять незафиксированными данными.
+        Возвращает (создано, обновлено) компаний.
+        """
+        names = sorted({name for name in company_names if name})
+        if not names:
+            return 0, 0
+
+        created, updated = await self._upsert(names)
+        await self._reset_empty(names)
+        reviews_service = ReviewsService(self.db)
+        await reviews_service.rebuild_review_page_anchors(names)
+        if created:
+            # Новые компании сдвигают страницы списка после себя
+            await reviews_service.rebuild_companies_page_anchors(since=min(created), commit=False)
+        if commit:
+            await self.db.commit()
+            await self.publish(names)
+        return len(created), updated
+
+    async def publish(self, company_names: Iterable[str]) -> None:
+        """
+        Сбросить кэш страниц компаний и перечитать их в индекс поиска.
+        Только после фиксации транзакции: иначе параллельный запрос вернет в кэш
+        прежние данные, а после отката в индексе останутся незафиксированные.
+        """
+        names = sorted({name for name in company_names if name})
+        for name in names:
+            page_cache.invalidate_company(name)
+        await reload_companies(self.db, names)
+
+    async def rebuild_all(self) -> None:
+        """
+        Полная пересборка статистики всех компаний (исправление расхождений).
+        updated_at сдвигается только у компаний, статистика которых разошлась.
+        """
+        created, _ = await self._upsert(None)
+        await self._reset_empty(None)
+        reviews_service = ReviewsService(self.db)
+        await reviews_service.rebuild_review_page_anchors()
+        if created:
+            await reviews_service.rebuild_companies_page_anchors(since=min(created), commit=False)
+        await self.db.commit()
+        page_cache.clear()
+        if company_index.ready:
+            await company_index.rebuild(self.db)
+
+    async def _upsert(self, names: Optional[list[str]]) -> tuple[list[str], int]:
+        """
+        Upsert статистики; xmax = 0 у строки, вставленной этим запросом.
+        Возвращает (названия созданных компаний, количество обновленных).
+        """
+        stmt = insert(Company).from_select(
+            ["name", *STATS_COLUMNS], build_stats_query(names)
+        )
+        set_ = {col: stmt.excluded[col] for col in STATS_COLUMNS}
+        set_["updated_at"] = func.now()
+        where = None
+        if names is None:
+            where = or_(*(
+                Company.__table__.c[col].is_distinct_from(stmt.excluded[col])
+                for col in STATS_COLUMNS
+            ))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Company.name],
+            set_=set_,
+            where=where,
+        ).returning(Company.name, literal_column("xmax = 0").label("created"))
+        rows = (await self.db.execute(stmt)).all()
+        created = [row.name for row in rows if row.created]
+        return created, len(rows) - len(created)
+
+    async def _reset_empty(self, names: Optional[list[str]]) -> None:
+        stmt = (
+            update(Company)
+            .where(~exists().where(Review.subject == Company.name))
+            .values(
+                reviews_count=0,
+                min_review_id=None,
+                comments_count=0,
+                avg_rating=None,
+                jurisdiction=None,
+                report_years=None,
+                updated_at=func.now(),
+            )
+        )
+        if names is not None:
+            stmt = stmt.where(names_filter(Company.name, names))
+        else:
+            stmt = stmt.where(or_(Company.reviews_count != 0, Company.min_review_id.isnot(None)))
+        await self.db.execute(stmt)
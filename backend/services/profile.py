@@ -5,6 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from models.user import User, UserRole
 from helpers.security import verify_password, hash_password
+from helpers.page_cache import page_cache
+from services.reviews_service import ReviewsService
 
 
 
@@ -97,6 +99,11 @@ class ProfileService:
                         reviews_count=0
                     )
                     self.db.add(new_company)
+                    # Новая компания сдвигает страницы списка после себя
+                    await self.db.flush()
+                    await ReviewsService(self.db).rebuild_companies_page_anchors(
+                        since=user.company_name, commit=False
+                    )
                 
                 await self.db.commit()
                 print(f"✅ Синхронизация: владелец компании '{user.company_name}' обновлен (user_id={user.id})")
@@ -134,6 +141,11 @@ class ProfileService:
                     await self.db.commit()
                     print(f"✅ Данные компании '{user.company_name}' синхронизированы с профилем")
         
+        # Данные владельца показываются на странице компании
+        page_cache.invalidate_company(old_company_name)
+        if user.company_name != old_company_name:
+            page_cache.invalidate_company(user.company_name)
+        
         return user
 
     # -------------------------------------------------------------
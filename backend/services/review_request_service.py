@@ -7,8 +7,8 @@ from sqlalchemy import select
 
 from models.review_request import ReviewRequest, ReviewRequestStatus
 from models.review import Review
-from models.company import Company
 from models.user import User
+from services.company_stats_service import CompanyStatsService
 from services.telegram_notifier import telegram_notifier
 
 
@@ -168,10 +168,10 @@ class ReviewRequestService:
         review_request.status = ReviewRequestStatus.APPROVED
         review_request.admin_comment = admin_comment
         
-        await self.db.commit()
-        await self.db.refresh(review)
-        
+        # Отзыв и статистика компании сохраняются в одной транзакции
+        await self.db.flush()
         await self.update_company_stats(review_request.target_company)
+        await self.db.refresh(review)
         
         return review
 
@@ -187,29 +187,7 @@ class ReviewRequestService:
         return True
 
     async def update_company_stats(self, company_name: str) -> None:
-        count_query = select(Review.id).where(Review.subject == company_name)
-        result = await self.db.execute(count_query)
-        reviews = list(result.scalars().all())
-        
-        reviews_count = len(reviews)
-        min_review_id = min(reviews) if reviews else None
-        
-        company_query = select(Company).where(Company.name == company_name)
-        company_result = await self.db.execute(company_query)
-        company = company_result.scalars().first()
-        
-        if company:
-            company.reviews_count = reviews_count
-            company.min_review_id = min_review_id
-        else:
-            new_company = Company(
-                name=company_name,
-                reviews_count=reviews_count,
-                min_review_id=min_review_id
-            )
-            self.db.add(new_company)
-        
-        await self.db.commit()
+        await CompanyStatsService(self.db).refresh([company_name])
 
     async def delete_request(self, request_id: int) -> bool:
         review_request = await self.get_request_by_id(request_id)
@@ -1,16 +1,117 @@
 """
 Сервис для работы с отзывами и компаниями
 """
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
 from typing import List, Optional, Tuple, Dict
 from urllib.parse import quote
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, and_, or_, not_, false, delete, case, literal, literal_column, union_all, any_, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY
+from sqlalchemy.orm import aliased
 
 from models.review import Review
 from models.company import Company
+from models.company_list_anchor import CompanyListAnchor
+from models.review_page_anchor import ReviewPageAnchor
+from models.user import User
 from schemas.reviews import CompanyListItem, CompanySearchResult
 
 
+# === Keyset-пагинация отзывов компании ===
+# Порядок: review_date DESC (NULL первыми, как в PostgreSQL), затем id —
+# совпадает с частичным индексом ix_reviews_subject_date_id_commented.
+
+ReviewKey = Tuple[Optional[datetime], int]
+
+
+def encode_cursor(key: ReviewKey) -> str:
+    """Курсор (review_date, id) -> строка для URL"""
+    review_date, review_id = key
+    raw = f"{review_date.isoformat() if review_date else ''}|{review_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ReviewKey:
+    """Строка курсора -> (review_date, id); ValueError для некорректного курсора"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_part, id_part = raw.split("|", 1)
+        return (datetime.fromisoformat(date_part) if date_part else None), int(id_part)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def commented_reviews_query(company_name: str, *columns, backward: bool = False):
+    """
+    Отзывы компании с комментариями в порядке keyset-пагинации;
+    backward — в обратном порядке (предыдущая страница от курсора before)
+    """
+    order = (Review.review_date.asc(), Review.id.desc()) if backward else (Review.review_date.desc(), Review.id)
+    return (
+        select(*(columns or (Review,)))
+        .where(Review.subject == company_name)
+        .where(Review.comment.isnot(None))
+        .where(Review.comment != '')
+        .order_by(*order)
+    )
+
+
+def seek_condition(key: ReviewKey, inclusive: bool = False):
+    """Условие «после ключа» (или «начиная с ключа») в порядке review_date DESC, id"""
+    review_date, review_id = key
+    id_cond = Review.id >= review_id if inclusive else Review.id > review_id
+    if review_date is None:
+        # NULL даты идут первыми — после них все отзывы с датой
+        return or_(and_(Review.review_date.is_(None), id_cond), Review.review_date.isnot(None))
+    return or_(
+        Review.review_date < review_date,
+        and_(Review.review_date == review_date, id_cond),
+    )
+
+
+def before_condition(key: ReviewKey):
+    """Условие «до ключа» в порядке review_date DESC, id (NULL даты — самые первые)"""
+    review_date, review_id = key
+    if review_date is None:
+        return and_(Review.review_date.is_(None), Review.id < review_id)
+    return or_(
+        Review.review_date.is_(None),
+        Review.review_date > review_date,
+        and_(Review.review_date == review_date, Review.id < review_id),
+    )
+
+
+# Каждый какой отзыв компании хранится якорем в review_page_anchors: переход на
+# ?page=N читает не больше стольких записей индекса сверх якоря
+REVIEW_ANCHOR_EVERY = 100
+
+# Компаний на странице списка /{lang}/reviews
+COMPANIES_PER_PAGE = 10
+
+# С какой длины запроса поиск идет по триграммам (короче — по началу названия)
+SEARCH_TRIGRAM_MIN_LENGTH = 3
+
+# Сколько совпадений по триграммам ранжируется по похожести (остальные не читаются)
+SEARCH_RANK_CANDIDATES = 200
+# Из них — совпадений с началом названия (точное совпадение — первое из них)
+SEARCH_PREFIX_CANDIDATES = 100
+
+
+def name_prefix(length: int):
+    """
+    Первые length символов названия в нижнем регистре. Длина — константой в SQL:
+    выражение должно совпадать с индексами ix_companies_prefix1/2_popular.
+    """
+    return func.left(func.lower(Company.name), literal_column(str(length)))
+
+
+def escape_like(value: str) -> str:
+    """Экранировать спецсимволы LIKE в пользовательском вводе"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
 class ReviewsService:
     """Сервис для работы с отзывами"""
 
@@ -18,16 +119,30 @@ class ReviewsService:
         self.db = db
 
     async def get_companies_page(
-        self, page: int, per_page: int = 10
+        self, page: int, per_page: int = COMPANIES_PER_PAGE
     ) -> Tuple[List[CompanyListItem], bool]:
-        """Получить страницу компаний — всё из таблицы Company, без GROUP BY"""
-        offset = (page - 1) * per_page
-
+        """
+        Получить страницу компаний — всё из таблицы Company, без GROUP BY.
+        Порядок по name (первичный ключ); страница открывается от якоря без OFFSET.
+        Якоря пересобираются при создании компаний (CompanyStatsService.refresh);
+        без якоря (еще не построены или другой per_page) — OFFSET.
+        """
         query = (
             select(Company.name, Company.reviews_count, Company.min_review_id)
+            .order_by(Company.name)
             .limit(per_page + 1)
-            .offset(offset)
         )
+
+        if page > 1:
+            anchor = None
+            if per_page == COMPANIES_PER_PAGE:
+                anchor_query = select(CompanyListAnchor.first_name).where(CompanyListAnchor.page == page)
+                anchor = (await self.db.execute(anchor_query)).scalar()
+            if anchor is not None:
+                query = query.where(Company.name >= anchor)
+            else:
+                query = query.offset((page - 1) * per_page)
+
         result = await self.db.execute(query)
         rows = result.all()
 
@@ -47,16 +162,166 @@ class ReviewsService:
 
         return companies, has_next
 
+    async def rebuild_companies_page_anchors(self, since: Optional[str] = None, commit: bool = True) -> int:
+        """
+        Пересобрать якоря страниц списка компаний, вернуть количество страниц.
+
+        since — название самой первой созданной компании: страницы до нее не сдвинулись,
+        пересобирается только хвост начиная со страницы, на которую она попала.
+
+        changed_at страницы: если ее якорь и якорь следующей не изменились (тот же состав
+        компаний) — максимум из прежнего значения и updated_at ее компаний; если состав
+        сдвинулся — текущее время; для новой страницы — максимум updated_at ее компаний.
+        """
+        first_page, first_name = 1, None
+        if since is not None:
+            start = (await self.db.execute(
+                select(CompanyListAnchor.page, CompanyListAnchor.first_name)
+                .where(CompanyListAnchor.first_name <= since)
+                .order_by(CompanyListAnchor.page.desc())
+                .limit(1)
+            )).first()
+            if start is not None:
+                first_page, first_name = start
+
+        companies = select(Company.name, Company.updated_at)
+        if first_name is not None:
+            companies = companies.where(Company.name >= first_name)
+        companies = companies.subquery()
+        numbered = (
+            select(
+                companies.c.name,
+                companies.c.updated_at,
+                func.row_number().over(order_by=companies.c.name).label("rn"),
+            )
+            .subquery()
+        )
+        page_expr = (numbered.c.rn - 1) // COMPANIES_PER_PAGE + first_page
+        pages = (
+            select(
+                page_expr.label("page"),
+                func.min(numbered.c.name).label("first_name"),
+                func.max(numbered.c.updated_at).label("max_updated_at"),
+            )
+            .group_by(page_expr)
+            .subquery()
+        )
+        new = (
+            select(
+                pages.c.page,
+                pages.c.first_name,
+                pages.c.max_updated_at,
+                func.lead(pages.c.first_name).over(order_by=pages.c.page).label("next_name"),
+            )
+            .subquery()
+        )
+        old = (
+            select(
+                CompanyListAnchor.page,
+                CompanyListAnchor.first_name,
+                CompanyListAnchor.changed_at,
+                func.lead(CompanyListAnchor.first_name).over(order_by=CompanyListAnchor.page).label("next_name"),
+            )
+            .where(CompanyListAnchor.page >= first_page)
+            .subquery()
+        )
+        same_companies = and_(
+            old.c.first_name == new.c.first_name,
+            old.c.next_name.is_not_distinct_from(new.c.next_name),
+        )
+        changed_at = case(
+            (old.c.changed_at.is_(None), new.c.max_updated_at),
+            (same_companies, func.greatest(old.c.changed_at, new.c.max_updated_at)),
+            else_=func.now(),
+        )
+        anchors = (
+            select(new.c.page, new.c.first_name, changed_at)
+            .select_from(new.outerjoin(old, old.c.page == new.c.page))
+        )
+
+        # Один INSERT ... SELECT видит прежние якоря целиком (снимок до изменения)
+        stmt = pg_insert(CompanyListAnchor).from_select(["page", "first_name", "changed_at"], anchors)
+        await self.db.execute(stmt.on_conflict_do_update(
+            index_elements=[CompanyListAnchor.page],
+            set_={"first_name": stmt.excluded.first_name, "changed_at": stmt.excluded.changed_at},
+        ))
+        count_query = select(func.count()).select_from(Company)
+        if first_name is not None:
+            count_query = count_query.where(Company.name >= first_name)
+        companies_count = (await self.db.execute(count_query)).scalar() or 0
+        pages_count = first_page - 1 + (companies_count + COMPANIES_PER_PAGE - 1) // COMPANIES_PER_PAGE
+        await self.db.execute(delete(CompanyListAnchor).where(CompanyListAnchor.page > pages_count))
+        if commit:
+            await self.db.commit()
+
+        return pages_count
+
+    def _search_query(self, query: str, limit: int, *columns):
+        """
+        Поиск компаний по названию с ранжированием.
+
+        Запросы от SEARCH_TRIGRAM_MIN_LENGTH символов: подстрока или название, в котором
+        есть похожая на запрос часть (name %> q, word_similarity; GIN-индекс pg_trgm),
+        порядок — похожесть, совпадение с началом, число отзывов.
+        Ранжируются только первые SEARCH_RANK_CANDIDATES совпадений: сначала до
+        SEARCH_PREFIX_CANDIDATES начинающихся с запроса в порядке lower(name) COLLATE "C"
+        (индекс ix_companies_name_lower_c; точное совпадение — первым), затем по
+        подстроке, похожие названия ищутся, только если подстрок меньше, — частый
+        запрос не считает similarity() по сотням тысяч строк, а точное совпадение и
+        совпадения с началом не зависят от порядка обхода.
+        Более короткие запросы триграммы не покрывают — ищем по началу названия,
+        самые популярные компании первыми: индекс (первые символы, reviews_count DESC,
+        name) отдает limit строк сразу в порядке выдачи, без сортировки всех совпадений.
+        """
+        if len(query) < SEARCH_TRIGRAM_MIN_LENGTH:
+            return (
+                select(*columns)
+                .where(name_prefix(len(query)) == query.lower())
+                .order_by(Company.reviews_count.desc(), Company.name)
+                .limit(limit)
+            )
+
+        escaped = escape_like(query)
+        lower_name = func.lower(Company.name).collate("C")
+        starts_with = lower_name.like(f'{escaped.lower()}%', escape='\\')
+        is_substring = Company.name.ilike(f'%{escaped}%', escape='\\')
+        candidate_columns = (Company.name, Company.min_review_id, Company.reviews_count)
+        # LIMIT над UNION ALL: следующая ветка не выполняется, если предыдущие дали все строки
+        candidates = union_all(
+            select(*candidate_columns)
+            .where(starts_with)
+            .order_by(lower_name)
+            .limit(SEARCH_PREFIX_CANDIDATES),
+            select(*candidate_columns)
+            .where(is_substring, not_(starts_with))
+            .limit(SEARCH_RANK_CANDIDATES),
+            select(*candidate_columns)
+            .where(Company.name.op('%>')(query), not_(is_substring))
+            .limit(SEARCH_RANK_CANDIDATES),
+        ).limit(SEARCH_RANK_CANDIDATES).subquery("candidates")
+
+        name = candidates.c.name
+        is_prefix = func.lower(name).like(f'{escaped.lower()}%', escape='\\')
+        return (
+            select(*(candidates.c[column.key] for column in columns))
+            .order_by(
+                func.similarity(name, query).desc(),
+                is_prefix.desc(),
+                candidates.c.reviews_count.desc(),
+                name,
+            )
+            .limit(limit)
+        )
+
     async def search_companies(
         self, query: str, limit: int = 10
     ) -> List[CompanySearchResult]:
         """Поиск компаний — всё из таблицы Company"""
-        pattern = f'%{query}%'
-
-        search_query = (
-            select(Company.name, Company.min_review_id, Company.reviews_count)
-            .where(Company.name.ilike(pattern))
-            .limit(limit)
+        query = query.strip()
+        if not query:
+            return []
+        search_query = self._search_query(
+            query, limit, Company.name, Company.min_review_id, Company.reviews_count
         )
         result = await self.db.execute(search_query)
         rows = result.all()
@@ -70,12 +335,11 @@ class ReviewsService:
         self, query: str, limit: int = 50
     ) -> List[CompanyListItem]:
         """Поиск компаний с количеством отзывов — всё из таблицы Company"""
-        pattern = f'%{query}%'
-
-        search_query = (
-            select(Company.name, Company.reviews_count, Company.min_review_id)
-            .where(Company.name.ilike(pattern))
-            .limit(limit)
+        query = query.strip()
+        if not query:
+            return []
+        search_query = self._search_query(
+            query, limit, Company.name, Company.reviews_count, Company.min_review_id
         )
         result = await self.db.execute(search_query)
         rows = result.all()
@@ -122,22 +386,83 @@ class ReviewsService:
         return result.scalar() or 0
 
     async def get_company_reviews(
-        self, company_name: str, page: int, per_page: int = 10
+        self, company_name: str, page: int = 1, per_page: int = 10, after: Optional[str] = None
     ) -> List[Review]:
-        """Получить отзывы компании с пагинацией (только с комментариями)"""
+        """
+        Получить отзывы компании (только с комментариями) без OFFSET:
+        по курсору after или по номеру страницы через якоря страниц.
+        """
+        query = commented_reviews_query(company_name).limit(per_page)
+        if after:
+            query = query.where(seek_condition(decode_cursor(after)))
+        elif page > 1:
+            anchor = await self.get_page_anchor(company_name, page, per_page)
+            if anchor is None:
+                return []
+            query = query.where(seek_condition(anchor, inclusive=True))
+
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def get_page_anchor(
+        self, company_name: str, page: int, per_page: int = 10
+    ) -> Optional[ReviewKey]:
+        """
+        Ключ первого отзыва страницы page (None — страницы нет) для перевода ?page=N
+        в курсор. Проход начинается от ближайшего якоря из review_page_anchors, OFFSET —
+        меньше REVIEW_ANCHOR_EVERY записей частичного индекса (index-only, без строк
+        отзывов) на любой глубине. Якоря нет (компания не пересчитана) — OFFSET с начала.
+        """
+        if page < 1:
+            return None
         offset = (page - 1) * per_page
+        query = commented_reviews_query(company_name, Review.review_date, Review.id)
+        position = offset // REVIEW_ANCHOR_EVERY * REVIEW_ANCHOR_EVERY
+        if position:
+            anchor = (await self.db.execute(
+                select(ReviewPageAnchor.position, ReviewPageAnchor.review_date, ReviewPageAnchor.review_id)
+                .where(ReviewPageAnchor.subject == company_name)
+                .where(ReviewPageAnchor.position <= position)
+                .order_by(ReviewPageAnchor.position.desc())
+                .limit(1)
+            )).first()
+            if anchor is not None:
+                query = query.where(seek_condition((anchor.review_date, anchor.review_id), inclusive=True))
+                offset -= anchor.position
+        row = (await self.db.execute(query.offset(offset).limit(1))).first()
+        return (row.review_date, row.id) if row else None
 
-        query = (
-            select(Review)
-            .where(Review.subject == company_name)
+    async def rebuild_review_page_anchors(self, company_names: Optional[List[str]] = None) -> None:
+        """
+        Пересобрать якоря страниц отзывов указанных компаний (None — всех).
+        Без фиксации: вызывается в транзакции пересчета статистики компаний.
+        """
+        position = func.row_number().over(
+            partition_by=Review.subject, order_by=(Review.review_date.desc(), Review.id)
+        ) - 1
+        numbered = (
+            select(Review.subject, Review.review_date, Review.id, position.label("position"))
+            .where(Review.subject.isnot(None))
             .where(Review.comment.isnot(None))
             .where(Review.comment != '')
-            .order_by(Review.review_date.desc())
-            .limit(per_page)
-            .offset(offset)
         )
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+        stmt = delete(ReviewPageAnchor)
+        if company_names is not None:
+            # Один параметр-массив на любое число компаний (импорт затрагивает тысячи)
+            names = literal(company_names, ARRAY(String))
+            stmt = stmt.where(ReviewPageAnchor.subject == any_(names))
+            numbered = numbered.where(Review.subject == any_(names))
+        await self.db.execute(stmt)
+
+        numbered = numbered.subquery()
+        anchors = (
+            select(numbered.c.subject, numbered.c.position, numbered.c.review_date, numbered.c.id)
+            .where(numbered.c.position > 0)
+            .where(numbered.c.position % REVIEW_ANCHOR_EVERY == 0)
+        )
+        await self.db.execute(pg_insert(ReviewPageAnchor).from_select(
+            ["subject", "position", "review_date", "review_id"], anchors
+        ))
 
     async def get_reviewer_ids(self, reviewer_names: List[str]) -> Dict[str, int]:
         """Получить ID для списка reviewer'ов — из таблицы Company"""
@@ -219,3 +544,148 @@ class ReviewsService:
         )
         result = await self.db.execute(query)
         return result.scalars().first()
+
+
+@dataclass
+class CompanyPageData:
+    """Данные для рендера страницы компании"""
+    company_name: str
+    base_review: Review
+    company: Optional[Company]
+    owner: Optional[User]
+    total_reviews: int
+    avg_rating: Optional[float]
+    jurisdiction: Optional[str]
+    available_years: List[int]
+    selected_year: Optional[int]
+    financial_review: Optional[Review] = None
+    reviews: List[Review] = field(default_factory=list)
+    reviewer_ids: Dict[str, int] = field(default_factory=dict)
+
+
+class CompanyPageLoader:
+    """
+    Загрузка всех данных страницы компании за два запроса вместо десятка:
+    1) базовый отзыв + компания (с предрассчитанными агрегатами) + владелец
+    2) страница отзывов с ID reviewer'ов + отзыв с отчетом за выбранный год
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def load(
+        self,
+        review_id: int,
+        page: int,
+        year: Optional[int] = None,
+        per_page: int = 10,
+        after: Optional[ReviewKey] = None,
+        before: Optional[ReviewKey] = None,
+    ) -> Optional[CompanyPageData]:
+        """
+        Получить данные страницы компании по ID отзыва (None — компания не найдена).
+        after / before — курсоры из ссылок пагинации (последний отзыв предыдущей страницы /
+        первый отзыв следующей); без них страница page ищется по номеру.
+        """
+        data = await self._load_company(review_id)
+        if data is None:
+            return None
+
+        available_years = data.available_years
+        if year and year in available_years:
+            data.selected_year = year
+        elif available_years:
+            data.selected_year = available_years[0]
+
+        await self._load_reviews(data, page, per_page, after, before)
+        return data
+
+    async def _load_company(self, review_id: int) -> Optional[CompanyPageData]:
+        """Базовый отзыв, компания с агрегатами и владелец — поиск по первичным ключам"""
+        query = (
+            select(Review, Company, User)
+            .outerjoin(Company, Company.name == Review.subject)
+            .outerjoin(User, User.id == Company.owner_user_id)
+            .where(Review.id == review_id)
+        )
+        result = await self.db.execute(query)
+        row = result.first()
+        if row is None or not row.Review.subject:
+            return None
+
+        company = row.Company
+        return CompanyPageData(
+            company_name=row.Review.subject,
+            base_review=row.Review,
+            company=company,
+            owner=row.User,
+            total_reviews=(company.comments_count or 0) if company else 0,
+            avg_rating=company.avg_rating if company else None,
+            jurisdiction=company.jurisdiction if company else None,
+            available_years=list(company.report_years or []) if company else [],
+            selected_year=None,
+        )
+
+    async def _load_reviews(
+        self,
+        data: CompanyPageData,
+        page: int,
+        per_page: int,
+        after: Optional[ReviewKey],
+        before: Optional[ReviewKey],
+    ) -> None:
+        """Страница отзывов, ID reviewer'ов и отчет за выбранный год — один запрос"""
+        page_query = commented_reviews_query(data.company_name, Review.id).limit(per_page)
+        if after is not None:
+            page_query = page_query.where(seek_condition(after))
+        elif before is not None:
+            page_query = (
+                commented_reviews_query(data.company_name, Review.id, backward=True)
+                .where(before_condition(before))
+                .limit(per_page)
+            )
+        elif page > 1:
+            # Прямой переход на ?page=N (sitemap, закладка) — ключ первого отзыва страницы
+            anchor = await ReviewsService(self.db).get_page_anchor(data.company_name, page, per_page)
+            page_query = page_query.where(
+                seek_condition(anchor, inclusive=True) if anchor else false()
+            )
+        page_ids = page_query.cte("page_ids")
+        in_page = Review.id.in_(select(page_ids.c.id))
+        conditions = [in_page]
+
+        if data.selected_year:
+            financial_id = (
+                select(Review.id)
+                .where(Review.subject == data.company_name)
+                .where(Review.report_year == data.selected_year)
+                .limit(1)
+                .cte("financial_id")
+            )
+            is_financial = Review.id.in_(select(financial_id.c.id))
+            conditions.append(is_financial)
+        else:
+            is_financial = false()
+
+        reviewer_company = aliased(Company)
+        query = (
+            select(
+                Review,
+                reviewer_company.min_review_id.label("reviewer_id"),
+                in_page.label("in_page"),
+                is_financial.label("is_financial"),
+            )
+            .outerjoin(reviewer_company, reviewer_company.name == Review.reviewer)
+            .where(or_(*conditions))
+            .order_by(Review.review_date.desc(), Review.id)
+        )
+        result = await self.db.execute(query)
+
+        for row in result.all():
+            review = row.Review
+            if row.in_page:
+                data.reviews.append(review)
+                if review.reviewer and review.reviewer.strip() and row.reviewer_id:
+                    data.reviewer_ids[review.reviewer] = row.reviewer_id
+            if row.is_financial:
+                data.financial_review = review
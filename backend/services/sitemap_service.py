@@ -0,0 +1,375 @@
+"""
+Сервис sitemap: раскладка компаний по шардам, манифест шардов и запись файлов
+
+Общий для generate_sitemaps.py (полная/инкрементальная генерация) и routes/seo.py
+(генерация отсутствующего файла по запросу), поэтому оба пути раскладывают компании
+по шардам одинаково.
+
+Манифест (sitemap-manifest.json) хранит для каждого шарда границы по названию компании
+(first/last), количество компаний/URL и максимальный companies.updated_at. По границам
+любой шард пересобирается одним запросом по диапазону первичного ключа — O(размер шарда),
+без OFFSET по всем компаниям.
+
+SITEMAP_HREFLANG=1 — вместо четырех копий по языкам (sitemap-{lang}-N, sitemap-pages-{lang}-N)
+пишется один набор (sitemap-companies-N, sitemap-pages-N): каждая страница один раз
+с <xhtml:link rel="alternate" hreflang> на все языковые версии.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.company import Company
+from models.company_list_anchor import CompanyListAnchor
+from helpers.sitemap_writer import (
+    SitemapWriter,
+    URLSET_HEADER,
+    URLSET_HREFLANG_HEADER,
+    URLSET_FOOTER,
+    SITEMAPINDEX_HEADER,
+    SITEMAPINDEX_FOOTER,
+    SITEMAP_MAX_BYTES,
+    GZIP_SUFFIX,
+    format_url,
+    gz_path,
+    make_tmp_file,
+)
+
+SUPPORTED_LANGS = ["ru", "en", "uk", "ro"]
+DEFAULT_LANG = "ru"
+SITEMAP_DIR = "static/sitemaps"
+
+SITEMAP_HREFLANG = os.getenv("SITEMAP_HREFLANG", "0") == "1"
+# Варианты файлов: язык или None — общий файл с hreflang
+SITEMAP_LANGS: list[Optional[str]] = [None] if SITEMAP_HREFLANG else list(SUPPORTED_LANGS)
+
+MANIFEST_FILE = "sitemap-manifest.json"
+MAX_URLS_PER_SITEMAP = 45000  # Жесткий лимит URL в шарде компаний
+MAX_URLS_PER_PAGES_SITEMAP = 40000  # Главная + страницы пагинации списка
+COMPANIES_PER_PAGE = 10  # Компаний на странице /{lang}/reviews
+REVIEWS_PER_PAGE = 10  # Отзывов на странице компании
+COMPANIES_STREAM_BATCH = 10000  # Строк за одно чтение из серверного курсора
+
+# changefreq по давности последнего изменения: (не старше N дней, значение)
+CHANGEFREQ_BY_AGE = ((7, "daily"), (30, "weekly"), (365, "monthly"))
+CHANGEFREQ_OLDEST = "yearly"
+
+
+def open_sitemap(filename: str, **kwargs) -> SitemapWriter:
+    """Писатель sitemap; filename — публичное имя (sitemap-ru-1.xml), на диске .xml.gz"""
+    return SitemapWriter(gz_path(SITEMAP_DIR, filename), **kwargs)
+
+
+def sitemap_exists(filename: str) -> bool:
+    return os.path.exists(gz_path(SITEMAP_DIR, filename))
+
+
+def company_shard_filename(lang: Optional[str], page: int) -> str:
+    return f"sitemap-{lang}-{page}.xml" if lang else f"sitemap-companies-{page}.xml"
+
+
+def pages_sitemap_filename(lang: Optional[str], page_num: int) -> str:
+    return f"sitemap-pages-{lang}-{page_num}.xml" if lang else f"sitemap-pages-{page_num}.xml"
+
+
+def language_urls(base_url: str, lang: Optional[str], path: str) -> tuple[str, tuple]:
+    """(loc, alternates) страницы path: для языка — его URL, для None — основной язык + hreflang всех"""
+    if lang:
+        return f"{base_url}/{lang}{path}", ()
+    alternates = tuple((code, f"{base_url}/{code}{path}") for code in SUPPORTED_LANGS)
+    return f"{base_url}/{DEFAULT_LANG}{path}", alternates
+
+
+def urls_per_sitemap(limit: int, base_url: str) -> int:
+    """
+    Сколько URL помещается в файл: limit, но не больше, чем влезает в SITEMAP_MAX_BYTES
+    при самом длинном возможном элементе <url> (с hreflang он в разы длиннее)
+    """
+    lang = SITEMAP_LANGS[0]
+    loc, alternates = language_urls(base_url, lang, f"/reviews/item/{'9' * 10}?page={'9' * 7}")
+    changefreq = max((value for _, value in CHANGEFREQ_BY_AGE), key=len)
+    entry = format_url(loc, "0000-00-00", changefreq, "0.0", alternates)
+    entry_bytes = len(entry.encode("utf-8")) + 1  # + перевод строки между элементами
+    header = URLSET_HEADER if lang else URLSET_HREFLANG_HEADER
+    overhead = len(header.encode("utf-8")) + len(URLSET_FOOTER.encode("utf-8"))
+    return min(limit, (SITEMAP_MAX_BYTES - overhead) // entry_bytes)
+
+
+def load_manifest(base_url: Optional[str] = None) -> dict:
+    """
+    Манифест прошлой генерации; пустой, если его нет.
+    base_url — манифест считается устаревшим, если файлы писались для другого адреса.
+    """
+    filepath = os.path.join(SITEMAP_DIR, MANIFEST_FILE)
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if base_url is not None and manifest.get("base_url") != base_url:
+        return {}
+    # Другой режим (по языкам / hreflang) — другие файлы и раскладка
+    if manifest.get("hreflang", False) != SITEMAP_HREFLANG:
+        return {}
+    return manifest
+
+
+def save_manifest(manifest: dict) -> None:
+    """Атомарная запись: читатели (роуты) не видят недописанный манифест"""
+    filepath = os.path.join(SITEMAP_DIR, MANIFEST_FILE)
+    fd, tmp_path = make_tmp_file(filepath)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def company_pages_count(reviews_count: int) -> int:
+    return max(1, ((reviews_count or 0) + REVIEWS_PER_PAGE - 1) // REVIEWS_PER_PAGE)
+
+
+def pages_sitemaps_count(total_companies: int, base_url: str) -> int:
+    """Количество sitemap со страницами списка компаний (на язык)"""
+    total_pages = max(1, (total_companies + COMPANIES_PER_PAGE - 1) // COMPANIES_PER_PAGE)
+    pages_per_sitemap = urls_per_sitemap(MAX_URLS_PER_PAGES_SITEMAP, base_url) - 1  # -1 для главной страницы
+    return max(1, (total_pages + pages_per_sitemap - 1) // pages_per_sitemap)
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def lastmod_entry(changed_at: Optional[datetime], today: date) -> tuple[str, str]:
+    """(<lastmod>, <changefreq>) по времени последнего изменения страницы"""
+    if changed_at is None:
+        return today.isoformat(), CHANGEFREQ_BY_AGE[0][1]
+    changed = changed_at.astimezone(timezone.utc).date() if changed_at.tzinfo else changed_at.date()
+    age = (today - changed).days
+    for max_age, changefreq in CHANGEFREQ_BY_AGE:
+        if age <= max_age:
+            return changed.isoformat(), changefreq
+    return changed.isoformat(), CHANGEFREQ_OLDEST
+
+
+def changefreq_counts(entries: list) -> dict:
+    """Сколько страниц с каждым changefreq (последний элемент записи)"""
+    return dict(sorted(Counter(entry[-1] for entry in entries).items()))
+
+
+def shard_marker(companies: list, urls_count: int, urls_source: list) -> dict:
+    """
+    Запись манифеста о шарде; совпадение с прошлой — шард можно не перезаписывать.
+    changefreq зависит от даты генерации: пока updated_at те же, компании только
+    «стареют», поэтому совпадение количества по changefreq означает те же значения.
+    """
+    return {
+        "first": companies[0].name,
+        "last": companies[-1].name,
+        "companies": len(companies),
+        "urls": urls_count,
+        "changed_at": max(row.updated_at for row in companies).isoformat(),
+        "changefreq": changefreq_counts(urls_source),
+    }
+
+
+def pages_marker(pages: list[tuple[int, str, str]]) -> dict:
+    """Запись манифеста о sitemap страниц списка: диапазон и отпечаток содержимого"""
+    return {
+        "first": pages[0][0],
+        "last": pages[-1][0],
+        "digest": hashlib.md5(repr(pages).encode(), usedforsecurity=False).hexdigest(),
+    }
+
+
+def pages_sitemap_range(page_num: int, total_companies: int, base_url: str) -> Optional[tuple[int, int]]:
+    """Номера страниц списка [first, last] в sitemap страниц page_num; None — такого нет"""
+    total_pages = max(1, (total_companies + COMPANIES_PER_PAGE - 1) // COMPANIES_PER_PAGE)
+    pages_per_sitemap = urls_per_sitemap(MAX_URLS_PER_PAGES_SITEMAP, base_url) - 1  # -1 для главной страницы
+
+    # Первый sitemap: главная (страница 1) + pages_per_sitemap - 1 страниц пагинации
+    start_page = 1 if page_num == 1 else (page_num - 1) * pages_per_sitemap + 1
+    end_page = min((page_num - 1) * pages_per_sitemap + pages_per_sitemap, total_pages)
+    if page_num < 1 or (page_num > 1 and start_page > end_page):
+        return None
+    return start_page, end_page
+
+
+def open_urlset(filename: str, lang: Optional[str]) -> SitemapWriter:
+    return open_sitemap(filename, header=URLSET_HEADER if lang else URLSET_HREFLANG_HEADER)
+
+
+def write_pages_sitemap(
+    base_url: str, lang: Optional[str], page_num: int, pages: list[tuple[int, str, str]]
+) -> int:
+    """
+    Sitemap страниц списка отзывов; pages — (номер страницы, lastmod, changefreq).
+    lang=None — общий файл с hreflang.
+    """
+    with open_urlset(pages_sitemap_filename(lang, page_num), lang) as writer:
+        for page, lastmod, changefreq in pages:
+            if page == 1:
+                loc, alternates = language_urls(base_url, lang, "/reviews")
+                writer.add_url(loc, lastmod, changefreq, "1.0", alternates)
+            else:
+                loc, alternates = language_urls(base_url, lang, f"/reviews?page={page}")
+                writer.add_url(loc, lastmod, changefreq, "0.9", alternates)
+    return writer.urls_count
+
+
+def shard_urls_source(companies: list, today: date) -> list[tuple[int, int, str, str]]:
+    """
+    Все, что нужно для URL шарда: (min_review_id, reviews_count, lastmod, changefreq).
+    Одинаково для всех языков и дешево передается в другой процесс.
+    """
+    return [
+        (row.min_review_id, row.reviews_count, *lastmod_entry(row.updated_at, today))
+        for row in companies
+    ]
+
+
+def write_company_shard(
+    base_url: str, lang: Optional[str], page: int, companies: list[tuple[int, int, str, str]]
+) -> int:
+    """
+    Sitemap шарда компаний, включая ВСЕ страницы каждой компании (companies — shard_urls_source).
+    <lastmod> всех страниц компании — companies.updated_at (новые отзывы, правка данных).
+    lang=None — общий файл с hreflang.
+    """
+    with open_urlset(company_shard_filename(lang, page), lang) as writer:
+        for min_review_id, reviews_count, lastmod, changefreq in companies:
+            company_path = f"/reviews/item/{min_review_id}"
+            total_pages = company_pages_count(reviews_count)
+
+            # Первая страница (основная)
+            loc, alternates = language_urls(base_url, lang, company_path)
+            writer.add_url(loc, lastmod, changefreq, "0.8", alternates)
+
+            # Все остальные страницы пагинации
+            for page_num in range(2, total_pages + 1):
+                loc, alternates = language_urls(base_url, lang, f"{company_path}?page={page_num}")
+                writer.add_url(loc, lastmod, changefreq, "0.7", alternates)
+    return writer.urls_count
+
+
+def write_sitemap_index(base_url: str) -> int:
+    """Главный sitemap index по существующим файлам"""
+    suffix = ".xml" + GZIP_SUFFIX
+    with open_sitemap("sitemap.xml", header=SITEMAPINDEX_HEADER, footer=SITEMAPINDEX_FOOTER) as writer:
+        for filename in sorted(os.listdir(SITEMAP_DIR)):
+            if filename.startswith("sitemap-") and filename.endswith(suffix):
+                # Дата последней перезаписи шарда — неизмененные шарды не выглядят новыми
+                modified = datetime.fromtimestamp(os.path.getmtime(os.path.join(SITEMAP_DIR, filename)))
+                writer.add_sitemap(f"{base_url}/{filename[:-len(GZIP_SUFFIX)]}", modified.date().isoformat())
+    return writer.urls_count
+
+
+class SitemapService:
+    """Чтение компаний для sitemap"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def count_companies(self) -> int:
+        """Все компании списка /{lang}/reviews"""
+        result = await self.db.execute(select(func.count()).select_from(Company))
+        return result.scalar() or 0
+
+    async def iter_company_shards(self, base_url: str):
+        """
+        Компании с отзывами по названию, разложенные по шардам: в шард попадают ВСЕ страницы
+        компании, пока суммарно не больше MAX_URLS_PER_SITEMAP URL (и лимита размера файла).
+        Один запрос через серверный курсор, в памяти — только текущий шард.
+        """
+        max_urls = urls_per_sitemap(MAX_URLS_PER_SITEMAP, base_url)
+        query = (
+            select(Company.name, Company.min_review_id, Company.reviews_count, Company.updated_at)
+            .where(Company.min_review_id.isnot(None))
+            .order_by(Company.name)
+            .execution_options(yield_per=COMPANIES_STREAM_BATCH)
+        )
+        result = await self.db.stream(query)
+
+        shard = []
+        shard_urls = 0
+        async for row in result:
+            company_urls_count = company_pages_count(row.reviews_count)
+            if shard_urls + company_urls_count > max_urls and shard_urls > 0:
+                yield shard, shard_urls
+                shard, shard_urls = [], 0
+            shard.append(row)
+            shard_urls += company_urls_count
+
+        if shard:
+            yield shard, shard_urls
+
+    async def build_manifest(self, base_url: str) -> dict:
+        """Манифест по текущим компаниям без записи файлов шардов"""
+        today = utc_today()
+        manifest = {
+            "base_url": base_url,
+            "hreflang": SITEMAP_HREFLANG,
+            "total_companies": await self.count_companies(),
+            "shards": [],
+        }
+        async for companies, urls_count in self.iter_company_shards(base_url):
+            manifest["shards"].append(shard_marker(companies, urls_count, shard_urls_source(companies, today)))
+        await asyncio.to_thread(save_manifest, manifest)
+        return manifest
+
+    async def get_manifest(self, base_url: str) -> dict:
+        """Сохраненный манифест; если его нет — строится (один проход по companies)"""
+        manifest = await asyncio.to_thread(load_manifest, base_url)
+        if not manifest.get("shards"):
+            manifest = await self.build_manifest(base_url)
+        return manifest
+
+    async def get_shard_companies(self, marker: dict) -> list:
+        """Компании шарда по границам из манифеста — диапазон по первичному ключу"""
+        result = await self.db.execute(
+            select(Company.name, Company.min_review_id, Company.reviews_count, Company.updated_at)
+            .where(
+                Company.name >= marker["first"],
+                Company.name <= marker["last"],
+                Company.min_review_id.isnot(None),
+            )
+            .order_by(Company.name)
+        )
+        return result.all()
+
+    async def rebuild_company_shard(self, base_url: str, lang: Optional[str], page: int) -> Optional[int]:
+        """
+        Пересобрать один шард компаний по манифесту (для роута, когда файла нет).
+        None — шарда с таким номером нет.
+        """
+        shards = (await self.get_manifest(base_url)).get("shards", [])
+        if page < 1 or page > len(shards):
+            return None
+        companies = await self.get_shard_companies(shards[page - 1])
+        # Сжатие и запись файла — в потоке, чтобы не блокировать event loop
+        return await asyncio.to_thread(
+            write_company_shard, base_url, lang, page, shard_urls_source(companies, utc_today())
+        )
+
+    async def get_list_pages(self, first_page: int, last_page: int, today: date) -> list[tuple[int, str, str]]:
+        """
+        (номер, lastmod, changefreq) страниц списка компаний по company_list_anchors.changed_at.
+        Страницы без якоря (якоря еще не пересобраны) — как измененные сегодня.
+        """
+        result = await self.db.execute(
+            select(CompanyListAnchor.page, CompanyListAnchor.changed_at)
+            .where(CompanyListAnchor.page.between(first_page, last_page))
+        )
+        changed = dict(result.all())
+        return [
+            (page, *lastmod_entry(changed.get(page), today))
+            for page in range(first_page, last_page + 1)
+        ]
@@ -0,0 +1,24 @@
+from decimal import Decimal
+
+import pytest
+
+from import_moldova_reports import parse_amount
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,234", Decimal("1234")),
+    ("1,234,567", Decimal("1234567")),
+    ("12,5", Decimal("12.5")),
+    ("0,125", Decimal("0.125")),
+    ("1 234,5", Decimal("1234.5")),
+    ("1,234.5", Decimal("1234.5")),
+    ("(1,234)", Decimal("-1234")),
+    ("1.234,56", Decimal("1234.56")),
+    ("1 234,567", Decimal("1234.567")),
+    ("1234,500", Decimal("1234.5")),
+    ("1.234.567", Decimal("1234567")),
+    ("1,23,4", None),
+    ("-", None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
@@ -0,0 +1,25 @@
+"""
+Полная пересборка статистики компаний в таблице companies из reviews.
+Используется для исправления расхождений — в обычном режиме статистика
+обновляется при каждой записи в reviews.
+
+Запуск: python update_companies_stats.py
+"""
+import asyncio
+import time
+
+from database import AsyncSessionLocal, engine
+from services.company_stats_service import CompanyStatsService
+
+
+async def main():
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        print("🚀 Пересборка статистики компаний...")
+        await CompanyStatsService(session).rebuild_all()
+    await engine.dispose()
+    print(f"✅ Готово за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
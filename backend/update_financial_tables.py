@@ -0,0 +1,67 @@
+"""
+Пересчет предрассчитанных финансовых таблиц (reviews.financial_tables) из detailed_data.
+Обрабатывает отчеты без таблиц или с устаревшей версией формата.
+
+Запуск: python update_financial_tables.py [--all]
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, update, or_, bindparam
+
+from database import AsyncSessionLocal, engine
+from models.review import Review
+from helpers.financial_tables import build_financial_tables, FINANCIAL_TABLES_VERSION
+
+BATCH = 500
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Пересчет финансовых таблиц отчетов")
+    parser.add_argument("--all", action="store_true", help="пересчитать все отчеты, а не только устаревшие")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    updated = 0
+    last_id = 0
+
+    query = select(Review.id, Review.detailed_data).where(Review.detailed_data.isnot(None))
+    if not args.all:
+        query = query.where(or_(
+            Review.financial_tables.is_(None),
+            Review.financial_tables["version"].as_integer() != FINANCIAL_TABLES_VERSION,
+        ))
+
+    stmt = (
+        update(Review.__table__)
+        .where(Review.__table__.c.id == bindparam("b_id"))
+        .values(financial_tables=bindparam("b_tables"))
+    )
+
+    print("🚀 Пересчет финансовых таблиц...")
+    async with AsyncSessionLocal() as session:
+        while True:
+            result = await session.execute(
+                query.where(Review.id > last_id).order_by(Review.id).limit(BATCH)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            await session.execute(stmt, [
+                {"b_id": row.id, "b_tables": build_financial_tables(row.detailed_data)}
+                for row in rows
+            ])
+            await session.commit()
+
+            last_id = rows[-1].id
+            updated += len(rows)
+            print(f"✅ Обработано отчетов: {updated}", flush=True)
+
+    await engine.dispose()
+    print(f"✅ Готово: {updated} отчетов за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())